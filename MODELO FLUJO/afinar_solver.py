@@ -0,0 +1,176 @@
+# afinar_solver.py
+# Afina los parámetros de Gurobi de cada tipo de modelo sobre instancias representativas y
+# guarda el mejor conjunto en config/<tipo>_<N>y.prm, que EmbalseNuevaPunilla, EmbalseCasoBase
+# y MonteCarloEmbalse cargan al construir (ver model/perfiles.py).
+#
+#   python afinar_solver.py --modelo modelito2 --horizontes 5 10 30 --metodo tuner --tiempo 600
+#   python afinar_solver.py --modelo caso_base --metodo grilla --repeticiones 3
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import gurobipy as gp
+from gurobipy import GRB
+
+from caso_base import EmbalseCasoBase
+from model.modelito2 import EmbalseNuevaPunilla
+from model.perfiles import DIRECTORIO, EXCLUIDOS, TIPOS, escribir_prm, leer_prm
+from monte_carlo import MonteCarloEmbalse
+
+HORIZONTES = (5, 10, 30)
+METODOS = ('tuner', 'grilla')
+
+# método "grilla": un cambio por candidato sobre lo que más mueve un MIP con addGenConstrMin/Max e
+# indicadores con umbral 0.0 (presolve, foco, cortes, heurísticas, integralidad)
+GRILLA = ({}, {'Presolve': 2}, {'MIPFocus': 1}, {'MIPFocus': 2}, {'Cuts': 0}, {'Cuts': 2},
+          {'Heuristics': 0.2}, {'Symmetry': 0}, {'IntegralityFocus': 1}, {'PreSparsify': 1}, {'Method': 1})
+
+
+def instancia(tipo, anos):
+    """gp.Model sin optimizar ni perfil de `tipo`, con `anos` años de la serie histórica."""
+    if tipo == 'modelito2':
+        emb = EmbalseNuevaPunilla()
+        emb.anos = emb.anos[:anos]
+        emb.perfil_solver = None
+        emb.construir()
+        return emb.model
+    if tipo == 'caso_base':
+        cb = EmbalseCasoBase()
+        cb.anos = cb.anos[:anos]
+        cb.cargar_caudales("data/caudales.xlsx")
+        cb.setup_variables()
+        cb.setup_restricciones()
+        cb.set_objective()
+        cb.model.update()
+        return cb.model
+    if tipo == 'monte_carlo':
+        mc = MonteCarloEmbalse(num_simulaciones=1, duracion_anos=anos)
+        mc.perfil_solver = None
+        return mc._resolver_modelo_montecarlo(mc.escenario_simulacion(0), solo_construir=True)
+    raise ValueError(f"tipo de modelo desconocido: {tipo!r} (use {', '.join(map(repr, TIPOS))})")
+
+
+def _esfuerzo(model):
+    # Work (unidades deterministas de Gurobi >= 11) no depende de la carga de la máquina
+    try:
+        return model.Work
+    except (AttributeError, gp.GurobiError):
+        return model.Runtime
+
+
+def evaluar(model, params, repeticiones=1):
+    """
+    (esfuerzo medio, objetivo) de copias de model con los parámetros por defecto más `params`,
+    con Seed 0..repeticiones-1; el esfuerzo es Work si existe, si no Runtime (s).
+    (None, None) si alguna no termina en el óptimo.
+    """
+    esfuerzos, obj = [], None
+    for semilla in range(repeticiones):
+        m = model.copy()
+        try:
+            m.resetParams()
+            m.Params.OutputFlag = 0
+            m.Params.Seed = semilla
+            for nombre, valor in params.items():
+                m.setParam(nombre, valor)
+            m.optimize()
+            if m.status != GRB.OPTIMAL:
+                return None, None
+            esfuerzos.append(_esfuerzo(m))
+            obj = m.ObjVal
+        finally:
+            m.dispose()
+    return statistics.mean(esfuerzos), obj
+
+
+def afinar_tuner(model, tiempo):
+    """model.tune() con TuneTimeLimit=tiempo; devuelve los parámetros del mejor resultado."""
+    model.Params.OutputFlag = 1  # resumen del tuner (TuneOutput=1); no queda en el perfil (EXCLUIDOS)
+    model.Params.TuneOutput = 1
+    model.Params.TuneTimeLimit = tiempo
+    model.Params.TuneResults = 1
+    model.tune()
+    if model.TuneResultCount == 0:
+        return {}
+    model.getTuneResult(0)
+    with tempfile.TemporaryDirectory(prefix="afinar_") as directorio:
+        ruta = os.path.join(directorio, "mejor.prm")
+        model.write(ruta)
+        params = leer_prm(ruta)
+    return {n: v for n, v in params.items() if n not in EXCLUIDOS and not n.startswith('Tune')}
+
+
+def afinar_grilla(model, repeticiones=1, margen=0.05, grilla=GRILLA):
+    """
+    Evalúa cada candidato de la grilla y devuelve el más rápido que mejora en más de `margen`
+    (fracción) a los parámetros por defecto y llega al mismo objetivo; {} si ninguno.
+    """
+    base_t, base_obj = evaluar(model, {}, repeticiones)
+    if base_t is None:
+        raise RuntimeError("la instancia no se resuelve al óptimo con los parámetros por defecto")
+    print(f"    por defecto: {base_t:.4f}")
+    mejor, mejor_t = {}, base_t * (1 - margen)
+    for params in grilla:
+        if not params:
+            continue
+        t, obj = evaluar(model, params, repeticiones)
+        if t is None or abs(obj - base_obj) > 1e-6 * max(1.0, abs(base_obj)):
+            print(f"    {params}: descartado (no llega al mismo óptimo)")
+            continue
+        print(f"    {params}: {t:.4f}")
+        if t < mejor_t:
+            mejor, mejor_t = params, t
+    return mejor
+
+
+def afinar(tipo, horizontes=HORIZONTES, metodo="tuner", tiempo=600, repeticiones=1, margen=0.05,
+           directorio=DIRECTORIO):
+    """Afina y escribe config/<tipo>_<N>y.prm para cada horizonte; devuelve {N: ruta}."""
+    if metodo not in METODOS:
+        raise ValueError(f"metodo desconocido: {metodo!r} (use 'tuner' o 'grilla')")
+    escritos = {}
+    for anos in horizontes:
+        print(f"\n== {tipo}, {anos} años ({metodo}) ==")
+        try:
+            model = instancia(tipo, anos)
+            model.update()  # model.copy() sólo copia lo ya actualizado
+            model.Params.OutputFlag = 0
+            params = afinar_tuner(model, tiempo) if metodo == "tuner" else afinar_grilla(model, repeticiones, margen)
+            base_t, _ = evaluar(model, {}, repeticiones)
+            nuevo_t, _ = evaluar(model, params, repeticiones)
+        except (gp.GurobiError, RuntimeError) as e:
+            # p. ej. un horizonte que excede una licencia limitada: se siguen los demás
+            print(f"  ERROR: {e}")
+            continue
+        ruta = os.path.join(directorio, f"{tipo}_{anos}y.prm")
+        tiempos = (f"esfuerzo (Work o s) por defecto {base_t:.4f}, con este perfil {nuevo_t:.4f}"
+                   if base_t is not None and nuevo_t is not None else "sin esfuerzos comparables")
+        escribir_prm(ruta, params, comentarios=(
+            f"perfil de Gurobi de {tipo} (instancia de {anos} años), leído por model/perfiles.py",
+            f"python afinar_solver.py --metodo {metodo}, {time.strftime('%Y-%m-%d %H:%M')}",
+            tiempos,
+        ))
+        print(f"  {params or 'parámetros por defecto'} -> {ruta} ({tiempos})")
+        escritos[anos] = ruta
+    return escritos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Afina los parámetros de Gurobi y los guarda en config/*.prm")
+    parser.add_argument("--modelo", nargs="+", choices=TIPOS, default=list(TIPOS))
+    parser.add_argument("--horizontes", nargs="+", type=int, default=list(HORIZONTES), metavar="AÑOS")
+    parser.add_argument("--metodo", default="tuner", choices=METODOS,
+                        help="tuner: model.tune() de Gurobi; grilla: candidatos de GRILLA uno por uno")
+    parser.add_argument("--tiempo", type=float, default=600, help="TuneTimeLimit (s) por instancia (tuner)")
+    parser.add_argument("--repeticiones", type=int, default=1, help="semillas por candidato (grilla y comparación)")
+    parser.add_argument("--margen", type=float, default=0.05, help="mejora mínima sobre los por defecto (grilla)")
+    parser.add_argument("--directorio", default=DIRECTORIO, help="dónde escribir los .prm")
+    args = parser.parse_args(argv)
+    for tipo in args.modelo:
+        afinar(tipo, args.horizontes, args.metodo, args.tiempo, args.repeticiones, args.margen, args.directorio)
+
+
+if __name__ == "__main__":
+    main()
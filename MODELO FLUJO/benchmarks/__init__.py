@@ -0,0 +1,17 @@
+# benchmarks/
+# Tiempos por fase (carga, construcción, optimización, extracción, exportación) de
+# EmbalseNuevaPunilla, EmbalseCasoBase y MonteCarloEmbalse en horizontes de 1 a 30 años,
+# guardados en JSON y comparables contra una línea base. Uso (desde MODELO FLUJO/):
+#
+#   python -m benchmarks correr --salida bench.json [--baseline benchmarks/baseline.json]
+#   python -m benchmarks comparar benchmarks/baseline.json bench.json --umbral 0.25
+#   python -m benchmarks escalamiento --horizontes 1 5 10 30 50 100 --metodo remuestreo
+#
+# benchmarks/escalamiento.py estudia el crecimiento del MIP con horizontes sintéticos de
+# cualquier largo (la serie histórica tiene 30 años).
+from benchmarks.comparar import comparar, leer, regresiones
+from benchmarks.escalamiento import escalar, exponentes, serie_sintetica
+from benchmarks.fases import HORIZONTES, MODELOS, medir
+
+__all__ = ['HORIZONTES', 'MODELOS', 'comparar', 'escalar', 'exponentes', 'leer', 'medir', 'regresiones',
+           'serie_sintetica']
@@ -0,0 +1,89 @@
+# python -m benchmarks (ver benchmarks/__init__.py)
+import argparse
+import sys
+
+from benchmarks import escalamiento
+from benchmarks.comparar import comparar, guardar, imprimir, leer, regresiones
+from benchmarks.fases import HORIZONTES, MODELOS, medir
+from model.milp import SOLVERS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Tiempos por fase de los modelos del embalse")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_correr = sub.add_parser("correr", help="mide y escribe los resultados en JSON")
+    p_correr.add_argument("--salida", default="bench.json", help="archivo JSON de resultados")
+    p_correr.add_argument("--modelos", nargs="+", choices=MODELOS, default=list(MODELOS))
+    p_correr.add_argument("--horizontes", nargs="+", type=int, default=list(HORIZONTES), metavar="AÑOS")
+    p_correr.add_argument("--repeticiones", type=int, default=3, help="se reporta la mediana")
+    p_correr.add_argument("--calentamiento", type=int, default=1, help="corridas previas sin medir")
+    p_correr.add_argument("--builder", default="escalar", choices=("escalar", "matriz", "lean"),
+                          help="constructor del MIP de EmbalseNuevaPunilla")
+    p_correr.add_argument("--simulaciones", type=int, default=3, help="simulaciones por horizonte de Monte Carlo")
+    p_correr.add_argument("--solver", default="gurobi", choices=SOLVERS,
+                          help="highs: scipy.optimize.milp, sin licencia de Gurobi")
+    p_correr.add_argument("--baseline", default=None, help="compara contra este JSON al terminar")
+
+    p_comparar = sub.add_parser("comparar", help="compara dos JSON ya escritos")
+    p_comparar.add_argument("base")
+    p_comparar.add_argument("nuevo")
+
+    p_escalar = sub.add_parser("escalamiento", help="tiempo, memoria y tamaño del MIP vs. horizonte (series sintéticas)")
+    p_escalar.add_argument("--horizontes", nargs="+", type=int, default=list(escalamiento.HORIZONTES), metavar="AÑOS")
+    p_escalar.add_argument("--metodo", default="mosaico", choices=escalamiento.METODOS,
+                           help="mosaico repite la serie histórica; remuestreo sortea años con reemplazo")
+    p_escalar.add_argument("--semilla", type=int, default=0, help="semilla de --metodo remuestreo")
+    p_escalar.add_argument("--builder", default="escalar", choices=("escalar", "matriz", "lean"))
+    p_escalar.add_argument("--modo", default="monolithic", choices=("monolithic", "chained"), help="horizon_mode")
+    p_escalar.add_argument("--solver", default="gurobi", choices=SOLVERS,
+                           help="highs: scipy.optimize.milp, sin el límite de tamaño de una licencia de Gurobi")
+    p_escalar.add_argument("--limite", type=float, default=None, help="TimeLimit (s) de cada MIP monolítico")
+    p_escalar.add_argument("--salida", default="escalamiento.csv", help="tabla CSV, una fila por horizonte")
+    p_escalar.add_argument("--grafico", default="escalamiento.png", help="PNG (requiere matplotlib)")
+    p_escalar.add_argument("--telemetria", default=None, help="JSON Lines con la telemetría completa de cada horizonte")
+    p_escalar.add_argument("--en-proceso", action="store_true",
+                           help="no aísla cada horizonte en un proceso nuevo (la RSS máxima se acumula)")
+    p_escalar.add_argument("--seguir", action="store_true", help="sigue después del primer horizonte no resuelto")
+
+    for p in (p_correr, p_comparar):
+        p.add_argument("--umbral", type=float, default=0.25,
+                       help="regresión si una fase tarda más de (1 + umbral) veces la base")
+        p.add_argument("--piso", type=float, default=0.02,
+                       help="diferencia mínima (s) para contar como regresión")
+        p.add_argument("--estadistico", default="min", choices=("min", "segundos"),
+                       help="qué se compara: el mínimo o la mediana (segundos) de las repeticiones")
+    args = parser.parse_args(argv)
+
+    if args.comando == "escalamiento":
+        tabla = escalamiento.escalar(args.horizontes, metodo=args.metodo, semilla=args.semilla, builder=args.builder,
+                                     horizon_mode=args.modo, limite_s=args.limite, archivo_telemetria=args.telemetria,
+                                     aislado=not args.en_proceso, seguir=args.seguir, solver=args.solver)
+        tabla.to_csv(args.salida, index=False)
+        escalamiento.imprimir(tabla)
+        print(f"[OK] {len(tabla)} horizontes en {args.salida}")
+        if escalamiento.graficar(tabla, args.grafico):
+            print(f"[OK] Gráfico en {args.grafico}")
+        return 0
+
+    if args.comando == "correr":
+        resultados, errores = medir(args.modelos, args.horizontes, args.repeticiones,
+                                    builder=args.builder, num_simulaciones=args.simulaciones,
+                                    calentamiento=args.calentamiento, solver=args.solver)
+        guardar(args.salida, resultados, errores, repeticiones=args.repeticiones, calentamiento=args.calentamiento,
+                builder=args.builder, simulaciones=args.simulaciones, solver=args.solver)
+        print(f"[OK] {len(resultados)} mediciones en {args.salida} ({len(errores)} errores)")
+        if args.baseline is None:
+            return 0
+        base, nuevo = leer(args.baseline), leer(args.salida)
+    else:
+        base, nuevo = leer(args.base), leer(args.nuevo)
+
+    filas = comparar(base, nuevo, umbral=args.umbral, piso=args.piso, estadistico=args.estadistico)
+    imprimir(filas, args.umbral)
+    return 1 if regresiones(filas) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
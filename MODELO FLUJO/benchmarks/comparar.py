@@ -0,0 +1,76 @@
+# benchmarks/comparar.py
+# Archivo JSON de resultados y comparación contra una línea base.
+import json
+import os
+import platform
+import time
+
+from model.milp import gp
+
+VERSION = 1
+
+
+def guardar(archivo, resultados, errores, **meta):
+    """Escribe {'version', 'meta', 'resultados', 'errores'}; meta agrega fecha, máquina y versiones."""
+    meta = dict(meta, fecha=time.strftime("%Y-%m-%dT%H:%M:%S"), python=platform.python_version(),
+                plataforma=platform.platform(), procesadores=os.cpu_count(),
+                gurobi=".".join(map(str, gp.gurobi.version())) if gp is not None else None)
+    if os.path.dirname(archivo):
+        os.makedirs(os.path.dirname(archivo), exist_ok=True)
+    with open(archivo, "w", encoding="utf-8") as f:
+        json.dump({'version': VERSION, 'meta': meta, 'resultados': resultados, 'errores': errores},
+                  f, indent=1, ensure_ascii=False)
+    return archivo
+
+
+def leer(archivo):
+    with open(archivo, encoding="utf-8") as f:
+        datos = json.load(f)
+    if datos.get('version') != VERSION:
+        raise ValueError(f"versión de benchmark desconocida en {archivo}: {datos.get('version')!r} (use {VERSION})")
+    return datos
+
+
+def comparar(base, nuevo, umbral=0.25, piso=0.02, estadistico='min'):
+    """
+    Une base y nuevo (dicts de leer) por (modelo, horizonte, fase) y compara `estadistico`
+    ('min', el mejor de las repeticiones, que es lo que menos varía entre corridas, o
+    'segundos', la mediana). Devuelve una lista de dicts con los segundos de cada uno, la
+    razón nuevo/base y `regresion`: la fase tardó más de
+    (1 + umbral) veces la base y al menos `piso` segundos más (las fases de milisegundos varían
+    más que eso entre corridas). Una fase que falla en nuevo y no en base también es regresión.
+    """
+    indice = {(r['modelo'], r['horizonte'], r['fase']): r[estadistico] for r in base['resultados']}
+    fallidos_base = {(e['modelo'], e['horizonte']) for e in base.get('errores', [])}
+    filas = []
+    for r in nuevo['resultados']:
+        clave = (r['modelo'], r['horizonte'], r['fase'])
+        if clave not in indice:
+            continue
+        antes, ahora = indice[clave], r[estadistico]
+        filas.append({'modelo': clave[0], 'horizonte': clave[1], 'fase': clave[2], 'base': antes, 'nuevo': ahora,
+                      'razon': ahora / antes if antes > 0 else float('inf'),
+                      'regresion': ahora > antes * (1 + umbral) and ahora - antes >= piso})
+    medidos_base = {(m, h) for m, h, _ in indice}
+    for e in nuevo.get('errores', []):
+        if (e['modelo'], e['horizonte']) in medidos_base - fallidos_base:
+            filas.append({'modelo': e['modelo'], 'horizonte': e['horizonte'], 'fase': 'ERROR',
+                          'base': None, 'nuevo': None, 'razon': None, 'regresion': True})
+    return filas
+
+
+def regresiones(filas):
+    return [f for f in filas if f['regresion']]
+
+
+def imprimir(filas, umbral):
+    print(f"{'Modelo':<12} {'Años':>4} {'Fase':<24} {'Base (s)':>10} {'Nuevo (s)':>10} {'Razón':>7}")
+    for f in filas:
+        if f['fase'] == 'ERROR':
+            print(f"{f['modelo']:<12} {f['horizonte']:>4} {'(falló en la corrida nueva)':<24}{'':>29}  REGRESIÓN")
+            continue
+        marca = "  REGRESIÓN" if f['regresion'] else ""
+        print(f"{f['modelo']:<12} {f['horizonte']:>4} {f['fase']:<24} {f['base']:>10.4f} {f['nuevo']:>10.4f} "
+              f"{f['razon']:>6.2f}x{marca}")
+    n = len(regresiones(filas))
+    print(f"{n} regresiones (umbral +{100 * umbral:.0f}%)" if n else f"Sin regresiones (umbral +{100 * umbral:.0f}%)")
@@ -0,0 +1,191 @@
+# benchmarks/escalamiento.py
+# Cómo crece el MIP de EmbalseNuevaPunilla con el horizonte.
+#
+# La hidrología histórica tiene 30 años y el modelo encadena los años por su etiqueta
+# ('AAAA/AAAA' consecutivas). serie_sintetica() arma horizontes de cualquier largo repitiendo
+# (mosaico) o remuestreando con reemplazo (remuestreo) años hidrológicos completos de
+# caudales.xlsx, rotulados 1989/1990, 1990/1991, ... Cada horizonte se resuelve de punta a
+# punta con Telemetria (model/telemetria.py), por defecto en un proceso nuevo para que la
+# memoria máxima (RSS) sea la de ese horizonte y no la del mayor anterior.
+import contextlib
+import io
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+
+from model.hidrologia import HydrologyDataset
+from model.modelito2 import EmbalseNuevaPunilla
+from model.telemetria import Telemetria
+
+ARCHIVO_CAUDALES = "data/caudales.xlsx"
+HORIZONTES = (1, 2, 5, 10, 20, 30, 50, 100)
+METODOS = ('mosaico', 'remuestreo')
+
+# columnas de la tabla que se ajustan a horizonte^k (exponentes) y se grafican
+TIEMPOS = ('construccion_s', 'optimizacion_s', 'total_s')
+MEMORIA = ('rss_max_mb', 'mem_gurobi_mb')
+TAMANO = ('variables', 'binarias', 'lineales', 'generales', 'no_ceros')
+
+
+def etiquetas(n_anos, inicio=1989):
+    return [f"{inicio + k}/{inicio + k + 1}" for k in range(n_anos)]
+
+
+def serie_sintetica(hidrologia, n_anos, metodo="mosaico", semilla=0):
+    """
+    HydrologyDataset de n_anos años hidrológicos completos (los 12 meses de un mismo año
+    histórico, así se conserva la estacionalidad) con etiquetas consecutivas desde el primer
+    año histórico. metodo="mosaico" repite la serie en orden (con n_anos <= 30 es la serie
+    histórica); metodo="remuestreo" sortea años con reemplazo (np.random.default_rng(semilla)).
+    """
+    if metodo == "mosaico":
+        fuente = [hidrologia.anos[k % len(hidrologia)] for k in range(n_anos)]
+    elif metodo == "remuestreo":
+        fuente = list(np.random.default_rng(semilla).choice(hidrologia.anos, size=n_anos, replace=True))
+    else:
+        raise ValueError(f"metodo desconocido: {metodo!r} (use 'mosaico' o 'remuestreo')")
+    inicio = int(hidrologia.anos[0].split('/')[0])
+    return hidrologia.subconjunto(fuente, etiquetas=etiquetas(n_anos, inicio))
+
+
+def medir_horizonte(n_anos, metodo="mosaico", semilla=0, builder="escalar", horizon_mode="monolithic",
+                    limite_s=None, archivo_telemetria=None, solver="gurobi"):
+    """
+    Construye y resuelve EmbalseNuevaPunilla sobre serie_sintetica(n_anos) y devuelve una fila:
+    tiempos (construcción = variables + restricciones + objetivo), memoria, tamaño del modelo
+    y estado del solver ("gurobi" o "highs", ver model/milp.py). limite_s fija TimeLimit (sólo en
+    el MIP monolítico). Un horizonte que
+    no se resuelve (licencia, memoria, límite de tiempo) queda con resuelto=False y su error.
+    """
+    hidrologia = serie_sintetica(HydrologyDataset.desde_excel(ARCHIVO_CAUDALES), n_anos, metodo, semilla)
+    emb = EmbalseNuevaPunilla(hidrologia=hidrologia, solver=solver)
+    emb.anos = list(hidrologia.anos)
+    emb.builder = builder
+    emb.horizon_mode = horizon_mode
+    emb.model.Params.OutputFlag = 0
+    if limite_s is not None:
+        emb.model.Params.TimeLimit = limite_s
+    emb.telemetria = Telemetria(archivo_telemetria, etiqueta=f"escalamiento {metodo} {n_anos}")
+
+    salida = io.StringIO()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(salida):
+        sol = emb.solve()
+    total = time.perf_counter() - t0
+
+    d = emb.telemetria.datos
+    fases, censo, stats = d['fases'], d['censo'], d['solver']
+    fila = {'horizonte': n_anos, 'metodo': metodo, 'solver': solver, 'builder': builder, 'horizon_mode': horizon_mode,
+            'resuelto': sol is not None, 'status': stats.get('status'),
+            'construccion_s': sum(fases.get(f, {}).get('wall_s', 0.0) for f in ('variables', 'restricciones', 'objetivo')),
+            'optimizacion_s': fases.get('optimizacion', {}).get('wall_s', np.nan),
+            'total_s': total,
+            'rss_max_mb': d.get('rss_max_mb'),
+            'mem_gurobi_mb': stats['mem_max_gb'] * 1024 if 'mem_max_gb' in stats else np.nan,
+            'nodos': stats.get('nodos', np.nan), 'gap': stats.get('gap', np.nan),
+            'obj_val': sol['obj_val'] if sol is not None else np.nan}
+    fila.update({campo: censo.get(campo, np.nan) for campo in TAMANO})
+    if sol is None:
+        errores = [l for l in salida.getvalue().splitlines() if l.startswith(("Error", "Modelo no resuelto"))]
+        fila['error'] = errores[-1] if errores else "sin solución"
+    return fila
+
+
+def _medir_aislado(kwargs):
+    return medir_horizonte(**kwargs)
+
+
+def escalar(horizontes=HORIZONTES, metodo="mosaico", semilla=0, builder="escalar", horizon_mode="monolithic",
+            limite_s=None, archivo_telemetria=None, aislado=True, seguir=False, solver="gurobi"):
+    """
+    medir_horizonte para cada horizonte (en orden creciente) -> DataFrame, una fila por horizonte.
+    aislado=True corre cada horizonte en un proceso nuevo (spawn); seguir=False se detiene en el
+    primer horizonte que no se resuelve, porque los siguientes son más grandes.
+    """
+    filas = []
+    pool = multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) if aislado else None
+    try:
+        for n_anos in sorted(horizontes):
+            kwargs = dict(n_anos=n_anos, metodo=metodo, semilla=semilla, builder=builder,
+                          horizon_mode=horizon_mode, limite_s=limite_s, archivo_telemetria=archivo_telemetria,
+                          solver=solver)
+            fila = pool.apply(_medir_aislado, (kwargs,)) if pool is not None else medir_horizonte(**kwargs)
+            filas.append(fila)
+            if fila['resuelto']:
+                print(f"  {n_anos:>4} años: construcción {fila['construccion_s']:8.2f} s, "
+                      f"optimización {fila['optimizacion_s']:8.2f} s, {fila['variables']:.0f} variables, "
+                      f"RSS {fila['rss_max_mb'] or float('nan'):.0f} MB")
+            else:
+                print(f"  {n_anos:>4} años: NO RESUELTO ({fila['error']})")
+                if not seguir:
+                    break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return pd.DataFrame(filas)
+
+
+def exponentes(tabla, columnas=TIEMPOS + MEMORIA + TAMANO):
+    """
+    k de columna ~ horizonte^k (recta en log-log sobre los horizontes resueltos con valor > 0):
+    k ~ 1 es lineal en el horizonte, k > 1 crece más rápido que el modelo.
+    """
+    resueltos = tabla[tabla['resuelto']]
+    k = {}
+    for col in columnas:
+        datos = resueltos[['horizonte', col]].dropna()
+        datos = datos[datos[col].astype(float) > 0]
+        if datos['horizonte'].nunique() >= 2:
+            k[col] = float(np.polyfit(np.log(datos['horizonte']), np.log(datos[col].astype(float)), 1)[0])
+    return k
+
+
+def graficar(tabla, archivo):
+    """Tiempos, memoria y tamaño del modelo vs. horizonte (log-log) en un PNG; requiere matplotlib."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("[AVISO] matplotlib no está instalado: se omite el gráfico")
+        return None
+    resueltos = tabla[tabla['resuelto']]
+    fig, ejes = plt.subplots(1, 3, figsize=(16, 5))
+    for eje, columnas, titulo, unidad in ((ejes[0], TIEMPOS, "Tiempo", "s"), (ejes[1], MEMORIA, "Memoria", "MB"),
+                                          (ejes[2], TAMANO, "Tamaño del modelo", "filas / columnas / no ceros")):
+        for col in columnas:
+            if resueltos[col].notna().any():
+                eje.plot(resueltos['horizonte'], resueltos[col], marker="o", label=col)
+        eje.set_xscale("log")
+        eje.set_yscale("log")
+        eje.set_title(titulo)
+        eje.set_xlabel("Horizonte (años)")
+        eje.set_ylabel(unidad)
+        eje.grid(True, linestyle="--", alpha=0.4)
+        eje.legend()
+    no_resueltos = tabla[~tabla['resuelto']]
+    if len(no_resueltos):
+        for eje in ejes:
+            eje.axvline(no_resueltos['horizonte'].min(), color="red", linestyle=":", label="no resuelto")
+    fig.tight_layout()
+    fig.savefig(archivo, dpi=160)
+    plt.close(fig)
+    return archivo
+
+
+def imprimir(tabla):
+    columnas = ['horizonte', 'resuelto', 'construccion_s', 'optimizacion_s', 'total_s', 'rss_max_mb',
+                'variables', 'binarias', 'lineales', 'generales', 'no_ceros', 'nodos', 'gap']
+    print(tabla[[c for c in columnas if c in tabla]].to_string(index=False, float_format=lambda x: f"{x:.3g}"))
+    k = exponentes(tabla)
+    if k:
+        print("Crecimiento (columna ~ horizonte^k): " + ", ".join(f"{col} k={v:.2f}" for col, v in k.items()))
+    resueltos = tabla[tabla['resuelto']]
+    if len(resueltos):
+        print(f"Mayor horizonte resuelto: {resueltos['horizonte'].max()} años")
+    if (~tabla['resuelto']).any():
+        fila = tabla[~tabla['resuelto']].iloc[0]
+        print(f"Primer horizonte no resuelto: {fila['horizonte']} años ({fila['error']})")
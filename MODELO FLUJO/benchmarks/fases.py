@@ -0,0 +1,197 @@
+# benchmarks/fases.py
+# Tiempo de cada fase de una corrida, por modelo y horizonte.
+#
+# solve() junta en una llamada la carga de caudales, la construcción del MIP, optimize(),
+# la lectura de la solución y los exportadores, y Monte Carlo sólo guarda model.Runtime.
+# Aquí cada fase se llama por separado (los mismos métodos que usa solve()) y se mide con
+# time.perf_counter; cada medición es una instancia nueva del modelo.
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from model.hidrologia import HydrologyDataset
+from model.milp import GRB
+from model.modelito2 import EmbalseNuevaPunilla
+from caso_base import EmbalseCasoBase
+from monte_carlo import MonteCarloEmbalse, _entorno_mc
+
+ARCHIVO_CAUDALES = "data/caudales.xlsx"
+HORIZONTES = (1, 5, 10, 15, 30)
+MODELOS = ('modelito2', 'caso_base', 'monte_carlo')
+
+
+class _Cronometro:
+    """fases[nombre] += segundos de cada bloque `with crono('nombre'):`."""
+
+    def __init__(self):
+        self.fases = {}
+
+    @contextlib.contextmanager
+    def __call__(self, fase):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[fase] = self.fases.get(fase, 0.0) + time.perf_counter() - t0
+
+
+@contextlib.contextmanager
+def _silencio():
+    # la salida de Gurobi, de los modelos y los traceback que imprime ejecutar_simulacion
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def _optimizar(model):
+    model.optimize()
+    if model.status not in (GRB.OPTIMAL, GRB.SUBOPTIMAL):
+        raise RuntimeError(f"el MIP no se resolvió (status {model.status})")
+
+
+def fases_modelito2(horizonte, builder="escalar", directorio=".", solver="gurobi"):
+    """
+    EmbalseNuevaPunilla sobre los primeros `horizonte` años: carga_excel (parseo sin caché
+    .npz), carga, variables, restricciones, objetivo (con model.update()), optimizacion,
+    extraccion, kpis, tablas (df_detalle/df_resumen en memoria), export_tablas y export_txt.
+    Con builder "matriz" o "lean" las tres fases del constructor se miden como construccion.
+    """
+    crono = _Cronometro()
+    with crono('carga_excel'):
+        HydrologyDataset.desde_excel(ARCHIVO_CAUDALES, usar_cache=False)
+    emb = EmbalseNuevaPunilla(solver=solver)
+    emb.model.Params.OutputFlag = 0
+    emb.anos = emb.anos[:horizonte]
+    with crono('carga'):
+        emb.cargar_data(ARCHIVO_CAUDALES)
+    if builder == "escalar":
+        with crono('variables'):
+            emb.variables()
+        with crono('restricciones'):
+            emb.restricciones()
+        with crono('objetivo'):
+            emb.funcion_objetivo()
+            emb.model.update()
+        emb._construido_con = builder
+    else:
+        with crono('construccion'):
+            emb.construir(builder)
+    with crono('optimizacion'):
+        _optimizar(emb.model)
+    with crono('extraccion'):
+        emb.solucion = emb.extraer_solucion(status=emb.model.status, obj_val=emb.model.objVal)
+    with crono('kpis'):
+        emb.kpis()
+    with crono('tablas'):
+        emb.tablas_resultados(emb.solucion.valores)
+    with crono('export_tablas'):
+        emb.exportar_resultados(os.path.join(directorio, "resultados_embalse.xlsx"))
+    with crono('export_txt'):
+        emb.exportar_a_txt(os.path.join(directorio, "reporte_embalse.txt"))
+    return crono.fases
+
+
+def fases_caso_base(horizonte, directorio=".", solver="gurobi"):
+    """EmbalseCasoBase: carga, variables, restricciones, objetivo, optimizacion, extraccion, tablas, export_*."""
+    crono = _Cronometro()
+    cb = EmbalseCasoBase(solver=solver)
+    cb.model.Params.OutputFlag = 0
+    cb.anos = cb.anos[:horizonte]
+    with crono('carga'):
+        cb.cargar_caudales(ARCHIVO_CAUDALES)
+    with crono('variables'):
+        cb.setup_variables()
+    with crono('restricciones'):
+        cb.setup_restricciones()
+    with crono('objetivo'):
+        cb.set_objective()
+        cb.model.update()
+    with crono('optimizacion'):
+        _optimizar(cb.model)
+    with crono('extraccion'):
+        cb.get_solution()
+    with crono('tablas'):
+        cb.tablas_resultados()
+    with crono('export_tablas'):
+        cb.exportar_resultados(os.path.join(directorio, "resultados_caso_base.xlsx"))
+    with crono('export_txt'):
+        cb.exportar_a_txt(os.path.join(directorio, "reporte_caso_base.txt"))
+    return crono.fases
+
+
+def fases_monte_carlo(horizonte, num_simulaciones=3, directorio=".", solver="gurobi"):
+    """
+    MonteCarloEmbalse con `num_simulaciones` simulaciones de `horizonte` años (motor MIP,
+    Threads=1): carga, escenarios, optimizacion (suma de model.Runtime), construccion_extraccion
+    (el resto de ejecutar_simulacion: armar el MIP y leer la solución) y export_tablas.
+    """
+    crono = _Cronometro()
+    with crono('carga'):
+        mc = MonteCarloEmbalse(num_simulaciones=num_simulaciones, duracion_anos=horizonte, solver=solver)
+    with crono('escenarios'):
+        escenarios = [mc.escenario_simulacion(i) for i in range(num_simulaciones)]
+    env = _entorno_mc(salida=False, solver=solver)
+    try:
+        t0 = time.perf_counter()
+        for i, escenario in enumerate(escenarios):
+            resultado = mc.ejecutar_simulacion(i, escenario, env=env)
+            if resultado is None:
+                raise RuntimeError(f"la simulación {i + 1} no se resolvió")
+            mc.resultados_simulaciones.append(resultado)
+        total = time.perf_counter() - t0
+    finally:
+        env.dispose()
+    runtime = sum(r['tiempo_ejecucion_seg'] for r in mc.resultados_simulaciones)
+    crono.fases['optimizacion'] = runtime
+    crono.fases['construccion_extraccion'] = total - runtime
+    with crono('export_tablas'):
+        mc._escribir_resultados(pd.DataFrame(mc.resultados_simulaciones),
+                                os.path.join(directorio, "monte_carlo_resultados.xlsx"),
+                                mc.output_format, mc.duracion_anos)
+    return crono.fases
+
+
+MEDIDORES = {'modelito2': fases_modelito2, 'caso_base': fases_caso_base, 'monte_carlo': fases_monte_carlo}
+
+
+def medir(modelos=MODELOS, horizontes=HORIZONTES, repeticiones=3, builder="escalar", num_simulaciones=3,
+          calentamiento=1, silencioso=True, solver="gurobi"):
+    """
+    Corre cada (modelo, horizonte) `calentamiento` veces sin medir (imports, entorno de
+    Gurobi, cachés en memoria) y luego `repeticiones` veces. Devuelve (resultados, errores):
+    resultados es una lista de dicts modelo, horizonte, fase, segundos (mediana), min, max,
+    muestras; errores una lista de dicts modelo, horizonte, error (p. ej. un horizonte que
+    excede la licencia de Gurobi), que no detiene al resto. solver: "gurobi" o "highs" en
+    los tres modelos (model/milp.py).
+    """
+    opciones = {'modelito2': {'builder': builder}, 'monte_carlo': {'num_simulaciones': num_simulaciones}}
+    resultados, errores = [], []
+    with tempfile.TemporaryDirectory(prefix="bench_") as directorio:
+        for modelo in modelos:
+            medidor = MEDIDORES[modelo]
+            for horizonte in horizontes:
+                muestras = {}
+                try:
+                    for rep in range(calentamiento + repeticiones):
+                        with _silencio() if silencioso else contextlib.nullcontext():
+                            fases = medidor(horizonte, directorio=directorio, solver=solver,
+                                            **opciones.get(modelo, {}))
+                        if rep < calentamiento:
+                            continue
+                        for fase, seg in fases.items():
+                            muestras.setdefault(fase, []).append(seg)
+                except Exception as e:
+                    errores.append({'modelo': modelo, 'horizonte': horizonte, 'error': str(e)})
+                    print(f"  {modelo:<12} {horizonte:>2} años: ERROR {e}")
+                    continue
+                for fase, seg in muestras.items():
+                    resultados.append({'modelo': modelo, 'horizonte': horizonte, 'fase': fase,
+                                       'segundos': statistics.median(seg), 'min': min(seg), 'max': max(seg),
+                                       'muestras': seg})
+                total = sum(statistics.median(seg) for seg in muestras.values())
+                print(f"  {modelo:<12} {horizonte:>2} años: {total:.3f} s en {len(muestras)} fases")
+    return resultados, errores
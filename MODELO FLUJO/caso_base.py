@@ -1,12 +1,35 @@
 # model/modelo_caso_base.py
-import gurobipy as gp
-from gurobipy import GRB
+import argparse
+
+import numpy as np
 import pandas as pd
 
+from model.arranque import cargar_inicio
+from model.cache_resultados import CacheResultados, huella_fuentes
+from model.hidrologia import HydrologyDataset
+from model.milp import GRB, nuevo_modelo, quicksum
+from model.perfiles import aplicar_perfil, perfil
+from model.salidas import escribir_tablas, normalizar_salidas, porcentaje
+from model.solucion import Solution
+from model.telemetria import fase, optimizar
+
 class EmbalseCasoBase:
 
-    def __init__(self):
-        self.model = gp.Model("Embalse_Caso_Base")
+    def __init__(self, hidrologia=None, solver="gurobi"):
+        # solver: "gurobi" o "highs" (scipy.optimize.milp, sin licencia; ver model/milp.py)
+        self.model = nuevo_modelo("Embalse_Caso_Base", solver)
+        self.solver = solver
+        # Solution (model/solucion.py) del último solve; la leen los exportadores
+        self.solucion = None
+        # formato de df_detalle/df_resumen: "xlsx", "csv", "parquet" o "none"
+        self.output_format = "xlsx"
+        # CacheResultados opcional (model/cache_resultados.py), como en EmbalseNuevaPunilla
+        self.cache_resultados = None
+        # Telemetria opcional (model/telemetria.py): sol['telemetria'] con tiempos por fase y censo
+        self.telemetria = None
+        # perfil de Gurobi (model/perfiles.py): "auto" = config/caso_base_<N>y.prm, una ruta o None
+        self.perfil_solver = "auto"
+        self.parametros_perfil = {}
 
         self.anos = ['1989/1990', '1990/1991', '1991/1992', '1992/1993', '1993/1994',
                      '1994/1995', '1995/1996', '1996/1997', '1997/1998', '1998/1999',
@@ -35,11 +58,8 @@ class EmbalseCasoBase:
             12: 30*24*3600  # abr
         }
 
-        self.inflow  = {}
-        self.Q_nuble = {}
-        self.Q_hoya1 = {}
-        self.Q_hoya2 = {}
-        self.Q_hoya3 = {}
+        # HydrologyDataset (model/hidrologia.py); si no se inyecta, solve() lo carga del Excel
+        self.hidrologia = hidrologia
 
         # Acciones según documento regla
         self.num_A = 21221
@@ -84,48 +104,15 @@ class EmbalseCasoBase:
         self.SSR_CAPVAR = m.addVars(self.anos, self.meses, name="SSR_CAPVAR", lb=0)
 
     def cargar_caudales(self, file_path):
-        xls = pd.ExcelFile(file_path)
-        nuble = pd.read_excel(xls, sheet_name='Hoja1', skiprows=4,  nrows=31)
-        hoya1 = pd.read_excel(xls, sheet_name='Hoja1', skiprows=39, nrows=31)
-        hoya2 = pd.read_excel(xls, sheet_name='Hoja1', skiprows=75, nrows=31)
-        hoya3 = pd.read_excel(xls, sheet_name='Hoja1', skiprows=110,nrows=31)
-
-        excel_col_nombres = ['MAY','JUN','JUL','AGO','SEP','OCT','NOV','DIC','ENE','FEB','MAR','ABR']
-        model_mes_orden = [1,2,3,4,5,6,7,8,9,10,11,12]
-
-        Q_nuble, Q_hoya1, Q_hoya2, Q_hoya3, Q_afl = {},{},{},{},{}
-
-        for idx, fila in nuble.iterrows():
-            ano_str = str(fila.get('AÑO',''))
-            if (pd.notna(fila.get('AÑO')) and '/' in ano_str
-                and not any(w in ano_str.upper() for w in ['PROMEDIO','TOTAL','MAX','MIN'])):
-                try:
-                    ano = int(ano_str.split('/')[0])
-                    for col, mm in zip(excel_col_nombres, model_mes_orden):
-                        n1 = nuble.loc[idx, col]; h1 = hoya1.loc[idx, col]
-                        h2 = hoya2.loc[idx, col]; h3 = hoya3.loc[idx, col]
-                        if pd.notna(n1): Q_nuble[ano, mm] = float(n1); Q_afl[ano, mm] = float(n1)
-                        if pd.notna(h1): Q_hoya1[ano, mm] = float(h1)
-                        if pd.notna(h2): Q_hoya2[ano, mm] = float(h2)
-                        if pd.notna(h3): Q_hoya3[ano, mm] = float(h3)
-                except Exception:
-                    pass
-        return Q_afl, Q_nuble, Q_hoya1, Q_hoya2, Q_hoya3
+        # parseo compartido con caché .npz (ver model/hidrologia.py); se respeta una hidrología inyectada
+        if self.hidrologia is None:
+            self.hidrologia = HydrologyDataset.desde_excel(file_path)
+        return self.hidrologia
 
     def setup_restricciones(self):
         m = self.model
         data_file = "data/caudales.xlsx"
-        self.inflow, self.Q_nuble, self.Q_hoya1, self.Q_hoya2, self.Q_hoya3 = self.cargar_caudales(data_file)
-
-        derechos_MAY_ABR = [52.00,52.00,52.00,52.00,57.70,76.22,69.22,52.00,52.00,52.00,52.00,52.00]
-        qeco_MAY_ABR = [10.00,10.35,14.48,15.23,15.23,15.23,15.23,15.23,12.80,15.20,16.40,17.60]
-        self.QPD_eff = {}
-        for año in self.anos:
-            y = int(año.split('/')[0])
-            for mes in self.meses:
-                H = self.Q_hoya1.get((y,mes),0.0) + self.Q_hoya2.get((y,mes),0.0) + self.Q_hoya3.get((y,mes),0.0)
-                qpd_nom = max(derechos_MAY_ABR[mes-1], qeco_MAY_ABR[mes-1], max(0.0, 95.7 - H))
-                self.QPD_eff[año, mes] = min(qpd_nom, self.Q_nuble.get((y,mes),0.0))
+        h = self.cargar_caudales(data_file)  # QPD efectivo ya calculado en h.QPD_eff
 
         # Stock inicial como en el caso base original
         primer = self.anos[0]
@@ -140,11 +127,10 @@ class EmbalseCasoBase:
 
         for año in self.anos:
             y = int(año.split('/')[0])
+            ya = h.indice[año]
             for i, mes in enumerate(self.meses):
-                seg = self.segundos_por_mes[mes]
-                Qin_s = self.inflow.get((y,mes), 0.0)
-                Qin = Qin_s * seg / 1_000_000.0
-                UPREF = self.QPD_eff[año, mes] * seg / 1_000_000.0
+                Qin = h.Qin_Hm3[ya, i]
+                UPREF = h.QPD_eff_Hm3[ya, i]
 
                 # Demanda mensual (A y B) en Hm³/mes — SIN multiplicar por seg
                 cal_m = self.m_mayo_abril_normal[mes]  # mes calendario 1..12
@@ -205,77 +191,128 @@ class EmbalseCasoBase:
                     pass
         else:
             for año in self.anos:
-                self.model.addConstr(gp.quicksum(self.Q_ch[año, mes] for mes in self.meses) == self.V_C_H, name=f"ssr_anual_{año}")
+                self.model.addConstr(quicksum(self.Q_ch[año, mes] for mes in self.meses) == self.V_C_H, name=f"ssr_anual_{año}")
 
     def set_objective(self):
-        total_def = gp.quicksum(self.d_TOTAL[año,mes] for año in self.anos for mes in self.meses)
+        total_def = quicksum(self.d_TOTAL[año,mes] for año in self.anos for mes in self.meses)
         self.model.setObjective(total_def, GRB.MINIMIZE)
 
-    def exportar_a_excel(self, filename="resultados_caso_base.xlsx"):
-        data = []
+    def trayectoria_reglas(self):
+        """
+        Avance voraz mes a mes con las mismas reglas del MIP (llenar hasta C_TOTAL,
+        pagar SSR sobre el piso, servir la demanda con lo que queda). Se usa como MIP start;
+        devuelve dict familia -> array (n_anos, 12).
+        Como init_TOTAL, el primer mes del primer año termina con V_TOTAL = 0: se entrega todo
+        lo disponible; si eso supera la demanda ni el arranque ni el MIP son factibles y se avisa.
+        """
+        h = self.cargar_caudales("data/caudales.xlsx")
+        filas = h.filas(self.anos)
+        q_dis = h.Qin_Hm3[filas] - h.QPD_eff_Hm3[filas]
+        dem = np.array([(self.DA_a_m.get(self.m_mayo_abril_normal[mes], 0.0) * self.num_A +
+                         self.DB_a_b.get(self.m_mayo_abril_normal[mes], 0.0) * self.num_B) / 1_000_000.0
+                        for mes in self.meses])
+        ssr_mes = self.V_C_H / 12.0
+        fams = ('V_TOTAL', 'IN_TOTAL', 'E_TOT', 'Q_ch', 'Q_DEM', 'd_TOTAL', 'Q_turb', 'Q_dis', 'Rem',
+                'TopeM', 'LlenadoT', 'SSR_EXIG', 'SSR_ACUM', 'SSR_CAPVAR', 'CAP_RAW')
+        out = {f: np.zeros(q_dis.shape) for f in fams}
 
-        for año in self.anos:
+        for a, año in enumerate(self.anos):
             y = int(año.split('/')[0])
-            for mes in self.meses:
-                seg = self.segundos_por_mes[mes]
-                Qin_m3s = self.inflow.get((y,mes), 0.0)
-                Qin = Qin_m3s * seg / 1_000_000.0
-                QPD_eff_Hm3 = self.QPD_eff[año,mes] * seg / 1_000_000.0
-
-                # Demanda mensual (Hm³/mes) usando mapeo calendario y SIN seg
-                cal_m = self.m_mayo_abril_normal[mes]
-                demA = self.DA_a_m.get(cal_m, 0.0) * self.num_A / 1_000_000.0
-                demB = self.DB_a_b.get(cal_m, 0.0) * self.num_B / 1_000_000.0
-                demTOTAL = demA + demB
-
-                fila = {
-                    'Año': año, 'Mes': mes,
-                    'V_TOTAL': self.V_TOTAL[año,mes].X,
-                    'Q_dis': self.Q_dis[año,mes].X,
-                    'Q_ch': self.Q_ch[año,mes].X,
-                    'Q_DEM': self.Q_DEM[año,mes].X,
-                    'Q_turb': self.Q_turb[año,mes].X,
-                    'IN_TOTAL': self.IN_TOTAL[año,mes].X,
-                    'E_TOT': self.E_TOT[año,mes].X,
-                    'd_TOTAL': self.d_TOTAL[año,mes].X,
-                    'QPD_eff_Hm3': QPD_eff_Hm3,
-                    'DemA_Hm3': demA,
-                    'DemB_Hm3': demB,
-                    'Demanda_Total': demTOTAL,
-                    'Q_afl_m3s': Qin_m3s,
-                    'Q_afl_Hm3': Qin,
-                    'Rem': self.Rem[año,mes].X,
-                    'LlenadoT': self.LlenadoT[año,mes].X
-                }
-                
-                servTOTAL = fila['Q_DEM']
-                fila['Deficit_Total'] = fila['d_TOTAL']
-                fila['Satisfaccion_Total'] = (servTOTAL/demTOTAL*100) if demTOTAL > 0 else 100
-                data.append(fila)
-
-        df_main = pd.DataFrame(data)
-        resumen = []
-        for año in self.anos:
-            d = df_main[df_main['Año']==año]
-            resumen.append({
-                'Año': año,
-                'Deficit_Total_Anual': d['Deficit_Total'].sum(),
-                'Volumen_Turbinado_Anual': d['Q_turb'].sum(),
-                'Demanda_Total_Anual': d['Demanda_Total'].sum(),
-                'Satisfaccion_Promedio': d['Satisfaccion_Total'].mean(),
-                'Mes_Mayor_Deficit': (d.loc[d['Deficit_Total'].idxmax(),'Mes'] if d['Deficit_Total'].max()>0 else 'Ninguno')
-            })
-        df_res = pd.DataFrame(resumen)
-        
-        with pd.ExcelWriter(filename, engine='openpyxl') as w:
-            df_main.to_excel(w, sheet_name='Resultados_Detallados', index=False)
-            df_res.to_excel(w, sheet_name='Resumen_Anual', index=False)
-        
-        print(f"Resultados exportados a {filename}")
+            prev_año = f"{y-1}/{y}"
+            if prev_año in self.anos[:a]:
+                V = out['V_TOTAL'][self.anos.index(prev_año), 11]
+                backlog = out['SSR_ACUM'][self.anos.index(prev_año), 11]
+            else:
+                V, backlog = 0.0, 0.0
+            for i in range(len(self.meses)):
+                rem = q_dis[a, i]
+                tope = self.C_TOTAL - V
+                llenado = min(rem, tope)
+                exig = ssr_mes + backlog
+                cap_raw = V + llenado - self.RESERVA_MIN_VRFI
+                capvar = max(cap_raw, 0.0)
+                q_ch = min(exig, capvar)
+                backlog = exig - q_ch
+                if a == 0 and i == 0:
+                    # init_TOTAL: V_TOTAL[primer, 1] == 0
+                    q_dem = V + llenado - q_ch
+                    if q_dem > dem[i] + 1e-9:
+                        # llenado y SSR están fijos por las reglas: el MIP tampoco puede cumplirla
+                        print(f"Aviso: MIP start descartado, init_TOTAL exige entregar {q_dem:.3f} Hm³ en "
+                              f"{año} mes 1 con demanda {dem[i]:.3f} Hm³ (el MIP no es factible)")
+                    V = 0.0
+                else:
+                    q_dem = min(max(V + llenado - q_ch, 0.0), dem[i])
+                    V = V + llenado - q_dem - q_ch
+                for f, valor in (('V_TOTAL', V), ('IN_TOTAL', llenado), ('E_TOT', rem - llenado),
+                                 ('Q_ch', q_ch), ('Q_DEM', q_dem), ('d_TOTAL', dem[i] - q_dem),
+                                 ('Q_turb', q_dem + rem - llenado), ('Q_dis', rem), ('Rem', rem),
+                                 ('TopeM', tope), ('LlenadoT', llenado), ('SSR_EXIG', exig),
+                                 ('SSR_ACUM', backlog), ('SSR_CAPVAR', capvar), ('CAP_RAW', cap_raw)):
+                    out[f][a, i] = valor
+        return out
+
+    def exportar_resultados(self, filename="resultados_caso_base.xlsx"):
+        """Escribe df_detalle / df_resumen según self.output_format (ver model/salidas.py)."""
+        df_main, df_res = self.tablas_resultados()
+        archivos = escribir_tablas({'Resultados_Detallados': (df_main, False),
+                                    'Resumen_Anual': (df_res, False)}, filename, self.output_format)
+
+        if archivos:
+            print(f"Resultados exportados a {', '.join(archivos)}")
         print(f"Deficit total: {df_main['Deficit_Total'].sum():.2f} Hm³")
         print(f"Satisfaccion promedio: {df_main['Satisfaccion_Total'].mean():.1f}%")
         return df_main, df_res
 
+    def exportar_a_excel(self, filename="resultados_caso_base.xlsx"):
+        formato, self.output_format = self.output_format, "xlsx"
+        try:
+            return self.exportar_resultados(filename)
+        finally:
+            self.output_format = formato
+
+    def tablas_resultados(self):
+        """df_detalle / df_resumen armados por columnas desde self.solucion."""
+        sol = self.solucion
+        h = self.hidrologia
+        n_anos = len(self.anos)
+        filas = h.filas(self.anos)
+
+        # Demanda mensual (Hm³/mes) usando mapeo calendario y SIN seg
+        demA = np.array([self.DA_a_m.get(self.m_mayo_abril_normal[mes], 0.0) * self.num_A
+                         for mes in self.meses]) / 1_000_000.0
+        demB = np.array([self.DB_a_b.get(self.m_mayo_abril_normal[mes], 0.0) * self.num_B
+                         for mes in self.meses]) / 1_000_000.0
+        demTOTAL = np.tile(demA + demB, n_anos)
+
+        cols = {'Año': np.repeat(np.array(self.anos, dtype=object), 12), 'Mes': np.tile(self.meses, n_anos)}
+        for fam in ('V_TOTAL', 'Q_dis', 'Q_ch', 'Q_DEM', 'Q_turb', 'IN_TOTAL', 'E_TOT', 'd_TOTAL'):
+            cols[fam] = sol[fam].ravel()
+        cols['QPD_eff_Hm3'] = h.QPD_eff_Hm3[filas].ravel()
+        cols['DemA_Hm3'] = np.tile(demA, n_anos)
+        cols['DemB_Hm3'] = np.tile(demB, n_anos)
+        cols['Demanda_Total'] = demTOTAL
+        cols['Q_afl_m3s'] = h.Q_afl[filas].ravel()
+        cols['Q_afl_Hm3'] = h.Qin_Hm3[filas].ravel()
+        cols['Rem'] = sol['Rem'].ravel()
+        cols['LlenadoT'] = sol['LlenadoT'].ravel()
+        cols['Deficit_Total'] = cols['d_TOTAL']
+        cols['Satisfaccion_Total'] = porcentaje(cols['Q_DEM'], demTOTAL)
+        df_main = pd.DataFrame(cols)
+
+        deficit = sol['d_TOTAL']
+        mayor = deficit.argmax(axis=1)
+        df_res = pd.DataFrame({
+            'Año': list(self.anos),
+            'Deficit_Total_Anual': deficit.sum(axis=1),
+            'Volumen_Turbinado_Anual': sol['Q_turb'].sum(axis=1),
+            'Demanda_Total_Anual': demTOTAL.reshape(n_anos, 12).sum(axis=1),
+            'Satisfaccion_Promedio': cols['Satisfaccion_Total'].reshape(n_anos, 12).mean(axis=1),
+            'Mes_Mayor_Deficit': [self.meses[k] if deficit[a].max() > 0 else 'Ninguno'
+                                  for a, k in enumerate(mayor)],
+        })
+        return df_main, df_res
+
     def exportar_a_txt(self, filename="reporte_caso_base.txt"):
         def bar20(pct):
             n = int(round(min(max(pct,0),100) / 5.0))
@@ -283,6 +320,7 @@ class EmbalseCasoBase:
 
         mes_tag = {1:'may',2:'jun',3:'jul',4:'ago',5:'sep',6:'oct',7:'nov',8:'dic',9:'ene',10:'feb',11:'mar',12:'abr'}
         lines = []
+        sol = self.solucion
 
         # 1) KPI AGREGADOS (30 AÑOS)
         NY = len(self.anos)
@@ -304,9 +342,9 @@ class EmbalseCasoBase:
             y = int(año.split('/')[0])
             for mes in self.meses:
                 # Hidráulica
-                Qturb = self.Q_turb[año, mes].X
-                Reb = self.E_TOT[año, mes].X
-                Qdis = self.Q_dis[año, mes].X
+                Qturb = sol.x('Q_turb', año, mes)
+                Reb = sol.x('E_TOT', año, mes)
+                Qdis = sol.x('Q_dis', año, mes)
 
                 sum_q_turb_total += Qturb
                 sum_rebalse_total += Reb
@@ -320,7 +358,7 @@ class EmbalseCasoBase:
                 demA = self.DA_a_m.get(cal_m, 0.0) * self.num_A / 1_000_000.0
                 demB = self.DB_a_b.get(cal_m, 0.0) * self.num_B / 1_000_000.0
                 demT = demA + demB
-                serv = self.Q_DEM[año, mes].X
+                serv = sol.x('Q_DEM', año, mes)
 
                 dem_m[mes] += demT
                 serv_m[mes] += serv
@@ -335,7 +373,7 @@ class EmbalseCasoBase:
 
         # Último stock al final del último periodo
         ultimo_anio = self.anos[-1]
-        V_fin_total = self.V_TOTAL[ultimo_anio, 12].X  # 12 = abr (fin del ciclo mayo-abril)
+        V_fin_total = sol.x('V_TOTAL', ultimo_anio, 12)  # 12 = abr (fin del ciclo mayo-abril)
 
         lines.append("="*70)
         lines.append("RESUMEN 30 AÑOS — AGREGADOS")
@@ -380,22 +418,22 @@ class EmbalseCasoBase:
             lines.append(header1)
             lines.append("-"*100)
 
+            ya = self.hidrologia.indice[año]
             for i, mes in enumerate(self.meses):
-                seg = self.segundos_por_mes[mes]
-                Qin_m3s = self.inflow.get((y,mes), 0.0)
-                Qin_Hm3 = Qin_m3s * seg / 1_000_000.0
-                QPD_Hm3 = self.QPD_eff[año,mes] * seg / 1_000_000.0
+                Qin_m3s = self.hidrologia.Q_afl[ya, i]
+                Qin_Hm3 = self.hidrologia.Qin_Hm3[ya, i]
+                QPD_Hm3 = self.hidrologia.QPD_eff_Hm3[ya, i]
 
-                IN_TOTAL = self.IN_TOTAL[año, mes].X
-                E_TOT = self.E_TOT[año, mes].X
+                IN_TOTAL = sol.x('IN_TOTAL', año, mes)
+                E_TOT = sol.x('E_TOT', año, mes)
 
                 if i == 0:
                     prev_año = f"{y-1}/{y}"
-                    V_prev = self.V_TOTAL[prev_año,12].X if prev_año in self.anos else 0.0
+                    V_prev = sol.x('V_TOTAL', prev_año, 12) if prev_año in self.anos else 0.0
                 else:
-                    V_prev = self.V_TOTAL[año, mes-1].X
+                    V_prev = sol.x('V_TOTAL', año, mes-1)
 
-                V_fin = self.V_TOTAL[año, mes].X
+                V_fin = sol.x('V_TOTAL', año, mes)
                 pct_lleno = (V_fin / self.C_TOTAL * 100) if self.C_TOTAL > 0 else 0
                 bar = bar20(pct_lleno)
 
@@ -419,10 +457,10 @@ class EmbalseCasoBase:
                 demB = self.DB_a_b.get(cal_m, 0.0) * self.num_B / 1_000_000.0
                 demTOTAL = demA + demB
 
-                servicio = self.Q_DEM[año, mes].X
-                deficit = self.d_TOTAL[año, mes].X
-                Q_SSR = self.Q_ch[año, mes].X
-                Qturb = self.Q_turb[año, mes].X
+                servicio = sol.x('Q_DEM', año, mes)
+                deficit = sol.x('d_TOTAL', año, mes)
+                Q_SSR = sol.x('Q_ch', año, mes)
+                Qturb = sol.x('Q_turb', año, mes)
 
                 row2 = (f"{mes_tag[mes]:<4} "
                         f"{demA:8.1f} {demB:7.1f}  {demTOTAL:9.1f}  "
@@ -437,14 +475,88 @@ class EmbalseCasoBase:
         print(f"Reporte TXT escrito en {filename}")
         return filename
 
-    def solve(self):
+    # versión de la formulación y atributos que determinan la solución (clave de la caché de resultados)
+    VERSION_FORMULACION = "caso_base-1"
+    PARAMETROS_CACHE = ('anos', 'C_TOTAL', 'segundos_por_mes', 'num_A', 'num_B', 'RESERVA_MIN_VRFI',
+                        'DA_a_m', 'DB_a_b', 'm_mayo_abril_normal', 'V_C_H', 'arreglo_ssr_mensual', 'ssr_frac')
+
+    def version_formulacion(self):
+        """VERSION_FORMULACION + huella de los fuentes que arman el MIP (modelo, backend, hidrología)."""
+        return f"{self.VERSION_FORMULACION}+{huella_fuentes(type(self), nuevo_modelo, HydrologyDataset)}"
+
+    def clave_resultados(self):
+        h = self.cargar_caudales("data/caudales.xlsx")
+        f = h.filas(self.anos)
+        params = {attr: getattr(self, attr) for attr in self.PARAMETROS_CACHE}
+        params['MIPGap'] = self.model.Params.MIPGap
+        if self.solver != "gurobi":
+            params['solver'] = self.solver
+        else:
+            _, perfil_solver = perfil('caso_base', len(self.anos), self.perfil_solver)
+            if perfil_solver:
+                params['perfil_solver'] = perfil_solver
+        return CacheResultados.clave(self.version_formulacion(), params,
+                                     (h.Q_nuble[f], h.Q_hoya1[f], h.Q_hoya2[f], h.Q_hoya3[f]))
+
+    def solve(self, warm_start=False, outputs=None):
+        """
+        outputs: 'detalle', 'tablas' y/o 'txt' (ver get_solution); por defecto no escribe archivos.
+        Con self.cache_resultados se devuelve la solución guardada si la hay, sin armar el MIP.
+        Con self.telemetria, el registro de la corrida queda en sol['telemetria'].
+        """
+        tel = self.telemetria
+        if tel is None:
+            return self._resolver(warm_start, outputs)
+        tel.iniciar(modelo=type(self).__name__, solver=self.solver, anos=len(self.anos))
+        try:
+            sol = self._resolver(warm_start, outputs)
+        finally:
+            tel.terminar()
+        if sol is not None:
+            sol['telemetria'] = tel.datos
+        return sol
+
+    def _resolver(self, warm_start=False, outputs=None):
+        outputs = normalizar_salidas(outputs, self.ARTEFACTOS, self.RUTAS_SALIDA)
+        tel = self.telemetria
+        cache = self.cache_resultados
+        if cache is not None:
+            with fase(tel, 'cache'):
+                clave = self.clave_resultados()
+                guardada = cache.get(clave)
+            if guardada is not None:
+                valores, resumen = guardada
+                print(f"Solución desde la caché de resultados ({clave[:12]})")
+                self.solucion = Solution(valores, self.anos, self.meses, **resumen, desde_cache=True)
+                return self.get_solution(outputs, resumen=self.solucion.resumen)
         try:
             data_file = "data/caudales.xlsx"
-            self.inflow, self.Q_nuble, self.Q_hoya1, self.Q_hoya2, self.Q_hoya3 = self.cargar_caudales(data_file)
-            self.setup_variables()
-            self.setup_restricciones()
-            self.set_objective()
-            self.model.optimize()
+            with fase(tel, 'carga'):
+                self.cargar_caudales(data_file)
+            if tel is not None:
+                model, self.model = self.model, tel.cronometrar(self.model)
+            try:
+                with fase(tel, 'variables'):
+                    self.setup_variables()
+                with fase(tel, 'restricciones'):
+                    self.setup_restricciones()
+                with fase(tel, 'objetivo'):
+                    self.set_objective()
+            finally:
+                if tel is not None:
+                    self.model = model
+            self.parametros_perfil = aplicar_perfil(self.model, 'caso_base', len(self.anos), self.perfil_solver)
+            if self.parametros_perfil:
+                print(f"Perfil de Gurobi ({len(self.anos)} años): {self.parametros_perfil}")
+            if tel is not None:
+                with tel.fase('censo'):
+                    self.model.update()
+                    tel.tomar_censo(self.model)
+            if warm_start:
+                with fase(tel, 'warm_start'):
+                    n_start = cargar_inicio(self.model, self.trayectoria_reglas(), self.anos, self.meses)
+                print(f"MIP start desde reglas: {n_start} variables")
+            optimizar(tel, self.model)
             if self.model.status in (GRB.OPTIMAL, GRB.SUBOPTIMAL):
                 print(f"\nMETRICAS DE OPTIMIZACIÓN:")
                 print(f"   - Status: {self.model.status}")
@@ -452,27 +564,58 @@ class EmbalseCasoBase:
                 print(f"   - Tiempo de resolucion: {self.model.Runtime:.2f} segundos")
                 print(f"   - Gap de optimalidad: {self.model.MIPGap * 100:.6f}%")
                 print(f"   - Nodos explorados: {self.model.NodeCount}")
-                return self.get_solution()
+                sol = self.get_solution(outputs)
+                if cache is not None:
+                    cache.put(clave, self.solucion.valores, self.solucion.resumen, version=self.version_formulacion())
+                return sol
             print(f"Modelo no resuelto optimalmente. Status: {self.model.status}")
             return None
         except Exception as e:
             print(f"Error al resolver el modelo: {e}")
             return None
 
-    def get_solution(self):
-        sol = {'status': self.model.status, 'obj_val': self.model.objVal}
-        df_det, df_res = self.exportar_a_excel()
-        sol['df_detalle'] = df_det
-        sol['df_resumen'] = df_res
-        txt_file = self.exportar_a_txt()
-        sol['txt_file'] = txt_file
+    # Familias que leen exportar_a_excel / exportar_a_txt
+    FAMILIAS_RESULTADO = ('V_TOTAL', 'Q_dis', 'Q_ch', 'Q_DEM', 'Q_turb', 'IN_TOTAL', 'E_TOT', 'd_TOTAL',
+                          'Rem', 'LlenadoT')
+
+    # artefactos de solve(outputs=...), como en EmbalseNuevaPunilla (sin KPIs de intervalo)
+    ARTEFACTOS = ('detalle', 'tablas', 'txt')
+    RUTAS_SALIDA = {'tablas': "resultados_caso_base.xlsx", 'txt': "reporte_caso_base.txt"}
+
+    def get_solution(self, outputs=None, resumen=None):
+        """resumen: status/obj_val de una solución ya cargada en self.solucion (caché); None = leer el MIP."""
+        outputs = normalizar_salidas(outputs, self.ARTEFACTOS, self.RUTAS_SALIDA)
+        tel = self.telemetria
+        if resumen is None:
+            resumen = {'status': self.model.status, 'obj_val': self.model.objVal}
+            # una sola lectura de .X (getAttr) para los dos exportadores
+            with fase(tel, 'extraccion'):
+                self.solucion = Solution.desde_modelo(self.model, {fam: getattr(self, fam) for fam in self.FAMILIAS_RESULTADO},
+                                                      self.anos, self.meses, **resumen)
+        sol = dict(resumen)
+        sol['solucion'] = self.solucion
+        if 'tablas' in outputs:
+            with fase(tel, 'export_tablas'):
+                sol['df_detalle'], sol['df_resumen'] = self.exportar_resultados(outputs['tablas'])
+        elif 'detalle' in outputs:
+            with fase(tel, 'tablas'):
+                sol['df_detalle'], sol['df_resumen'] = self.tablas_resultados()
+        if 'txt' in outputs:
+            with fase(tel, 'export_txt'):
+                sol['txt_file'] = self.exportar_a_txt(outputs['txt'])
         return sol
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resuelve el caso base del embalse")
+    parser.add_argument("--cache-resultados", metavar="DIR", default=None,
+                        help="toma/guarda la solución en DIR (model/cache_resultados.py)")
+    args = parser.parse_args()
     print("Iniciando modelo de caso base...")
     modelo = EmbalseCasoBase()
-    solucion = modelo.solve()
+    if args.cache_resultados:
+        modelo.cache_resultados = CacheResultados(args.cache_resultados)
+    solucion = modelo.solve(outputs=('tablas', 'txt'))
     if solucion:
         print("Modelo resuelto exitosamente!")
         print(f"Valor objetivo: {solucion['obj_val']:.4f}")
@@ -1,9 +1,15 @@
 # main.py
+import argparse
+
+from model.cache_resultados import CacheResultados
 from model.modelito2 import EmbalseNuevaPunilla
 
-def main():
+def main(cache_resultados=None):
     embalse_model = EmbalseNuevaPunilla()
-    solucion = embalse_model.solve()
+    if cache_resultados:
+        # re-ejecutar con los mismos datos, parámetros y código toma la solución de la caché (ver README)
+        embalse_model.cache_resultados = CacheResultados(cache_resultados)
+    solucion = embalse_model.solve(outputs=('tablas', 'txt'))
     if solucion:
         print("✓ Modelo resuelto exitosamente")
         print(f"Valor objetivo (déficit total): {solucion['obj_val']:.2f} Hm³")
@@ -22,4 +28,7 @@ def main():
         print(" Error al resolver el modelo")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Resuelve el modelo del Embalse Nueva Punilla")
+    parser.add_argument("--cache-resultados", metavar="DIR", default=None,
+                        help="toma/guarda la solución en DIR (model/cache_resultados.py)")
+    main(parser.parse_args().cache_resultados)
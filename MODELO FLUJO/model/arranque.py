@@ -0,0 +1,44 @@
+# model/arranque.py
+# MIP start (warm start) a partir de una trayectoria simulada de las reglas de operación.
+#
+# Los modelos nombran sus variables familia[ano,mes] (addVars / addMVar) o
+# familia_ano_mes (auxiliares creadas con addVar mes a mes), así que la misma función
+# sirve para los tres constructores de modelito2, para caso_base y para monte_carlo.
+# Las familias que un modelo no tiene (p. ej. las derivadas de la formulación lean)
+# simplemente se saltan; Gurobi completa el resto del punto de partida.
+import numpy as np
+
+
+def cargar_inicio(model, trayectoria, anos, meses, alias=None, binarias=()):
+    """
+    Fija Start = trayectoria[familia][a, i] en cada variable del modelo que exista
+    y VarHintVal en las familias `binarias`.
+
+    trayectoria: dict familia -> array (n_anos, 12) alineado con anos x meses.
+    alias: dict familia -> nombre de la familia en el modelo (si difiere).
+    Devuelve el número de variables con Start.
+    """
+    model.update()
+    alias = alias or {}
+    variables, valores = [], []
+    pistas, valores_pista = [], []
+    for fam, arr in trayectoria.items():
+        nombre = alias.get(fam, fam)
+        arr = np.asarray(arr, dtype=float)
+        for a, ano in enumerate(anos):
+            for i, mes in enumerate(meses):
+                var = model.getVarByName(f"{nombre}[{ano},{mes}]")
+                if var is None:
+                    var = model.getVarByName(f"{nombre}_{ano}_{mes}")
+                if var is None:
+                    continue
+                variables.append(var)
+                valores.append(float(arr[a, i]))
+                if fam in binarias:
+                    pistas.append(var)
+                    valores_pista.append(float(arr[a, i]))
+    if variables:
+        model.setAttr("Start", variables, valores)
+    if pistas:
+        model.setAttr("VarHintVal", pistas, valores_pista)
+    return len(variables)
@@ -0,0 +1,219 @@
+# model/cache_resultados.py
+# Caché persistente de soluciones completas, direccionada por contenido.
+#
+# main_modelito2.py, caso_base.py y el barrido de sensibilidad se vuelven a correr una y
+# otra vez con los mismos datos. CacheResultados guarda la solución de cada corrida (un
+# array (n_anos, 12) por familia y el resumen del solver) en un .npz cuyo nombre es el
+# SHA-256 de todo lo que la determina: versión de la formulación (con la huella del código
+# fuente que la arma), parámetros del modelo e hidrología de los años resueltos. Un acierto devuelve los arrays sin tocar Gurobi.
+# El directorio se mantiene bajo max_bytes borrando las entradas usadas hace más tiempo.
+#
+#   python model/cache_resultados.py [--dir DIR] listar | info | podar [--max-mb N] [--dias D] | limpiar
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
+
+import numpy as np
+
+EXTENSION = ".npz"
+
+
+def _json_valor(x):
+    if isinstance(x, np.generic):
+        return x.item()
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    raise TypeError(f"{type(x).__name__} no es serializable en la clave de la caché")
+
+
+# archivo fuente -> (mtime_ns, tamaño, sha256) ya calculados en este proceso
+_HUELLAS = {}
+
+
+def huella_fuentes(*fuentes):
+    """
+    SHA-256 (16 hex) del contenido de los archivos fuente (rutas, o módulos/clases/funciones
+    cuyo archivo se busca con inspect). Entra en la versión de la clave: editar la
+    formulación invalida la caché aunque no se suba VERSION_FORMULACION.
+    """
+    h = hashlib.sha256()
+    for fuente in fuentes:
+        ruta = os.path.abspath(fuente if isinstance(fuente, str) else inspect.getsourcefile(fuente))
+        st = os.stat(ruta)
+        guardada = _HUELLAS.get(ruta)
+        if guardada is None or guardada[:2] != (st.st_mtime_ns, st.st_size):
+            with open(ruta, "rb") as f:
+                guardada = (st.st_mtime_ns, st.st_size, hashlib.sha256(f.read()).hexdigest())
+            _HUELLAS[ruta] = guardada
+        h.update(guardada[2].encode())
+    return h.hexdigest()[:16]
+
+
+class CacheResultados:
+    """
+    directorio: un archivo <clave>.npz por solución, con los arrays de las familias y un
+    campo _meta (JSON: resumen del solver, parámetros, versión, fecha de creación).
+    max_bytes: tamaño máximo del directorio; al superarlo put() borra las entradas con
+    el mtime más antiguo (get() lo actualiza en cada acierto, así que es un LRU).
+    Varios procesos pueden compartir el directorio: cada entrada se escribe en un archivo
+    temporal y se renombra (os.replace) ya completa.
+    """
+
+    def __init__(self, directorio="cache_resultados", max_bytes=512 * 2**20):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.aciertos = 0
+        self.fallos = 0
+        os.makedirs(directorio, exist_ok=True)
+        self._bytes = sum(e['bytes'] for e in self._archivos())
+
+    def __len__(self):
+        return len(self._archivos())
+
+    def __repr__(self):
+        return (f"CacheResultados({self.directorio!r}, {self.aciertos} aciertos, {self.fallos} fallos, "
+                f"{self._bytes / 2**20:.1f}/{self.max_bytes / 2**20:.0f} MB)")
+
+    @staticmethod
+    def clave(version, parametros, arrays=()):
+        """
+        SHA-256 (hex) de la versión de la formulación, el dict de parámetros (en JSON con
+        claves ordenadas; los float se escriben con todos sus dígitos) y los bytes, forma y
+        dtype de cada array de datos.
+        """
+        h = hashlib.sha256()
+        h.update(str(version).encode())
+        h.update(json.dumps(parametros, sort_keys=True, default=_json_valor).encode())
+        for arr in arrays:
+            arr = np.ascontiguousarray(arr)
+            h.update(f"{arr.dtype.str}{arr.shape}".encode())
+            h.update(arr.tobytes())
+        return h.hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave + EXTENSION)
+
+    def _archivos(self):
+        entradas = []
+        with os.scandir(self.directorio) as it:
+            for e in it:
+                if e.name.endswith(EXTENSION) and e.is_file():
+                    st = e.stat()
+                    entradas.append({'clave': e.name[:-len(EXTENSION)], 'bytes': st.st_size,
+                                     'usado': st.st_mtime, 'ruta': e.path})
+        return entradas
+
+    def get(self, clave):
+        """(valores, resumen) guardados para la clave, o None; cuenta aciertos/fallos."""
+        ruta = self._ruta(clave)
+        try:
+            with np.load(ruta, allow_pickle=False) as npz:
+                valores = {fam: npz[fam] for fam in npz.files if fam != '_meta'}
+                meta = json.loads(str(npz['_meta']))
+        except (OSError, ValueError, KeyError):
+            # no existe, o la borró/dejó a medias otro proceso: se resuelve de nuevo
+            self.fallos += 1
+            return None
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+        self.aciertos += 1
+        return valores, meta['resumen']
+
+    def put(self, clave, valores, resumen, parametros=None, version=None):
+        """Guarda la solución (dict familia -> array) con su resumen; devuelve la ruta."""
+        meta = {'resumen': resumen, 'parametros': parametros, 'version': version, 'creado': time.time()}
+        ruta = self._ruta(clave)
+        tmp = f"{ruta}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, _meta=np.array(json.dumps(meta, sort_keys=True, default=_json_valor)),
+                     **{fam: np.asarray(arr, dtype=float) for fam, arr in valores.items()})
+        try:
+            anterior = os.path.getsize(ruta)  # se sobrescribe una entrada existente
+        except OSError:
+            anterior = 0
+        os.replace(tmp, ruta)
+        self._bytes += os.path.getsize(ruta) - anterior
+        if self._bytes > self.max_bytes:
+            self.podar()
+        return ruta
+
+    def entradas(self):
+        """Lista de dicts (clave, bytes, usado, creado, version, resumen), de la más reciente a la más antigua."""
+        filas = []
+        for e in self._archivos():
+            try:
+                with np.load(e['ruta'], allow_pickle=False) as npz:
+                    meta = json.loads(str(npz['_meta']))
+            except (OSError, ValueError, KeyError):
+                meta = {}
+            filas.append({'clave': e['clave'], 'bytes': e['bytes'], 'usado': e['usado'],
+                          'creado': meta.get('creado'), 'version': meta.get('version'),
+                          'resumen': meta.get('resumen', {})})
+        return sorted(filas, key=lambda f: f['usado'], reverse=True)
+
+    def podar(self, max_bytes=None, antiguedad=None):
+        """
+        Borra las entradas menos usadas hasta quedar bajo max_bytes (por defecto self.max_bytes)
+        y, con antiguedad (segundos), las no usadas en ese lapso. Devuelve cuántas borró.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        archivos = sorted(self._archivos(), key=lambda e: e['usado'])
+        total = sum(e['bytes'] for e in archivos)
+        limite = time.time() - antiguedad if antiguedad is not None else None
+        borradas = 0
+        for e in archivos:
+            if total <= max_bytes and (limite is None or e['usado'] >= limite):
+                continue
+            try:
+                os.remove(e['ruta'])
+            except FileNotFoundError:
+                pass
+            total -= e['bytes']
+            borradas += 1
+        self._bytes = total
+        return borradas
+
+    def limpiar(self):
+        return self.podar(max_bytes=0)
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {'aciertos': self.aciertos, 'fallos': self.fallos, 'entradas': len(self), 'bytes': self._bytes,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspecciona y poda la caché de resultados de solve()")
+    parser.add_argument("--dir", default="cache_resultados", help="directorio de la caché")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("listar", help="una línea por solución guardada (de la más a la menos reciente)")
+    sub.add_parser("info", help="número de entradas y tamaño total")
+    p_podar = sub.add_parser("podar", help="borra las entradas menos usadas")
+    p_podar.add_argument("--max-mb", type=float, default=None, help="tamaño máximo a conservar (MB)")
+    p_podar.add_argument("--dias", type=float, default=None, help="borra además las no usadas en D días")
+    sub.add_parser("limpiar", help="borra todas las entradas")
+    args = parser.parse_args()
+
+    cache = CacheResultados(args.dir)
+    if args.comando == "listar":
+        for e in cache.entradas():
+            r = e['resumen']
+            obj = f"{r['obj_val']:.4f}" if r.get('obj_val') is not None else "-"
+            print(f"{e['clave'][:16]}  {e['bytes'] / 1024:8.1f} KB  "
+                  f"usado {time.strftime('%Y-%m-%d %H:%M', time.localtime(e['usado']))}  "
+                  f"{e['version'] or '-':<14} obj {obj}")
+    elif args.comando == "info":
+        e = cache.estadisticas()
+        print(f"{cache.directorio}: {e['entradas']} entradas, {e['bytes'] / 2**20:.2f} MB "
+              f"(máximo {cache.max_bytes / 2**20:.0f} MB)")
+    elif args.comando == "podar":
+        max_bytes = args.max_mb * 2**20 if args.max_mb is not None else None
+        antiguedad = args.dias * 86400 if args.dias is not None else None
+        print(f"{cache.podar(max_bytes, antiguedad)} entradas borradas; quedan {len(cache)}")
+    else:
+        print(f"{cache.limpiar()} entradas borradas")
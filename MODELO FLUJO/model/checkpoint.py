@@ -0,0 +1,105 @@
+# model/checkpoint.py
+# Avance de corridas largas (Monte Carlo, barrido de sensibilidad) en disco.
+#
+# Los resultados vivían sólo en memoria hasta el final de la corrida: un corte, un problema
+# con la licencia o un Ctrl-C perdía horas de MIP resueltos. Checkpoint agrega cada
+# resultado terminado a un archivo JSON Lines (sólo se agregan líneas, nunca se reescribe)
+# y con resume=True lo relee para saltarse las claves ya completadas.
+import json
+import os
+
+import numpy as np
+
+
+def _json_valor(x):
+    # escalares NumPy (np.float64 ya es float; np.int64, np.bool_ no) y arrays
+    if isinstance(x, np.generic):
+        return x.item()
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    raise TypeError(f"{type(x).__name__} no es serializable en el checkpoint")
+
+
+def _hashable(x):
+    """Listas de JSON (tuplas al escribir) -> tuplas, para usar la clave en un dict."""
+    return tuple(_hashable(e) for e in x) if isinstance(x, (list, tuple)) else x
+
+
+class Checkpoint:
+    """
+    archivo: JSON Lines con una línea {"clave": {...}, "fila": {...}} por resultado.
+    resume=False empieza el archivo de nuevo; resume=True carga las filas ya escritas
+    (una última línea cortada a medio escribir se descarta) y sigue agregando al final.
+    Las claves son dicts campo -> valor; se comparan por sus valores en orden.
+    """
+
+    def __init__(self, archivo, resume=False):
+        self.archivo = archivo
+        self.filas = {}
+        self.descartadas = 0
+        if resume and os.path.exists(archivo):
+            self._cargar()
+        elif os.path.dirname(archivo):
+            os.makedirs(os.path.dirname(archivo), exist_ok=True)
+        self._f = open(archivo, "a" if resume else "w", encoding="utf-8")
+        if resume and self._f.tell() > 0 and not self._termina_en_linea():
+            self._f.write("\n")
+
+    def __repr__(self):
+        return f"Checkpoint({self.archivo!r}, {len(self.filas)} completados)"
+
+    def __len__(self):
+        return len(self.filas)
+
+    def __contains__(self, clave):
+        return self._clave(clave) in self.filas
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    @staticmethod
+    def _clave(clave):
+        return _hashable(tuple(clave.values()))
+
+    def _termina_en_linea(self):
+        with open(self.archivo, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _cargar(self):
+        with open(self.archivo, encoding="utf-8") as f:
+            for linea in f:
+                if not linea.strip():
+                    continue
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    # la corrida se cortó escribiendo esta línea: ese resultado se vuelve a calcular
+                    self.descartadas += 1
+                    continue
+                self.filas[self._clave(registro['clave'])] = registro['fila']
+
+    def get(self, clave):
+        return self.filas.get(self._clave(clave))
+
+    def agregar(self, clave, fila):
+        """Escribe una fila terminada (y la deja en el SO: flush por línea)."""
+        self._f.write(json.dumps({'clave': clave, 'fila': fila}, ensure_ascii=False, default=_json_valor) + "\n")
+        self._f.flush()
+        self.filas[self._clave(clave)] = fila
+
+    def agregar_varias(self, claves, filas):
+        """Como agregar, con un solo flush (motores en lote)."""
+        for clave, fila in zip(claves, filas):
+            self._f.write(json.dumps({'clave': clave, 'fila': fila}, ensure_ascii=False, default=_json_valor) + "\n")
+            self.filas[self._clave(clave)] = fila
+        self._f.flush()
+
+    def cerrar(self):
+        if not self._f.closed:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._f.close()
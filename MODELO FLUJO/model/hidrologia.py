@@ -0,0 +1,174 @@
+# model/hidrologia.py
+# Lectura única de data/caudales.xlsx con caché binaria (.npz).
+#
+# Los tres modelos (modelito2, caso_base, monte_carlo) leían el Excel por su cuenta
+# con openpyxl + iterrows. Aquí se parsea una sola vez a arrays (n_anos, 12) en orden
+# MAY–ABR; la caché se invalida si cambian el mtime/tamaño del xlsx y su hash.
+import hashlib
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+ARCHIVO_CAUDALES = "data/caudales.xlsx"
+
+EXCEL_COLUMNAS = ['MAY', 'JUN', 'JUL', 'AGO', 'SEP', 'OCT', 'NOV', 'DIC', 'ENE', 'FEB', 'MAR', 'ABR']
+
+# (nombre, skiprows) de cada bloque de Hoja1
+BLOQUES = (('Q_nuble', 4), ('Q_hoya1', 39), ('Q_hoya2', 75), ('Q_hoya3', 110))
+
+# Cachés ya leídas en este proceso: ruta absoluta -> (firma, dict de arrays)
+_MEMORIA = {}
+
+
+def _ruta_cache(file_path):
+    base, _ = os.path.splitext(file_path)
+    return base + ".npz"
+
+
+def _sha256(file_path):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _guardar_cache(ruta_cache, **arrays):
+    # archivo temporal + os.replace: un corte o dos procesos escribiendo a la vez no dejan
+    # un .npz a medias
+    tmp = f"{ruta_cache}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, ruta_cache)
+
+
+def parsear_excel(file_path=ARCHIVO_CAUDALES):
+    """
+    Lee los cuatro bloques de Hoja1. Devuelve dict con 'anos' (etiquetas 'AAAA/AAAA')
+    y arrays float64 (n_anos, 12) 'Q_nuble', 'Q_hoya1..3' (NaN donde falta el dato).
+    """
+    xls = pd.ExcelFile(file_path)
+    hojas = {nombre: pd.read_excel(xls, sheet_name='Hoja1', skiprows=skip, nrows=31)
+             for nombre, skip in BLOQUES}
+    nuble = hojas['Q_nuble']
+
+    anos, filas = [], []
+    for idx, valor in nuble['AÑO'].items():
+        ano_str = str(valor)
+        if (pd.notna(valor) and '/' in ano_str
+                and not any(w in ano_str.upper() for w in ['PROMEDIO', 'TOTAL', 'MAX', 'MIN'])):
+            try:
+                int(ano_str.split('/')[0])
+            except ValueError:
+                continue
+            anos.append(ano_str)
+            filas.append(idx)
+
+    datos = {'anos': np.array(anos)}
+    for nombre, _ in BLOQUES:
+        tabla = hojas[nombre].loc[filas, EXCEL_COLUMNAS]
+        datos[nombre] = tabla.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    return datos
+
+
+def cargar_hidrologia(file_path=ARCHIVO_CAUDALES, usar_cache=True):
+    """
+    Devuelve el dict de parsear_excel, leyendo desde la caché .npz junto al xlsx
+    (data/caudales.npz) y reparseando sólo si el Excel cambió.
+    """
+    st = os.stat(file_path)
+    firma = (st.st_mtime_ns, st.st_size)
+    clave = os.path.abspath(file_path)
+
+    if usar_cache and clave in _MEMORIA and _MEMORIA[clave][0] == firma:
+        return _MEMORIA[clave][1]
+
+    ruta_cache = _ruta_cache(file_path)
+    datos = None
+    if usar_cache and os.path.exists(ruta_cache):
+        try:
+            with np.load(ruta_cache, allow_pickle=False) as npz:
+                guardado = {k: npz[k] for k in npz.files}
+            firma_guardada = (int(guardado['mtime_ns']), int(guardado['size']))
+            if firma_guardada == firma:
+                datos = guardado
+            elif str(guardado['sha256']) == _sha256(file_path):
+                # mismo contenido con otro mtime (p. ej. tras un checkout): sólo refrescar firma
+                datos = guardado
+                datos['mtime_ns'], datos['size'] = np.array(firma[0]), np.array(firma[1])
+                _guardar_cache(ruta_cache, **datos)
+        except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+            # caché cortada o corrupta: se reparsea el Excel y se reescribe
+            datos = None
+
+    if datos is None:
+        datos = parsear_excel(file_path)
+        if usar_cache:
+            _guardar_cache(ruta_cache, mtime_ns=np.array(firma[0]), size=np.array(firma[1]),
+                           sha256=np.array(_sha256(file_path)), **datos)
+
+    datos = {k: datos[k] for k in ('anos',) + tuple(n for n, _ in BLOQUES)}
+    if usar_cache:
+        _MEMORIA[clave] = (firma, datos)
+    return datos
+
+
+class HydrologyDataset:
+    """
+    Hidrología histórica en arrays float64 contiguos (n_anos, 12), indexados por
+    (posición del año en `anos`, mes-1) con meses MAY..ABR. Una sola instancia puede
+    inyectarse en varios modelos (EmbalseNuevaPunilla, EmbalseCasoBase, MonteCarloEmbalse).
+
+    Atributos (caudales en m³/s, volúmenes en Hm³/mes):
+      anos, indice            etiquetas 'AAAA/AAAA' <-> posición
+      Q_afl, Q_nuble          caudal afluente (Ñuble)
+      Q_hoya1..3, H           hoyas intermedias y su suma
+      segundos                (12,) segundos de cada mes
+      QPD_eff, QPD_eff_Hm3    caudal pasante efectivo
+      Qin_Hm3                 afluente mensual
+    Los datos faltantes del Excel valen 0.0, igual que los .get(..., 0.0) previos.
+    """
+
+    SEGUNDOS_MES = np.array([31, 30, 31, 31, 30, 31, 30, 31, 31, 28, 31, 30]) * 24 * 3600
+    DERECHOS_MAY_ABR = np.array([52.00, 52.00, 52.00, 52.00, 57.70, 76.22, 69.22, 52.00, 52.00, 52.00, 52.00, 52.00])
+    QECO_MAY_ABR = np.array([10.00, 10.35, 14.48, 15.23, 15.23, 15.23, 15.23, 15.23, 12.80, 15.20, 16.40, 17.60])
+
+    def __init__(self, anos, Q_nuble, Q_hoya1, Q_hoya2, Q_hoya3):
+        self.anos = tuple(str(a) for a in anos)
+        self.indice = {a: k for k, a in enumerate(self.anos)}
+
+        def _arr(x):
+            return np.ascontiguousarray(np.nan_to_num(np.asarray(x, dtype=float), nan=0.0))
+
+        self.Q_nuble = _arr(Q_nuble)
+        self.Q_afl = self.Q_nuble
+        self.Q_hoya1 = _arr(Q_hoya1)
+        self.Q_hoya2 = _arr(Q_hoya2)
+        self.Q_hoya3 = _arr(Q_hoya3)
+        self.H = self.Q_hoya1 + self.Q_hoya2 + self.Q_hoya3
+
+        self.segundos = self.SEGUNDOS_MES.copy()
+        qpd_nom = np.maximum(np.maximum(self.DERECHOS_MAY_ABR, self.QECO_MAY_ABR),
+                             np.maximum(0.0, 95.7 - self.H))
+        self.QPD_eff = np.minimum(qpd_nom, self.Q_nuble)
+        self.QPD_eff_Hm3 = self.QPD_eff * self.segundos / 1_000_000.0
+        self.Qin_Hm3 = self.Q_afl * self.segundos / 1_000_000.0
+
+    @classmethod
+    def desde_excel(cls, file_path=ARCHIVO_CAUDALES, usar_cache=True):
+        return cls(**cargar_hidrologia(file_path, usar_cache=usar_cache))
+
+    def __len__(self):
+        return len(self.anos)
+
+    def filas(self, anos):
+        """Posiciones (array int) de una lista de etiquetas de año."""
+        return np.array([self.indice[a] for a in anos], dtype=int)
+
+    def subconjunto(self, anos, etiquetas=None):
+        """Dataset con las filas de `anos` en ese orden, opcionalmente rotuladas con `etiquetas`."""
+        f = self.filas(anos)
+        return HydrologyDataset(etiquetas if etiquetas is not None else anos,
+                                self.Q_nuble[f], self.Q_hoya1[f], self.Q_hoya2[f], self.Q_hoya3[f])
@@ -0,0 +1,808 @@
+# model/milp.py
+# Capa de solver de los MIP de modelito2, caso_base y monte_carlo.
+#
+# Las tres formulaciones se escriben con la API de gurobipy (addVars/addConstr, addMVar/addMConstr,
+# addGenConstrMin/Max/Indicator). nuevo_modelo(nombre, solver) devuelve un gp.Model (solver="gurobi")
+# o un ModeloHiGHS (solver="highs"): el mismo subconjunto de la API sobre expresiones lineales
+# propias, resuelto con scipy.optimize.milp (HiGHS), sin gurobipy ni licencia. Al optimizar,
+# ModeloHiGHS linealiza las restricciones generales con binarias y big-M:
+#   y = max(x1, ..., c): y >= xi, y >= c  y  y <= xi + Mi (1 - bi), una binaria por argumento
+#                        (sum bi = 1; con dos argumentos basta una binaria b y 1 - b);
+#   y = min(...):        lo mismo con los signos al revés;
+#   z = v -> a·x <= r:   a·x <= r + M (1 - z)  (r + M z si v = 0), y análogo para >= e =.
+# Cada M sale de las cotas de las variables, ajustadas antes por propagación sobre las filas
+# lineales y las propias min/max (esas cotas sólo se usan para M, no se agregan al modelo);
+# si alguna queda infinita se usa ModeloHiGHS.COTA_BIG_M y se avisa.
+# Start y VarHintVal (MIP start) se aceptan y se ignoran: scipy.optimize.milp no los recibe.
+import itertools
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+try:
+    import gurobipy as gp
+    from gurobipy import GRB, GurobiError
+except ImportError:  # sin gurobipy sólo queda solver="highs"
+    gp = None
+
+    class GRB:
+        """Constantes de gurobipy que usan los modelos (mismos valores)."""
+        CONTINUOUS, BINARY, INTEGER = 'C', 'B', 'I'
+        LESS_EQUAL, GREATER_EQUAL, EQUAL = '<', '>', '='
+        INFINITY = 1e100
+        MINIMIZE, MAXIMIZE = 1, -1
+        LOADED, OPTIMAL, INFEASIBLE, INF_OR_UNBD, UNBOUNDED = 1, 2, 3, 4, 5
+        ITERATION_LIMIT, NODE_LIMIT, TIME_LIMIT, INTERRUPTED, NUMERIC, SUBOPTIMAL = 7, 8, 9, 11, 12, 13
+        GENCONSTR_MAX, GENCONSTR_MIN, GENCONSTR_INDICATOR = 0, 1, 7
+
+    class GurobiError(Exception):
+        pass
+
+SOLVERS = ('gurobi', 'highs')
+
+
+def nuevo_entorno(solver="gurobi"):
+    """gp.Env(empty=True) o EntornoHiGHS; se configura con setParam(...) y start()."""
+    if solver == "gurobi":
+        return gp.Env(empty=True)
+    if solver == "highs":
+        return EntornoHiGHS()
+    raise ValueError(f"solver desconocido: {solver!r} (use 'gurobi' o 'highs')")
+
+
+def nuevo_modelo(nombre="", solver="gurobi", env=None):
+    """gp.Model (solver="gurobi") o ModeloHiGHS (solver="highs"), vacío."""
+    if solver == "gurobi":
+        if gp is None:
+            raise ImportError("solver='gurobi' requiere gurobipy (use solver='highs')")
+        return gp.Model(nombre, env=env)
+    if solver == "highs":
+        return ModeloHiGHS(nombre, env=env)
+    raise ValueError(f"solver desconocido: {solver!r} (use 'gurobi' o 'highs')")
+
+
+def es_variable(obj):
+    """True para una variable de cualquiera de los dos solvers."""
+    return isinstance(obj, Var) or (gp is not None and isinstance(obj, gp.Var))
+
+
+def quicksum(terminos):
+    """gp.quicksum para variables de Gurobi; suma en una sola LinExpr para las de ModeloHiGHS."""
+    terminos = iter(terminos)
+    primero = next(terminos, 0.0)
+    if gp is not None and not isinstance(primero, (Var, LinExpr)):
+        return gp.quicksum(itertools.chain([primero], terminos))
+    total = LinExpr()
+    total += primero
+    for t in terminos:
+        total += t
+    return total
+
+
+tupledict = gp.tupledict if gp is not None else dict
+
+
+# ----------------------------------------------------------------------
+# Expresiones
+# ----------------------------------------------------------------------
+
+class LinExpr:
+    """const + sum(coef * variable); un índice puede repetirse (se suma al armar la matriz)."""
+    __slots__ = ('idx', 'coef', 'const')
+    __array_ufunc__ = None  # np.float64 + expr -> expr.__radd__
+    __hash__ = None
+
+    def __init__(self, idx=(), coef=(), const=0.0):
+        self.idx = list(idx)
+        self.coef = list(coef)
+        self.const = float(const)
+
+    def __iadd__(self, otro):
+        if isinstance(otro, Var):
+            self.idx.append(otro.idx)
+            self.coef.append(1.0)
+        elif isinstance(otro, LinExpr):
+            self.idx.extend(otro.idx)
+            self.coef.extend(otro.coef)
+            self.const += otro.const
+        else:
+            self.const += float(otro)
+        return self
+
+    def __add__(self, otro):
+        return LinExpr(self.idx, self.coef, self.const).__iadd__(otro)
+
+    __radd__ = __add__
+
+    def __mul__(self, k):
+        if isinstance(k, (Var, LinExpr)):
+            raise TypeError("ModeloHiGHS sólo admite expresiones lineales")
+        k = float(k)
+        return LinExpr(self.idx, [c * k for c in self.coef], self.const * k)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, k):
+        return self * (1.0 / float(k))
+
+    def __neg__(self):
+        return self * -1.0
+
+    def __sub__(self, otro):
+        return self + (-_expr(otro))
+
+    def __rsub__(self, otro):
+        return _expr(otro) + (-self)
+
+    def __le__(self, otro):
+        return TempConstr(self - otro, GRB.LESS_EQUAL)
+
+    def __ge__(self, otro):
+        return TempConstr(self - otro, GRB.GREATER_EQUAL)
+
+    def __eq__(self, otro):
+        return TempConstr(self - otro, GRB.EQUAL)
+
+
+def _expr(x):
+    if isinstance(x, LinExpr):
+        return x
+    if isinstance(x, Var):
+        return LinExpr([x.idx], [1.0])
+    return LinExpr(const=x)
+
+
+class TempConstr:
+    """expr <sentido> 0, resultado de comparar expresiones (como el TempConstr de gurobipy)."""
+    __slots__ = ('expr', 'sentido')
+
+    def __init__(self, expr, sentido):
+        self.expr = expr
+        self.sentido = sentido
+
+
+class Var:
+    """Columna de un ModeloHiGHS."""
+    __slots__ = ('_modelo', 'idx')
+    __array_ufunc__ = None
+    __hash__ = object.__hash__
+
+    def __init__(self, modelo, idx):
+        self._modelo = modelo
+        self.idx = idx
+
+    def __repr__(self):
+        return f"<ModeloHiGHS.Var {self.VarName}>"
+
+    def __add__(self, otro):
+        return _expr(self) + otro
+
+    __radd__ = __add__
+
+    def __sub__(self, otro):
+        return _expr(self) - otro
+
+    def __rsub__(self, otro):
+        return _expr(otro) - _expr(self)
+
+    def __mul__(self, k):
+        return _expr(self) * k
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, k):
+        return _expr(self) / k
+
+    def __neg__(self):
+        return _expr(self) * -1.0
+
+    def __le__(self, otro):
+        return _expr(self) <= otro
+
+    def __ge__(self, otro):
+        return _expr(self) >= otro
+
+    def __eq__(self, otro):
+        return _expr(self) == otro
+
+    index = property(lambda self: self.idx)
+    VarName = property(lambda self: self._modelo._nombre_var(self.idx))
+    VType = property(lambda self: self._modelo._vtype[self.idx])
+    X = property(lambda self: self._modelo._valor(self.idx))
+
+    @property
+    def LB(self):
+        return self._modelo._lb[self.idx]
+
+    @LB.setter
+    def LB(self, valor):
+        self._modelo._lb[self.idx] = float(valor)
+
+    @property
+    def UB(self):
+        return self._modelo._ub[self.idx]
+
+    @UB.setter
+    def UB(self, valor):
+        self._modelo._ub[self.idx] = float(valor)
+
+    @property
+    def Start(self):
+        return self._modelo._start.get(self.idx, 1e101)  # GRB.UNDEFINED
+
+    @Start.setter
+    def Start(self, valor):
+        self._modelo._start[self.idx] = float(valor)
+
+
+class MVar:
+    """Bloque 1-D de columnas (addMVar): tolist(), rebanadas, setAttr('LB'/'UB') y array @ MVar."""
+    __slots__ = ('_modelo', '_idx')
+    __array_ufunc__ = None  # array @ MVar -> MVar.__rmatmul__
+
+    def __init__(self, modelo, idx):
+        self._modelo = modelo
+        self._idx = np.asarray(idx, dtype=int)
+
+    shape = property(lambda self: self._idx.shape)
+
+    def __len__(self):
+        return len(self._idx)
+
+    def __getitem__(self, k):
+        if isinstance(k, (int, np.integer)):
+            return self._modelo._vars[self._idx[k]]
+        return MVar(self._modelo, self._idx[k])
+
+    def tolist(self):
+        return [self._modelo._vars[i] for i in self._idx]
+
+    def setAttr(self, attr, valores):
+        self._modelo.setAttr(attr, self.tolist(), np.broadcast_to(valores, self._idx.shape).tolist())
+
+    def __rmatmul__(self, a):
+        a = np.asarray(a, dtype=float)
+        nz = np.flatnonzero(a)
+        return LinExpr(self._idx[nz].tolist(), a[nz].tolist())
+
+
+class Constr:
+    __slots__ = ('_modelo', 'idx')
+
+    def __init__(self, modelo, idx):
+        self._modelo = modelo
+        self.idx = idx
+
+    ConstrName = property(lambda self: self._modelo._nombres_filas[self.idx] or f"R{self.idx}")
+
+    @property
+    def RHS(self):
+        return self._modelo._rhs[self.idx]
+
+    @RHS.setter
+    def RHS(self, valor):
+        self._modelo._rhs[self.idx] = float(valor)
+
+
+class MConstr:
+    """Bloque de filas de addMConstr; setAttr('RHS', valores) las edita todas."""
+    __slots__ = ('_modelo', '_idx')
+
+    def __init__(self, modelo, idx):
+        self._modelo = modelo
+        self._idx = np.asarray(idx, dtype=int)
+
+    def __len__(self):
+        return len(self._idx)
+
+    def tolist(self):
+        return [Constr(self._modelo, int(i)) for i in self._idx]
+
+    def setAttr(self, attr, valores):
+        self._modelo.setAttr(attr, self.tolist(), np.broadcast_to(valores, self._idx.shape).tolist())
+
+
+class GenConstr:
+    __slots__ = ('_modelo', 'idx')
+
+    def __init__(self, modelo, idx):
+        self._modelo = modelo
+        self.idx = idx
+
+    GenConstrName = property(lambda self: self._modelo._generales[self.idx][-1])
+    GenConstrType = property(lambda self: {'max': GRB.GENCONSTR_MAX, 'min': GRB.GENCONSTR_MIN,
+                                           'ind': GRB.GENCONSTR_INDICATOR}[self._modelo._generales[self.idx][0]])
+
+
+# ----------------------------------------------------------------------
+# Parámetros y entorno
+# ----------------------------------------------------------------------
+
+class Parametros:
+    """
+    model.Params de un ModeloHiGHS. OutputFlag, TimeLimit, MIPGap y NodeLimit pasan a HiGHS;
+    el resto (Threads, Seed, ...) se guarda y no tiene efecto.
+    """
+    POR_DEFECTO = {'OutputFlag': 1, 'TimeLimit': GRB.INFINITY, 'MIPGap': 1e-4, 'NodeLimit': GRB.INFINITY,
+                   'Threads': 0, 'Seed': 0}
+
+    def __init__(self, valores=None):
+        object.__setattr__(self, '_valores', dict(self.POR_DEFECTO, **(valores or {})))
+
+    def __getattr__(self, nombre):
+        try:
+            return self._valores[nombre]
+        except KeyError:
+            raise AttributeError(f"parámetro no fijado: {nombre}") from None
+
+    def __setattr__(self, nombre, valor):
+        self._valores[nombre] = valor
+
+    def opciones_highs(self):
+        v = self._valores
+        opciones = {'disp': bool(v['OutputFlag']), 'mip_rel_gap': float(v['MIPGap'])}
+        if float(v['TimeLimit']) < GRB.INFINITY:
+            opciones['time_limit'] = float(v['TimeLimit'])
+        if float(v['NodeLimit']) < GRB.INFINITY:
+            opciones['node_limit'] = int(v['NodeLimit'])
+        return opciones
+
+
+class EntornoHiGHS:
+    """Análogo de gp.Env(empty=True): los ModeloHiGHS creados con él heredan sus parámetros."""
+
+    def __init__(self):
+        self.parametros = {}
+
+    def setParam(self, nombre, valor):
+        self.parametros[nombre] = valor
+
+    def start(self):
+        return self
+
+    def dispose(self):
+        pass
+
+
+# ----------------------------------------------------------------------
+# Modelo
+# ----------------------------------------------------------------------
+
+# status de scipy.optimize.milp -> status de Gurobi
+_ESTADOS = {0: GRB.OPTIMAL, 1: GRB.TIME_LIMIT, 2: GRB.INFEASIBLE, 3: GRB.UNBOUNDED, 4: GRB.NUMERIC}
+_INF = 1e30  # |cota| >= _INF es infinita (GRB.INFINITY = 1e100)
+
+
+def _finito(x):
+    x = np.asarray(x, dtype=float)
+    return np.where(x >= _INF, np.inf, np.where(x <= -_INF, -np.inf, x))
+
+
+def _holgura(cota, rel=1e-7):
+    """Tolerancia de una cota finita (0 para las infinitas)."""
+    return np.where(np.isfinite(cota), rel * (1.0 + np.abs(np.where(np.isfinite(cota), cota, 0.0))), 0.0)
+
+
+class ModeloHiGHS:
+    """
+    Subconjunto de gp.Model que usan los modelos del proyecto, resuelto con scipy.optimize.milp.
+    Las restricciones generales se linealizan en cada optimize() (ver cabecera).
+    """
+    # M de respaldo para argumentos cuyas cotas no se pueden acotar por propagación
+    COTA_BIG_M = 1e4
+    RONDAS_PROPAGACION = 5000
+
+    _ATRIBUTOS = ('Status', 'ObjVal', 'ObjBound', 'ObjCon', 'Runtime', 'NodeCount', 'IterCount', 'MIPGap',
+                  'SolCount', 'NumVars', 'NumConstrs', 'NumGenConstrs', 'NumNZs', 'IsMIP', 'ModelName')
+    _ALIAS = {a.lower(): a for a in _ATRIBUTOS}
+
+    def __init__(self, nombre="", env=None):
+        self.ModelName = nombre
+        self.Params = Parametros(env.parametros if env is not None else None)
+        self._vars, self._lb, self._ub, self._vtype, self._nombres, self._obj = [], [], [], [], [], []
+        self._start = {}
+        self._por_nombre = None
+        # filas lineales en formato COO
+        self._fi, self._co, self._va = [], [], []
+        self._sentido, self._rhs, self._nombres_filas = [], [], []
+        # ('max'|'min', y, [x...], constante, nombre) o ('ind', z, valor, idx, coef, sentido, rhs, nombre)
+        self._generales = []
+        self._obj_sentido = GRB.MINIMIZE
+        self.ObjCon = 0.0
+        self.Status = GRB.LOADED
+        self.Runtime = 0.0
+        self.NodeCount = 0.0
+        self.IterCount = 0.0
+        self.MIPGap = 0.0
+        self.SolCount = 0
+        self._x = None
+        self._solucion = None
+
+    def __getattr__(self, nombre):
+        # atributos de Gurobi sin distinguir mayúsculas (model.status, model.objVal, ...)
+        canonico = ModeloHiGHS._ALIAS.get(nombre.lower())
+        if canonico is None or canonico == nombre:
+            raise AttributeError(f"ModeloHiGHS no tiene el atributo {nombre!r}")
+        return getattr(self, canonico)
+
+    def __repr__(self):
+        return (f"<ModeloHiGHS {self.ModelName}: {self.NumVars} variables, {self.NumConstrs} filas, "
+                f"{self.NumGenConstrs} generales>")
+
+    # --- columnas ---
+    def _nueva_columna(self, lb, ub, vtype, nombre, obj=0.0):
+        var = Var(self, len(self._vars))
+        self._vars.append(var)
+        self._lb.append(float(lb))
+        self._ub.append(float(ub))
+        self._vtype.append(vtype)
+        self._nombres.append(nombre)
+        self._obj.append(float(obj))
+        self._por_nombre = None
+        return var
+
+    def _nombre_var(self, idx):
+        return self._nombres[idx] or f"C{idx}"
+
+    def addVar(self, lb=0.0, ub=GRB.INFINITY, obj=0.0, vtype=GRB.CONTINUOUS, name=""):
+        if vtype == GRB.BINARY:
+            lb, ub = max(lb, 0.0), min(ub, 1.0)
+        return self._nueva_columna(lb, ub, vtype, name, obj)
+
+    def addVars(self, *indices, lb=0.0, ub=GRB.INFINITY, obj=0.0, vtype=GRB.CONTINUOUS, name=""):
+        listas = [range(i) if isinstance(i, int) else list(i) for i in indices]
+        claves = list(itertools.product(*listas)) if len(listas) > 1 else listas[0]
+        variables = []
+        for clave in claves:
+            partes = clave if isinstance(clave, tuple) else (clave,)
+            nombre = f"{name}[{','.join(map(str, partes))}]" if name else ""
+            variables.append(self.addVar(lb, ub, obj, vtype, nombre))
+        return tupledict(zip(claves, variables))
+
+    def addMVar(self, shape, lb=0.0, ub=GRB.INFINITY, obj=0.0, vtype=GRB.CONTINUOUS, name=""):
+        n = shape if isinstance(shape, (int, np.integer)) else int(np.prod(shape))
+        lb, ub, obj = (np.broadcast_to(np.asarray(x, dtype=float), (n,)) for x in (lb, ub, obj))
+        vtype = np.broadcast_to(np.asarray(vtype), (n,))
+        nombres = ([f"{name}[{k}]" if name else "" for k in range(n)] if isinstance(name, str)
+                   else [str(x) for x in np.ravel(name)])
+        ini = len(self._vars)
+        for k in range(n):
+            self.addVar(lb[k], ub[k], obj[k], str(vtype[k]), nombres[k])
+        return MVar(self, np.arange(ini, ini + n))
+
+    # --- filas lineales ---
+    def _nueva_fila(self, expr, sentido, nombre):
+        fila = len(self._sentido)
+        self._fi.extend([fila] * len(expr.idx))
+        self._co.extend(expr.idx)
+        self._va.extend(expr.coef)
+        self._sentido.append(sentido)
+        self._rhs.append(-expr.const)
+        self._nombres_filas.append(nombre)
+        return Constr(self, fila)
+
+    def addConstr(self, restriccion, name=""):
+        if not isinstance(restriccion, TempConstr):
+            raise TypeError(f"addConstr espera una comparación de expresiones, no {type(restriccion).__name__}")
+        return self._nueva_fila(restriccion.expr, restriccion.sentido, name)
+
+    addLConstr = addConstr
+
+    def addMConstr(self, A, x, sense, b, name=""):
+        A = sp.coo_matrix(A)
+        cols = np.arange(len(self._vars)) if x is None else x._idx
+        ini = len(self._sentido)
+        m = A.shape[0]
+        self._fi.extend((A.row + ini).tolist())
+        self._co.extend(cols[A.col].tolist())
+        self._va.extend(A.data.tolist())
+        self._sentido.extend(np.broadcast_to(np.asarray(sense), (m,)).tolist())
+        self._rhs.extend(np.broadcast_to(np.asarray(b, dtype=float), (m,)).tolist())
+        self._nombres_filas.extend([f"{name}[{k}]" if name else "" for k in range(m)] if isinstance(name, str)
+                                   else [str(s) for s in name])
+        return MConstr(self, np.arange(ini, ini + m))
+
+    # --- restricciones generales ---
+    def _general(self, g):
+        self._generales.append(g)
+        return GenConstr(self, len(self._generales) - 1)
+
+    def addGenConstrMax(self, resvar, vars, constant=None, name=""):
+        return self._general(('max', resvar.idx, [v.idx for v in vars], constant, name))
+
+    def addGenConstrMin(self, resvar, vars, constant=None, name=""):
+        return self._general(('min', resvar.idx, [v.idx for v in vars], constant, name))
+
+    def addGenConstrIndicator(self, binvar, binval, lhs, sense=None, rhs=None, name=""):
+        if isinstance(lhs, TempConstr):
+            expr, sentido = lhs.expr, lhs.sentido
+        else:
+            expr, sentido = _expr(lhs) - rhs, sense
+        return self._general(('ind', binvar.idx, int(binval), expr.idx, expr.coef, sentido, -expr.const, name))
+
+    def remove(self, objetos):
+        objetos = objetos if isinstance(objetos, (list, tuple)) else [objetos]
+        for obj in objetos:
+            if not isinstance(obj, GenConstr):
+                raise TypeError("ModeloHiGHS.remove sólo quita restricciones generales")
+            self._generales[obj.idx] = None
+
+    # --- objetivo y atributos ---
+    def setObjective(self, expr, sense=GRB.MINIMIZE):
+        expr = _expr(expr)
+        self._obj = [0.0] * len(self._vars)
+        for i, c in zip(expr.idx, expr.coef):
+            self._obj[i] += c
+        self.ObjCon = expr.const
+        self._obj_sentido = sense
+
+    def update(self):
+        pass
+
+    def dispose(self):
+        pass
+
+    def setParam(self, nombre, valor):
+        setattr(self.Params, nombre, valor)
+
+    def getVars(self):
+        return list(self._vars)
+
+    def getConstrs(self):
+        return [Constr(self, i) for i in range(len(self._sentido))]
+
+    def getGenConstrs(self):
+        return [GenConstr(self, k) for k, g in enumerate(self._generales) if g is not None]
+
+    def getVarByName(self, nombre):
+        if self._por_nombre is None:
+            self._por_nombre = {n: v for n, v in zip(self._nombres, self._vars) if n}
+        return self._por_nombre.get(nombre)
+
+    def getAttr(self, attr, objetos=None):
+        if objetos is None:
+            if attr in ModeloHiGHS._ALIAS.values():
+                return getattr(self, attr)
+            objetos = self._vars
+        if isinstance(objetos, (MVar, MConstr)):
+            objetos = objetos.tolist()
+        if attr == 'X':
+            if self._x is None:
+                raise AttributeError("ModeloHiGHS sin solución: no hay atributo X")
+            return self._x[[v.idx for v in objetos]].tolist()
+        return [getattr(o, attr) for o in objetos]
+
+    def setAttr(self, attr, objetos, valores=None):
+        if valores is None:
+            setattr(self, attr, objetos)
+            return
+        if attr in ('Start', 'VarHintVal'):
+            return  # scipy.optimize.milp no recibe un punto de partida
+        if isinstance(objetos, (MVar, MConstr)):
+            objetos = objetos.tolist()
+        for obj, valor in zip(objetos, valores):
+            setattr(obj, attr, valor)
+
+    NumVars = property(lambda self: len(self._vars))
+    NumConstrs = property(lambda self: len(self._sentido))
+    NumGenConstrs = property(lambda self: sum(g is not None for g in self._generales))
+    NumNZs = property(lambda self: len(self._va))
+    IsMIP = property(lambda self: int(any(t != GRB.CONTINUOUS for t in self._vtype) or self.NumGenConstrs > 0))
+
+    @property
+    def ObjVal(self):
+        if self._x is None:
+            raise AttributeError("ModeloHiGHS sin solución: no hay atributo ObjVal")
+        return self._solucion['obj']
+
+    @property
+    def ObjBound(self):
+        if self._solucion is None:
+            raise AttributeError("ModeloHiGHS sin resolver: no hay atributo ObjBound")
+        return self._solucion['cota']
+
+    def _valor(self, idx):
+        if self._x is None:
+            raise AttributeError("ModeloHiGHS sin solución: no hay atributo X")
+        return float(self._x[idx])
+
+    # --- resolución ---
+    def _filas(self):
+        """(A csr, lo, hi) de las filas lineales."""
+        m, n = len(self._sentido), len(self._vars)
+        A = sp.csr_matrix((np.asarray(self._va, dtype=float), (np.asarray(self._fi, dtype=int),
+                                                                np.asarray(self._co, dtype=int))), shape=(m, n))
+        sentido = np.asarray(self._sentido)
+        rhs = _finito(self._rhs)
+        lo = np.where(sentido == GRB.LESS_EQUAL, -np.inf, rhs)
+        hi = np.where(sentido == GRB.GREATER_EQUAL, np.inf, rhs)
+        return A, lo, hi
+
+    def _propagar(self, A, lo, hi, L, U):
+        """
+        Cotas implícitas de las columnas: propagación de intervalos sobre las filas lineales
+        y las min/max generales hasta que no cambien (a lo más RONDAS_PROPAGACION rondas).
+        Cada ronda avanza un paso por las cadenas mes a mes (volúmenes, SSR acumulado), así
+        que sólo se vuelven a recorrer las filas de columnas que cambiaron en la anterior.
+        """
+        A = A.tocoo()
+        r, c, a = A.row, A.col, A.data
+        m, n = A.shape
+        # min/max en forma "max": y' = max(x'_j, c') con y' = s*y, x' = s*x (s = -1 para min)
+        gid, gy, gs, gcol, gcte = [], [], [], [], []
+        for g in self._generales:
+            if g is None or g[0] == 'ind':
+                continue
+            s = 1.0 if g[0] == 'max' else -1.0
+            k = len(gy)
+            gy.append(g[1])
+            gs.append(s)
+            operandos = [(x, 0.0) for x in g[2]] + ([(-1, s * g[3])] if g[3] is not None else [])
+            for x, cte in operandos:
+                gid.append(k)
+                gcol.append(x)
+                gcte.append(cte)
+        gid, gy, gs, gcol, gcte = (np.asarray(v, dtype=t) for v, t in
+                                   ((gid, int), (gy, int), (gs, float), (gcol, int), (gcte, float)))
+        es_var = gcol >= 0
+        se = gs[gid]
+
+        activas = np.ones(m, dtype=bool)  # filas con alguna columna cuyas cotas cambiaron
+        for _ in range(self.RONDAS_PROPAGACION):
+            L0, U0 = L.copy(), U.copy()
+            sel = activas[r]
+            if sel.any():
+                rs, cs, as_ = r[sel], c[sel], a[sel]
+                with np.errstate(invalid='ignore'):
+                    cmin = np.where(as_ > 0, as_ * L[cs], as_ * U[cs])
+                    cmax = np.where(as_ > 0, as_ * U[cs], as_ * L[cs])
+                inf_min, inf_max = np.isinf(cmin), np.isinf(cmax)
+                fmin, fmax = np.where(inf_min, 0.0, cmin), np.where(inf_max, 0.0, cmax)
+                smin, smax = np.bincount(rs, fmin, m), np.bincount(rs, fmax, m)
+                nmin, nmax = np.bincount(rs, inf_min, m), np.bincount(rs, inf_max, m)
+                # actividad mínima / máxima del resto de la fila
+                resto_min = np.where(nmin[rs] - inf_min == 0, smin[rs] - fmin, -np.inf)
+                resto_max = np.where(nmax[rs] - inf_max == 0, smax[rs] - fmax, np.inf)
+                tope, piso = hi[rs] - resto_min, lo[rs] - resto_max  # piso <= a*x <= tope
+                nuevo_U, nuevo_L = np.full(n, np.inf), np.full(n, -np.inf)
+                np.minimum.at(nuevo_U, cs, np.where(as_ > 0, tope, piso) / as_)
+                np.maximum.at(nuevo_L, cs, np.where(as_ > 0, piso, tope) / as_)
+                # con holgura y sólo si ajusta de verdad: en un modelo casi determinado las cotas
+                # se cierran sobre un punto y el redondeo acumulado las cruzaría
+                nuevo_U, nuevo_L = nuevo_U + _holgura(nuevo_U), nuevo_L - _holgura(nuevo_L)
+                U = np.where(nuevo_U < U - _holgura(U), nuevo_U, U)
+                L = np.where(nuevo_L > L + _holgura(L), nuevo_L, L)
+            if len(gy):
+                xl = np.where(es_var, np.where(se > 0, L[gcol], -U[gcol]), gcte)
+                xu = np.where(es_var, np.where(se > 0, U[gcol], -L[gcol]), gcte)
+                yl, yu = np.full(len(gy), -np.inf), np.full(len(gy), -np.inf)
+                np.maximum.at(yl, gid, xl)
+                np.maximum.at(yu, gid, xu)
+                np.maximum.at(L, gy, np.where(gs > 0, yl, -yu))
+                np.minimum.at(U, gy, np.where(gs > 0, yu, -yl))
+                # cada argumento queda bajo el máximo: x'_j <= y'
+                ytope = np.where(gs > 0, U[gy], -L[gy])[gid]
+                np.minimum.at(U, gcol[es_var & (se > 0)], ytope[es_var & (se > 0)])
+                np.maximum.at(L, gcol[es_var & (se < 0)], -ytope[es_var & (se < 0)])
+            cambiadas = (L != L0) | (U != U0)
+            if not cambiadas.any():
+                break
+            activas = np.zeros(m, dtype=bool)
+            activas[r[cambiadas[c]]] = True
+        return L, U
+
+    def _linealizar(self):
+        """Problema de scipy.optimize.milp con las restricciones generales linealizadas."""
+        n = len(self._vars)
+        A, lo, hi = self._filas()
+        lb, ub = _finito(self._lb), _finito(self._ub)
+        L, U = self._propagar(A, lo, hi, lb.copy(), ub.copy())
+        L, U = L - 10 * _holgura(L), U + 10 * _holgura(U)
+
+        fi, co, va, flo, fhi = [], [], [], [], []
+        nuevas = [0]
+        respaldo = [0]
+
+        def fila(terminos, lo_f, hi_f):
+            k = len(flo)
+            for col, coef in terminos:
+                fi.append(k)
+                co.append(col)
+                va.append(coef)
+            flo.append(lo_f)
+            fhi.append(hi_f)
+
+        def binaria():
+            nuevas[0] += 1
+            return n + nuevas[0] - 1
+
+        def big_m(valor):
+            # cualquier M mayor también es válido; uno diminuto (cotas casi exactas) deja
+            # coeficientes de 1e-6 que el presolve de HiGHS no maneja bien
+            if np.isfinite(valor):
+                return max(float(valor), 1.0)
+            respaldo[0] += 1
+            return self.COTA_BIG_M
+
+        for g in self._generales:
+            if g is None:
+                continue
+            if g[0] == 'ind':
+                _, z, valor, idx, coef, sentido, r, _ = g
+                idx, coef = np.asarray(idx, dtype=int), np.asarray(coef, dtype=float)
+                with np.errstate(invalid='ignore'):
+                    maxact = np.sum(np.where(coef > 0, coef * U[idx], coef * L[idx]))
+                    minact = np.sum(np.where(coef > 0, coef * L[idx], coef * U[idx]))
+                terminos = list(zip(idx.tolist(), coef.tolist()))
+                if sentido in (GRB.LESS_EQUAL, GRB.EQUAL) and not maxact <= r:
+                    M = big_m(maxact - r)  # a·x <= r + M (1 - z)  /  r + M z
+                    fila(terminos + [(z, M if valor else -M)], -np.inf, r + M if valor else r)
+                if sentido in (GRB.GREATER_EQUAL, GRB.EQUAL) and not minact >= r:
+                    M = big_m(r - minact)  # a·x >= r - M (1 - z)  /  r - M z
+                    fila(terminos + [(z, -M if valor else M)], r - M if valor else r, np.inf)
+                continue
+
+            tipo, y, xs, cte, _ = g
+            s = 1.0 if tipo == 'max' else -1.0
+            # en forma "max" (y' = s*y, x' = s*x): y' >= x'_j  y  y' <= x'_j + M_j (1 - b_j)
+            y_tope = U[y] if s > 0 else -L[y]
+            operandos = [(x, L[x] if s > 0 else -U[x]) for x in xs]
+            for x, _ in operandos:
+                fila([(y, s), (x, -s)], 0.0, np.inf)
+            if cte is not None:
+                fila([(y, s)], s * cte, np.inf)
+                operandos.append((None, s * cte))
+            if len(operandos) == 1:
+                x = operandos[0][0]
+                fila([(y, s)] + ([(x, -s)] if x is not None else []), -np.inf, 0.0 if x is not None else s * cte)
+                continue
+            dos = len(operandos) == 2
+            b = binaria() if dos else None
+            todas = []
+            for j, (x, x_piso) in enumerate(operandos):
+                M = big_m(y_tope - x_piso)
+                terminos = [(y, s)] + ([(x, -s)] if x is not None else [])
+                c_fila = 0.0 if x is not None else x_piso  # x_piso es s*cte para la constante
+                if dos and j == 1:
+                    fila(terminos + [(b, -M)], -np.inf, c_fila)  # activo con b = 0
+                else:
+                    bj = b if dos else binaria()
+                    todas.append(bj)
+                    fila(terminos + [(bj, M)], -np.inf, c_fila + M)
+            if not dos:
+                fila([(bj, 1.0) for bj in todas], 1.0, 1.0)
+        if respaldo[0]:
+            print(f"[AVISO] ModeloHiGHS: {respaldo[0]} big-M sin cotas finitas, se usa COTA_BIG_M={self.COTA_BIG_M:g}")
+
+        k = nuevas[0]
+        A_gen = sp.csr_matrix((va, (fi, co)), shape=(len(flo), n + k))
+        A_total = sp.vstack([sp.hstack([A, sp.csr_matrix((A.shape[0], k))]), A_gen], format='csr')
+        enteras = np.array([t != GRB.CONTINUOUS for t in self._vtype] + [True] * k, dtype=int)
+        lb_total = np.concatenate([lb, np.zeros(k)])
+        ub_total = np.concatenate([ub, np.ones(k)])
+        signo = 1.0 if self._obj_sentido == GRB.MINIMIZE else -1.0
+        c = signo * np.concatenate([np.asarray(self._obj, dtype=float), np.zeros(k)])
+        return c, enteras, Bounds(lb_total, ub_total), LinearConstraint(A_total, np.concatenate([lo, flo]),
+                                                                        np.concatenate([hi, fhi]))
+
+    def optimize(self, callback=None):
+        """Linealiza y resuelve con scipy.optimize.milp (HiGHS); callback se ignora."""
+        t0 = time.perf_counter()
+        c, enteras, cotas, filas = self._linealizar()
+        res = milp(c, integrality=enteras, bounds=cotas, constraints=filas, options=self.Params.opciones_highs())
+        self.Runtime = time.perf_counter() - t0
+        self.Status = _ESTADOS.get(res.status, GRB.NUMERIC)
+        self.NodeCount = float(getattr(res, 'mip_node_count', 0) or 0)
+        n = len(self._vars)
+        self._x = np.asarray(res.x[:n], dtype=float) if res.x is not None else None
+        self.SolCount = int(self._x is not None)
+        signo = 1.0 if self._obj_sentido == GRB.MINIMIZE else -1.0
+        obj = float(np.dot(self._obj, self._x)) + self.ObjCon if self._x is not None else None
+        cota = getattr(res, 'mip_dual_bound', None)
+        self._solucion = {'obj': obj, 'cota': signo * cota + self.ObjCon if cota is not None else obj,
+                          'mensaje': res.message}
+        self.MIPGap = float(getattr(res, 'mip_gap', 0.0) or 0.0)
+        if self.Params.OutputFlag:
+            print(f"HiGHS: {res.message} ({self.Runtime:.2f} s, {self.NodeCount:.0f} nodos)")
@@ -1,11 +1,77 @@
-import gurobipy as gp
-from gurobipy import GRB
+import copy
+import time
+
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
+
+try:
+    from model.arranque import cargar_inicio
+    from model.cache_resultados import CacheResultados, huella_fuentes
+    from model.hidrologia import HydrologyDataset
+    from model.milp import GRB, nuevo_modelo, quicksum, tupledict
+    from model.perfiles import aplicar_perfil, perfil
+    from model.simulador import FAMILIAS, FAMILIAS_AUX, simular_reglas
+    from model.salidas import escribir_tablas, normalizar_salidas, porcentaje
+    from model.solucion import Solution
+    from model.telemetria import fase, optimizar
+except ImportError:  # ejecutado desde model/ (run_sensibilidad_csv.py)
+    from arranque import cargar_inicio
+    from cache_resultados import CacheResultados, huella_fuentes
+    from hidrologia import HydrologyDataset
+    from milp import GRB, nuevo_modelo, quicksum, tupledict
+    from perfiles import aplicar_perfil, perfil
+    from simulador import FAMILIAS, FAMILIAS_AUX, simular_reglas
+    from salidas import escribir_tablas, normalizar_salidas, porcentaje
+    from solucion import Solution
+    from telemetria import fase, optimizar
+
+def _suma_secuencial(x, axis=None):
+    """
+    Suma de izquierda a derecha (último elemento de np.cumsum): el mismo redondeo que un
+    acumulador `total += x` en un bucle, a diferencia de la suma por pares de np.sum.
+    axis=None recorre x.ravel() (para sumar mes a mes y año a año, pasar el array transpuesto).
+    """
+    if axis is None:
+        return float(np.cumsum(np.ravel(x))[-1])
+    return np.take(np.cumsum(x, axis=axis), -1, axis=axis)
+
+
+def _sin_ruido(valores, tol=1e-9):
+    """
+    Copia de valores (familia -> array) con |x| < tol en 0.0, para los exportadores: el ruido
+    del solver (-1e-12, -0.0) no debe salir como "-0.0" en los reportes.
+    """
+    return {fam: np.where(np.abs(arr) < tol, 0.0, arr) for fam, arr in valores.items()}
+
+
+class _Derivada:
+    """
+    Familia que el constructor lean no crea como variable: constante más combinación
+    lineal de variables. Solution.desde_modelo la evalúa junto con el resto de la solución;
+    .X queda por compatibilidad con gp.Var.
+    """
+    __slots__ = ('const', 'terminos', 'transf')
+
+    def __init__(self, const, terminos=(), transf=None):
+        self.const = const
+        self.terminos = terminos
+        self.transf = transf
+
+    @property
+    def X(self):
+        valor = self.const + sum(coef * var.X for coef, var in self.terminos)
+        return self.transf(valor) if self.transf else valor
+
 
 class EmbalseNuevaPunilla:
 
-    def __init__(self):
-        self.model = gp.Model("Embalse_Nueva_Punilla")
+    def __init__(self, hidrologia=None, env=None, solver="gurobi"):
+        # env: entorno propio (p. ej. uno por proceso en el barrido paralelo); None = entorno por defecto
+        # solver: "gurobi" o "highs" (scipy.optimize.milp, sin licencia; ver model/milp.py)
+        self.model = nuevo_modelo("Embalse_Nueva_Punilla", solver, env=env)
+        self._env = env
+        self.solver = solver
 
         self.anos = ['1989/1990', '1990/1991', '1991/1992', '1992/1993', '1993/1994',
                      '1994/1995', '1995/1996', '1996/1997', '1997/1998', '1998/1999',
@@ -36,11 +102,8 @@ class EmbalseNuevaPunilla:
             12: 30*24*3600  # ABR
         }
 
-        self.caudal_afluente  = {}
-        self.Q_nuble = {}
-        self.Q_hoya1 = {}
-        self.Q_hoya2 = {}
-        self.Q_hoya3 = {}
+        # HydrologyDataset (model/hidrologia.py); si no se inyecta, solve() lo carga del Excel
+        self.hidrologia = hidrologia
 
         # DEMANDAS (m³/mes por acción) -> luego a Hm³
         self.num_acciones_A  = 21221
@@ -68,6 +131,38 @@ class EmbalseNuevaPunilla:
         self.VRFI_init = 0.0
         self.VA_init   = 0.0
         self.VB_init   = 0.0
+        # arrastre SSR pendiente al inicio del primer año (Hm³)
+        self.SSR_init  = 0.0
+
+        # horizonte: "monolithic" (un MIP con todos los años) o "chained" (un MIP de 12 meses
+        # re-parametrizado año a año, ver solve_encadenado)
+        self.horizon_mode = "monolithic"
+        self._anual = None
+        # CacheTransiciones opcional (model/transiciones.py) que consulta solve_encadenado
+        self.cache_transiciones = None
+        # CacheResultados opcional (model/cache_resultados.py): solve() devuelve la solución
+        # guardada si ya se resolvió este mismo modelo con estos mismos datos
+        self.cache_resultados = None
+        # Telemetria opcional (model/telemetria.py): tiempos por fase, censo del MIP y
+        # estadísticas del solver de cada solve() en sol['telemetria']
+        self.telemetria = None
+        # perfil de parámetros de Gurobi (model/perfiles.py) que construir() carga: "auto" busca
+        # config/modelito2_<N>y.prm según el horizonte, una ruta fija el .prm, None usa los por defecto
+        self.perfil_solver = "auto"
+        self.parametros_perfil = {}
+
+        # Solution (model/solucion.py) del último solve; la leen exportar_* y los KPIs
+        self.solucion = None
+        # formato de df_detalle/df_resumen en get_solution: "xlsx", "csv", "parquet" o "none"
+        self.output_format = "xlsx"
+        # EscritorAsincrono opcional (model/salidas.py): si está, las tablas/txt de get_solution
+        # se formatean y escriben en segundo plano (llamar escritor.flush() al final)
+        self.escritor = None
+
+        # constructor del MIP: "escalar" (addVars/addConstr), "matriz" (MVar/addMConstr)
+        # o "lean" (matricial sin constantes ni alias)
+        self.builder = "escalar"
+        self._construido_con = None  # builder con que se armó self.model (None = sin construir)
 
     # Variables
     def variables(self):
@@ -164,70 +259,33 @@ class EmbalseNuevaPunilla:
 
     # Datos
     def cargar_data(self, file_path):
-        xls = pd.ExcelFile(file_path)
-        nuble = pd.read_excel(xls, sheet_name='Hoja1', skiprows=4,  nrows=31)
-        hoya1 = pd.read_excel(xls, sheet_name='Hoja1', skiprows=39, nrows=31)
-        hoya2 = pd.read_excel(xls, sheet_name='Hoja1', skiprows=75, nrows=31)
-        hoya3 = pd.read_excel(xls, sheet_name='Hoja1', skiprows=110,nrows=31)
-        
-        excel_nombre_columnas   = ['MAY','JUN','JUL','AGO','SEP','OCT','NOV','DIC','ENE','FEB','MAR','ABR']
-        meses = [1,2,3,4,5,6,7,8,9,10,11,12]
-
-        Q_nuble, Q_hoya1, Q_hoya2, Q_hoya3, Q_afl = {},{},{},{},{}
-
-        for idx, row in nuble.iterrows():
-            año_en_str = str(row.get('AÑO',''))
-            if (pd.notna(row.get('AÑO')) and '/' in año_en_str
-                and not any(w in año_en_str.upper() for w in ['PROMEDIO','TOTAL','MAX','MIN'])):
-                try:
-                    año = int(año_en_str.split('/')[0])
-                    for col, mm in zip(excel_nombre_columnas, meses):
-                        n1 = nuble.loc[idx, col]; h1 = hoya1.loc[idx, col]
-                        h2 = hoya2.loc[idx, col]; h3 = hoya3.loc[idx, col]
-                        if pd.notna(n1): Q_nuble[año, mm] = float(n1); Q_afl[año, mm] = float(n1)
-                        if pd.notna(h1): Q_hoya1[año, mm] = float(h1)
-                        if pd.notna(h2): Q_hoya2[año, mm] = float(h2)
-                        if pd.notna(h3): Q_hoya3[año, mm] = float(h3)
-                except Exception:
-                    pass
-        return Q_afl, Q_nuble, Q_hoya1, Q_hoya2, Q_hoya3
+        # parseo compartido con caché .npz (ver model/hidrologia.py); se respeta una hidrología inyectada
+        if self.hidrologia is None:
+            self.hidrologia = HydrologyDataset.desde_excel(file_path)
+        return self.hidrologia
 
     # Restricciones
     def restricciones(self):
         m = self.model
         data_file = "data/caudales.xlsx"
 
-        # cargar datos
-        (self.caudal_afluente,
-         self.Q_nuble,
-         self.Q_hoya1,
-         self.Q_hoya2,
-         self.Q_hoya3) = self.cargar_data(data_file)
-
-        # QPD efectivo (m³/s) (orden MAY–ABR)
-        derechos_MAY_ABR = [52.00, 52.00, 52.00, 52.00, 57.70, 76.22, 69.22, 52.00, 52.00, 52.00, 52.00, 52.00]
-        qeco_MAY_ABR     = [10.00, 10.35, 14.48, 15.23, 15.23, 15.23, 15.23, 15.23, 12.80, 15.20, 16.40, 17.60]
-
-        self.QPD_eff = {}
-        for ano in self.anos:
-            y = int(ano.split('/')[0])
-            for mes in self.meses:
-                H = (self.Q_hoya1.get((y, mes), 0.0)
-                     + self.Q_hoya2.get((y, mes), 0.0)
-                     + self.Q_hoya3.get((y, mes), 0.0))
-                qpd_nom = max(derechos_MAY_ABR[mes-1], qeco_MAY_ABR[mes-1], max(0.0, 95.7 - H))
-                self.QPD_eff[ano, mes] = min(qpd_nom, self.Q_nuble.get((y, mes), 0.0))
+        h = self.cargar_data(data_file)
 
         # SSR mensual (Hm³/mes)
         ssr_mes = self.V_C_H / 12.0
 
+        # filas y cotas que dependen de la demanda (set_parameters) y del caudal (set_hidrologia)
+        self._param_dem = {}
+        self._param_hid = {}
+
+        def _reg(clave, obj):
+            self._param_dem.setdefault(clave, []).append(obj)
+
         for a_idx, ano in enumerate(self.anos):
-            y = int(ano.split('/')[0])
+            ya = h.indice[ano]
             for i, mes in enumerate(self.meses):
-                seg   = self.segundos_por_mes[mes]
-                Qin_s = self.caudal_afluente.get((y, mes), 0.0)               
-                Qin   = Qin_s * seg / 1_000_000.0
-                UPREF = self.QPD_eff[ano, mes] * seg / 1_000_000.0
+                Qin   = h.Qin_Hm3[ya, i]
+                UPREF = h.QPD_eff_Hm3[ya, i]
 
                 key_civil = self.hidrologico_a_civil[mes]
                 demA = (self.demanda_A_mensual[key_civil] * self.num_acciones_A * self.FEA) / 1_000_000.0
@@ -244,13 +302,15 @@ class EmbalseNuevaPunilla:
                         V_R_prev = self.model.addVar(lb=self.VRFI_init, ub=self.VRFI_init, name="VRFI_prev_init")
                         V_A_prev = self.model.addVar(lb=self.VA_init,   ub=self.VA_init,   name="VA_prev_init")
                         V_B_prev = self.model.addVar(lb=self.VB_init,   ub=self.VB_init,   name="VB_prev_init")
+                        self.VRFI_prev_init, self.VA_prev_init, self.VB_prev_init = V_R_prev, V_A_prev, V_B_prev
                 else:
                     V_R_prev = self.V_VRFI[ano, mes-1]
                     V_A_prev = self.V_A[ano,  mes-1]
                     V_B_prev = self.V_B[ano,  mes-1]
 
                 # remanente y espacios
-                m.addConstr(self.REMANENTE_BRUTO[ano, mes] == Qin - UPREF, name=f"REMANENTE_BRUTO_{ano}_{mes}")
+                self._param_hid.setdefault(('REMANENTE_BRUTO', 'RHS', 'q', 1.0), []).append(
+                    m.addConstr(self.REMANENTE_BRUTO[ano, mes] == Qin - UPREF, name=f"REMANENTE_BRUTO_{ano}_{mes}"))
                 m.addGenConstrMax(self.Rem[ano, mes],
                                   [self.REMANENTE_BRUTO[ano, mes], self.CERO_CONSTANTE],
                                   name=f"REMANENTE_clip0_{ano}_{mes}")
@@ -291,7 +351,8 @@ class EmbalseNuevaPunilla:
                                         name=f"rebalse_on_hi_{ano}_{mes}")
 
                 # caudal disponible reportado
-                m.addConstr(self.Q_dis[ano, mes] == Qin - UPREF, name=f"Q_DISPONIBLE_{ano}_{mes}")
+                self._param_hid.setdefault(('Q_DISPONIBLE', 'RHS', 'q', 1.0), []).append(
+                    m.addConstr(self.Q_dis[ano, mes] == Qin - UPREF, name=f"Q_DISPONIBLE_{ano}_{mes}"))
 
                 # SSR (prioridad dura)
                 if i == 0:
@@ -299,7 +360,10 @@ class EmbalseNuevaPunilla:
                         ano_prev = self.anos[a_idx - 1]
                         acumulado_prev = self.SSR_ACUMULADO[ano_prev, 12]
                     else:
-                        acumulado_prev = self.model.addVar(lb=0.0, ub=0.0, name=f"SSR_ACUMULADO_prev0_{ano}")
+                        ssr0 = self.SSR_init if a_idx == 0 else 0.0
+                        acumulado_prev = self.model.addVar(lb=ssr0, ub=ssr0, name=f"SSR_ACUMULADO_prev0_{ano}")
+                        if a_idx == 0:
+                            self.SSR_prev_init = acumulado_prev
                 else:
                     acumulado_prev = self.SSR_ACUMULADO[ano, mes - 1]
 
@@ -330,8 +394,8 @@ class EmbalseNuevaPunilla:
                 m.addConstr(self.DISPONIBLE_B[ano, mes] == V_B_prev + self.IN_B[ano, mes], name=f"DISPONIBLE_B_def_{ano}_{mes}")
 
                 # No sobre servir respecto de la demanda propia
-                m.addConstr(self.Q_A[ano, mes] <= demA, name=f"A_le_Dem_{ano}_{mes}")
-                m.addConstr(self.Q_B[ano, mes] <= demB, name=f"B_le_Dem_{ano}_{mes}")
+                _reg(('A_le_Dem', 'RHS', 'A', 1.0), m.addConstr(self.Q_A[ano, mes] <= demA, name=f"A_le_Dem_{ano}_{mes}"))
+                _reg(('B_le_Dem', 'RHS', 'B', 1.0), m.addConstr(self.Q_B[ano, mes] <= demB, name=f"B_le_Dem_{ano}_{mes}"))
 
                 # ------------------------------------------------------------------
                 # >>> BLOQUE NUEVO: "propio primero" y faltantes al 50% <<<
@@ -340,6 +404,9 @@ class EmbalseNuevaPunilla:
                 # “Constantes” de demanda como variables fijadas (para usar en MIN)
                 DEM_A_CONST = m.addVar(lb=demA, ub=demA, name=f"DEM_A_CONST_{ano}_{mes}")
                 DEM_B_CONST = m.addVar(lb=demB, ub=demB, name=f"DEM_B_CONST_{ano}_{mes}")
+                for attr in ('LB', 'UB'):
+                    _reg(('DEM_A_CONST', attr, 'A', 1.0), DEM_A_CONST)
+                    _reg(('DEM_B_CONST', attr, 'B', 1.0), DEM_B_CONST)
 
                 # Auxiliares MIN
                 MIN_A_PROPIO = m.addVar(lb=0.0, name=f"MIN_A_PROPIO_{ano}_{mes}")
@@ -355,8 +422,10 @@ class EmbalseNuevaPunilla:
                 m.addConstr(self.Q_B[ano, mes] == MIN_B_PROPIO, name=f"B_usa_todo_propio_{ano}_{mes}")
 
                 # Faltante SOLO respecto del 50% de la demanda (para activar apoyo VRFI)
-                m.addConstr(self.T_A[ano, mes] == 0.5 * demA - self.Q_A[ano, mes], name=f"T_A_gap50_{ano}_{mes}")
-                m.addConstr(self.T_B[ano, mes] == 0.5 * demB - self.Q_B[ano, mes], name=f"T_B_gap50_{ano}_{mes}")
+                _reg(('T_A_gap50', 'RHS', 'A', 0.5),
+                     m.addConstr(self.T_A[ano, mes] == 0.5 * demA - self.Q_A[ano, mes], name=f"T_A_gap50_{ano}_{mes}"))
+                _reg(('T_B_gap50', 'RHS', 'B', 0.5),
+                     m.addConstr(self.T_B[ano, mes] == 0.5 * demB - self.Q_B[ano, mes], name=f"T_B_gap50_{ano}_{mes}"))
 
                 m.addGenConstrMax(self.FALTANTE_A[ano, mes], [self.T_A[ano, mes], self.CERO_CONSTANTE],
                                   name=f"FALT_A_pos_gap50_{ano}_{mes}")
@@ -464,14 +533,18 @@ class EmbalseNuevaPunilla:
                 m.addConstr(self.V_B[ano, mes]    <= self.C_TIPO_B, name=f"CAP_VB_{ano}_{mes}")
 
                 # déficits
-                m.addConstr(self.d_A[ano, mes] == demA - (self.Q_A[ano, mes] + self.Q_A_apoyo[ano, mes]),
-                            name=f"DEF_A_{ano}_{mes}")
-                m.addConstr(self.d_B[ano, mes] == demB - (self.Q_B[ano, mes] + self.Q_B_apoyo[ano, mes]),
-                            name=f"DEF_B_{ano}_{mes}")
+                _reg(('DEF_A', 'RHS', 'A', 1.0),
+                     m.addConstr(self.d_A[ano, mes] == demA - (self.Q_A[ano, mes] + self.Q_A_apoyo[ano, mes]),
+                                 name=f"DEF_A_{ano}_{mes}"))
+                _reg(('DEF_B', 'RHS', 'B', 1.0),
+                     m.addConstr(self.d_B[ano, mes] == demB - (self.Q_B[ano, mes] + self.Q_B_apoyo[ano, mes]),
+                                 name=f"DEF_B_{ano}_{mes}"))
 
                 # No sobre servir
-                m.addConstr(self.Q_A[ano, mes] + self.Q_A_apoyo[ano, mes] <= demA, name=f"NOSOBRE_A_{ano}_{mes}")
-                m.addConstr(self.Q_B[ano, mes] + self.Q_B_apoyo[ano, mes] <= demB, name=f"NOSOBRE_B_{ano}_{mes}")
+                _reg(('NOSOBRE_A', 'RHS', 'A', 1.0),
+                     m.addConstr(self.Q_A[ano, mes] + self.Q_A_apoyo[ano, mes] <= demA, name=f"NOSOBRE_A_{ano}_{mes}"))
+                _reg(('NOSOBRE_B', 'RHS', 'B', 1.0),
+                     m.addConstr(self.Q_B[ano, mes] + self.Q_B_apoyo[ano, mes] <= demB, name=f"NOSOBRE_B_{ano}_{mes}"))
 
                 # Turbinado (sin SSR, con rebalses)
                 m.addConstr(self.Q_turb[ano, mes] ==
@@ -480,139 +553,831 @@ class EmbalseNuevaPunilla:
                              + self.REBALSE_TOTAL[ano, mes]),
                             name=f"TURB_{ano}_{mes}")
 
+    # ------------------------------------------------------------------
+    # Constructor matricial (MVar / addMConstr)
+    # ------------------------------------------------------------------
+    # Mismo modelo que variables() + restricciones(), pero cada familia es un bloque de
+    # una sola MVar (n_anos*12,) y cada familia de restricciones lineales es una
+    # llamada a addMConstr con una matriz dispersa. Sólo las restricciones generales
+    # (min/max/indicadores) se agregan en un ciclo.
+
+    # (familia, lb, ub, vtype); ub como str = atributo de capacidad
+    FAMILIAS_MATRIZ = (
+        ('V_VRFI', 0.0, 'C_VRFI', 'C'), ('V_A', 0.0, 'C_TIPO_A', 'C'), ('V_B', 0.0, 'C_TIPO_B', 'C'),
+        ('IN_VRFI', 0.0, None, 'C'), ('IN_A', 0.0, None, 'C'), ('IN_B', 0.0, None, 'C'),
+        ('REBALSE_TOTAL', 0.0, None, 'C'),
+        ('Q_CONSUMO_HUMANO', 0.0, None, 'C'), ('Q_A', 0.0, None, 'C'), ('Q_B', 0.0, None, 'C'),
+        ('Q_A_apoyo', 0.0, None, 'C'), ('Q_B_apoyo', 0.0, None, 'C'),
+        ('d_A', 0.0, None, 'C'), ('d_B', 0.0, None, 'C'),
+        ('Q_turb', 0.0, None, 'C'), ('Q_dis', -GRB.INFINITY, None, 'C'),
+        ('Rem', 0.0, None, 'C'), ('ESPACIO_VRFI', 0.0, None, 'C'), ('LLENADO_VRFI', 0.0, None, 'C'),
+        ('REMANENTE_POST_VRFI', 0.0, None, 'C'), ('ESPACIO_A', 0.0, None, 'C'), ('ESPACIO_B', 0.0, None, 'C'),
+        ('CUOTA_A', 0.0, None, 'C'), ('CUOTA_B', 0.0, None, 'C'),
+        ('LLENADO_A', 0.0, None, 'C'), ('LLENADO_B', 0.0, None, 'C'),
+        ('FALTANTE_A', 0.0, None, 'C'), ('FALTANTE_B', 0.0, None, 'C'),
+        ('VRFI_DISPONIBLE_LIBRE', 0.0, None, 'C'), ('FALTANTE_TOTAL', 0.0, None, 'C'),
+        ('APOYO_TOTAL', 0.0, None, 'C'), ('REMANENTE_BRUTO', -GRB.INFINITY, None, 'C'),
+        ('DISPONIBLE_A', 0.0, None, 'C'), ('DISPONIBLE_B', 0.0, None, 'C'),
+        ('T_A', -GRB.INFINITY, None, 'C'), ('T_B', -GRB.INFINITY, None, 'C'),
+        ('PROPORCION_A', 0.0, None, 'C'), ('PROPORCION_B', 0.0, None, 'C'),
+        ('ASIGNACION_A_BASE', 0.0, None, 'C'), ('ASIGNACION_B_BASE', 0.0, None, 'C'),
+        ('EXCEDENTE_A', 0.0, None, 'C'), ('EXCEDENTE_B', 0.0, None, 'C'),
+        ('BRECHA_A', 0.0, None, 'C'), ('BRECHA_B', 0.0, None, 'C'),
+        ('EXTRA_HACIA_A', 0.0, None, 'C'), ('EXTRA_HACIA_B', 0.0, None, 'C'),
+        ('SSR_EXIGIDO', 0.0, None, 'C'), ('SSR_ACUMULADO', 0.0, None, 'C'),
+        ('SSR_CAPACIDAD_VARIABLE', 0.0, None, 'C'),
+        ('REBALSE_ON', 0.0, 1.0, 'B'), ('Z_A_VACIO', 0.0, 1.0, 'B'), ('Z_B_VACIO', 0.0, 1.0, 'B'),
+        ('RESERVA_USO_A', 0.0, None, 'C'), ('RESERVA_USO_B', 0.0, None, 'C'),
+        ('VRFI_APOYO_CAP', 0.0, None, 'C'),
+        # auxiliares que restricciones() crea con m.addVar mes a mes
+        ('DISPONIBILIDAD_PRELIM_VRFI', -GRB.INFINITY, None, 'C'),
+        ('DEM_A_CONST', 'demA', 'demA', 'C'), ('DEM_B_CONST', 'demB', 'demB', 'C'),
+        ('MIN_A_PROPIO', 0.0, None, 'C'), ('MIN_B_PROPIO', 0.0, None, 'C'),
+        ('DISP_POST_SSR', -GRB.INFINITY, None, 'C'), ('DISP_POST_SSR_POS', 0.0, None, 'C'),
+    )
+
+    # variables escalares al final de la MVar: (nombre, atributo con su valor fijo)
+    ESCALARES_MATRIZ = (('CERO_CONSTANTE', None), ('VRFI_prev_init', 'VRFI_init'),
+                        ('VA_prev_init', 'VA_init'), ('VB_prev_init', 'VB_init'))
+
+    def variables_matriz(self, familias=None, escalares=None):
+        m = self.model
+        familias = familias or self.FAMILIAS_MATRIZ
+        escalares = escalares or self.ESCALARES_MATRIZ
+        n = len(self.anos) * 12
+        claves = [(ano, mes) for ano in self.anos for mes in self.meses]
+        demA, demB = self.demandas_mes()
+        fijos = {'demA': np.tile(demA, len(self.anos)), 'demB': np.tile(demB, len(self.anos))}
+
+        def _cota(valor, defecto):
+            if valor is None:
+                return np.full(n, defecto)
+            if isinstance(valor, str):
+                return fijos[valor] if valor in fijos else np.full(n, float(getattr(self, valor)))
+            return np.full(n, valor)
+
+        lb, ub, vtype, nombres = [], [], [], []
+        self._col = {}
+        for f, (fam, lo, hi, vt) in enumerate(familias):
+            self._col[fam] = f * n
+            lb.append(_cota(lo, 0.0))
+            ub.append(_cota(hi, GRB.INFINITY))
+            vtype.append(np.full(n, vt))
+            nombres.extend(f"{fam}[{ano},{mes}]" for ano, mes in claves)
+        for e, (nombre, attr) in enumerate(escalares):
+            self._col[nombre] = len(familias) * n + e
+            valor = 0.0 if attr is None else float(getattr(self, attr))
+            lb.append(np.array([valor]))
+            ub.append(np.array([valor]))
+            vtype.append(np.array(['C']))
+            nombres.append(nombre)
+
+        self._X = m.addMVar(len(nombres), lb=np.concatenate(lb), ub=np.concatenate(ub),
+                            vtype=np.concatenate(vtype), name=np.array(nombres))
+        self._vars = self._X.tolist()
+        self._n = n
+
+        # mismas familias (tupledict por (ano, mes)) que usan exportar_* y _valores_gurobi
+        for fam, _, _, _ in familias:
+            ini = self._col[fam]
+            setattr(self, fam, tupledict(zip(claves, self._vars[ini:ini + n])))
+        for nombre, _ in escalares:
+            setattr(self, nombre, self._vars[self._col[nombre]])
+
+    def _cols_prev(self, fam, tipo):
+        """
+        Columnas del mes anterior de una familia (-1 = término nulo).
+        tipo 'prev': stocks, el primer mes usa VRFI/VA/VB_prev_init.
+        tipo 'prev_ssr': arrastre SSR, nulo el primer mes y, sin acumular_ssr, en cada mayo.
+        """
+        k = np.arange(self._n)
+        cols = self._col[fam] + k - 1
+        inicial = {'V_VRFI': 'VRFI_prev_init', 'V_A': 'VA_prev_init', 'V_B': 'VB_prev_init'}
+        cols[0] = self._col[inicial[fam]] if tipo == 'prev' else -1
+        if tipo == 'prev_ssr' and not self.acumular_ssr:
+            cols[k % 12 == 0] = -1
+        return cols
+
+    def _filas(self, terminos, sentido, rhs, nombre):
+        """
+        Agrega n filas  sum(coef * familia[k]) <sentido> rhs[k]  con una sola llamada a addMConstr.
+        terminos: lista de (familia, coef) o (familia, coef, 'prev' | 'prev_ssr') para el mes anterior.
+        """
+        n = self._n
+        k = np.arange(n)
+        filas, cols, vals = [], [], []
+        for t in terminos:
+            fam, coef = t[0], t[1]
+            c = self._cols_prev(fam, t[2]) if len(t) > 2 else self._col[fam] + k
+            ok = c >= 0
+            filas.append(k[ok])
+            cols.append(c[ok])
+            vals.append(np.full(ok.sum(), coef))
+        A = sp.csr_matrix((np.concatenate(vals), (np.concatenate(filas), np.concatenate(cols))),
+                          shape=(n, self._X.shape[0]))
+        rhs = np.broadcast_to(np.asarray(rhs, dtype=float), (n,))
+        return self.model.addMConstr(A, self._X, sentido, rhs, name=nombre)
+
+    def restricciones_matriz(self):
+        m = self.model
+        data_file = "data/caudales.xlsx"
+        h = self.cargar_data(data_file)
+
+        filas = h.filas(self.anos)
+        q_dis = (h.Qin_Hm3[filas] - h.QPD_eff_Hm3[filas]).ravel()
+        demA, demB = self.demandas_mes()
+        demA = np.tile(demA, len(self.anos))
+        demB = np.tile(demB, len(self.anos))
+        R = self.RESERVA_MIN_VRFI
+        EQ, LE = GRB.EQUAL, GRB.LESS_EQUAL
+        n = self._n
+
+        # filas y cotas que dependen de la demanda (set_parameters) y del caudal (set_hidrologia)
+        self._param_dem = {}
+        self._param_hid = {}
+        for x in ('A', 'B'):
+            for attr in ('LB', 'UB'):
+                ini = self._col[f'DEM_{x}_CONST']
+                self._param_dem[(f'DEM_{x}_CONST', attr, x, 1.0)] = self._X[ini:ini + n]
+
+        # remanente, espacios y llenados
+        self._param_hid[('REMANENTE_BRUTO', 'RHS', 'q', 1.0)] = self._filas(
+            [('REMANENTE_BRUTO', 1.0)], EQ, q_dis, "REMANENTE_BRUTO")
+        self._filas([('ESPACIO_VRFI', 1.0), ('V_VRFI', 1.0, 'prev')], EQ, self.C_VRFI, "ESPACIO_VRFI")
+        self._filas([('ESPACIO_A', 1.0), ('V_A', 1.0, 'prev')], EQ, self.C_TIPO_A, "ESPACIO_A")
+        self._filas([('ESPACIO_B', 1.0), ('V_B', 1.0, 'prev')], EQ, self.C_TIPO_B, "ESPACIO_B")
+        self._filas([('REMANENTE_POST_VRFI', 1.0), ('Rem', -1.0), ('LLENADO_VRFI', 1.0)], EQ, 0.0,
+                    "REMANENTE_POST_VRFI")
+        self._filas([('CUOTA_A', 1.0), ('REMANENTE_POST_VRFI', -0.71)], EQ, 0.0, "CUOTA_A")
+        self._filas([('CUOTA_B', 1.0), ('REMANENTE_POST_VRFI', -0.29)], EQ, 0.0, "CUOTA_B")
+        self._filas([('IN_VRFI', 1.0), ('LLENADO_VRFI', -1.0)], EQ, 0.0, "IN_VRFI")
+        self._filas([('IN_A', 1.0), ('LLENADO_A', -1.0)], EQ, 0.0, "IN_A")
+        self._filas([('IN_B', 1.0), ('LLENADO_B', -1.0)], EQ, 0.0, "IN_B")
+        self._filas([('REBALSE_TOTAL', 1.0), ('Rem', -1.0), ('IN_VRFI', 1.0), ('IN_A', 1.0), ('IN_B', 1.0)],
+                    EQ, 0.0, "REBALSE_TOTAL")
+        self._param_hid[('Q_DISPONIBLE', 'RHS', 'q', 1.0)] = self._filas([('Q_dis', 1.0)], EQ, q_dis, "Q_DISPONIBLE")
+
+        # SSR y VRFI libre
+        self._fila_ssr = self._filas([('SSR_EXIGIDO', 1.0), ('SSR_ACUMULADO', -1.0, 'prev_ssr')], EQ,
+                                     self._rhs_ssr(), "SSR_EXIGIDO")
+        self._filas([('SSR_CAPACIDAD_VARIABLE', 1.0), ('V_VRFI', -1.0, 'prev'), ('IN_VRFI', -1.0)], EQ, 0.0,
+                    "SSR_CAP_VAR")
+        self._filas([('SSR_ACUMULADO', 1.0), ('SSR_EXIGIDO', -1.0), ('Q_CONSUMO_HUMANO', 1.0)], EQ, 0.0,
+                    "SSR_ACUMULADO")
+        self._filas([('DISPONIBILIDAD_PRELIM_VRFI', 1.0), ('V_VRFI', -1.0, 'prev'), ('IN_VRFI', -1.0),
+                     ('Q_CONSUMO_HUMANO', 1.0)], EQ, -R, "DISPONIBILIDAD_PRELIM_VRFI")
+
+        # extracción propia, "propio primero" y faltantes al 50%
+        for x in ('A', 'B'):
+            dem = demA if x == 'A' else demB
+            self._filas([(f'Q_{x}', 1.0), (f'V_{x}', -1.0, 'prev'), (f'IN_{x}', -1.0)], LE, 0.0, f"DISP_{x}")
+            self._filas([(f'DISPONIBLE_{x}', 1.0), (f'V_{x}', -1.0, 'prev'), (f'IN_{x}', -1.0)], EQ, 0.0,
+                        f"DISPONIBLE_{x}_def")
+            self._param_dem[(f'{x}_le_Dem', 'RHS', x, 1.0)] = self._filas([(f'Q_{x}', 1.0)], LE, dem, f"{x}_le_Dem")
+            self._filas([(f'Q_{x}', 1.0), (f'MIN_{x}_PROPIO', -1.0)], EQ, 0.0, f"{x}_usa_todo_propio")
+            self._param_dem[(f'T_{x}_gap50', 'RHS', x, 0.5)] = self._filas(
+                [(f'T_{x}', 1.0), (f'Q_{x}', 1.0)], EQ, 0.5 * dem, f"T_{x}_gap50")
+            self._filas([(f'RESERVA_USO_{x}', 1.0), (f'Z_{x}_VACIO', -R)], LE, 0.0, f"uso_res_{x}_guard")
+
+        # reserva y capacidad de apoyo
+        self._filas([('RESERVA_USO_A', 1.0), ('RESERVA_USO_B', 1.0)], LE, R, "uso_res_total_cap")
+        self._filas([('DISP_POST_SSR', 1.0), ('V_VRFI', -1.0, 'prev'), ('IN_VRFI', -1.0),
+                     ('Q_CONSUMO_HUMANO', 1.0)], EQ, 0.0, "def_post_ssr")
+        self._filas([('RESERVA_USO_A', 1.0), ('RESERVA_USO_B', 1.0), ('DISP_POST_SSR_POS', -1.0)], LE, 0.0,
+                    "uso_res_stock_check")
+        self._filas([('VRFI_APOYO_CAP', 1.0), ('VRFI_DISPONIBLE_LIBRE', -1.0), ('RESERVA_USO_A', -1.0),
+                     ('RESERVA_USO_B', -1.0)], EQ, 0.0, "cap_apoyo_total")
+        self._filas([('FALTANTE_TOTAL', 1.0), ('FALTANTE_A', -1.0), ('FALTANTE_B', -1.0)], EQ, 0.0,
+                    "FALT_TOTAL")
+
+        # reparto 71/29 y reasignación cruzada
+        for x, frac in (('A', 0.71), ('B', 0.29)):
+            self._filas([(f'PROPORCION_{x}', 1.0), ('APOYO_TOTAL', -frac)], EQ, 0.0, f"PROP_{x}")
+            self._filas([(f'EXCEDENTE_{x}', 1.0), (f'PROPORCION_{x}', -1.0), (f'ASIGNACION_{x}_BASE', 1.0)],
+                        EQ, 0.0, f"EXC_{x}")
+            self._filas([(f'BRECHA_{x}', 1.0), (f'FALTANTE_{x}', -1.0), (f'ASIGNACION_{x}_BASE', 1.0)],
+                        EQ, 0.0, f"BRECHA_{x}")
+            self._filas([(f'Q_{x}_apoyo', 1.0), (f'ASIGNACION_{x}_BASE', -1.0), (f'EXTRA_HACIA_{x}', -1.0)],
+                        EQ, 0.0, f"Q_{x}_APOYO")
+        self._filas([('Q_A_apoyo', 1.0), ('Q_B_apoyo', 1.0), ('VRFI_APOYO_CAP', -1.0)], LE, 0.0,
+                    "APOYO_SUMA_LE_VRFI")
+
+        # balances y capacidades
+        self._filas([('V_VRFI', 1.0), ('V_VRFI', -1.0, 'prev'), ('IN_VRFI', -1.0), ('Q_CONSUMO_HUMANO', 1.0),
+                     ('Q_A_apoyo', 1.0), ('Q_B_apoyo', 1.0)], EQ, 0.0, "BAL_VRFI")
+        self._filas([('V_A', 1.0), ('V_A', -1.0, 'prev'), ('IN_A', -1.0), ('Q_A', 1.0)], EQ, 0.0, "BAL_VA")
+        self._filas([('V_B', 1.0), ('V_B', -1.0, 'prev'), ('IN_B', -1.0), ('Q_B', 1.0)], EQ, 0.0, "BAL_VB")
+        self._filas([('V_VRFI', 1.0)], LE, self.C_VRFI, "CAP_VRFI")
+        self._filas([('V_A', 1.0)], LE, self.C_TIPO_A, "CAP_VA")
+        self._filas([('V_B', 1.0)], LE, self.C_TIPO_B, "CAP_VB")
+
+        # déficits, no sobre servir y turbinado
+        for x in ('A', 'B'):
+            dem = demA if x == 'A' else demB
+            self._param_dem[(f'DEF_{x}', 'RHS', x, 1.0)] = self._filas(
+                [(f'd_{x}', 1.0), (f'Q_{x}', 1.0), (f'Q_{x}_apoyo', 1.0)], EQ, dem, f"DEF_{x}")
+            self._param_dem[(f'NOSOBRE_{x}', 'RHS', x, 1.0)] = self._filas(
+                [(f'Q_{x}', 1.0), (f'Q_{x}_apoyo', 1.0)], LE, dem, f"NOSOBRE_{x}")
+        self._filas([('Q_turb', 1.0), ('Q_A', -1.0), ('Q_A_apoyo', -1.0), ('Q_B', -1.0), ('Q_B_apoyo', -1.0),
+                     ('REBALSE_TOTAL', -1.0)], EQ, 0.0, "TURB")
+
+        # restricciones generales (no tienen forma matricial): min/max e indicadores
+        v = self._vars
+        cero = self.CERO_CONSTANTE
+        c = self._col
+        for k, (ano, mes) in enumerate((ano, mes) for ano in self.anos for mes in self.meses):
+            def x(fam):
+                return v[c[fam] + k]
+            sufijo = f"{ano}_{mes}"
+            m.addGenConstrMax(x('Rem'), [x('REMANENTE_BRUTO'), cero], name=f"REMANENTE_clip0_{sufijo}")
+            m.addGenConstrMin(x('LLENADO_VRFI'), [x('Rem'), x('ESPACIO_VRFI')], name=f"LLENADO_VRFI_min_{sufijo}")
+            m.addGenConstrMin(x('LLENADO_A'), [x('CUOTA_A'), x('ESPACIO_A')], name=f"LLENADO_A_min_{sufijo}")
+            m.addGenConstrMin(x('LLENADO_B'), [x('CUOTA_B'), x('ESPACIO_B')], name=f"LLENADO_B_min_{sufijo}")
+            m.addGenConstrIndicator(x('REBALSE_ON'), 1, x('REBALSE_TOTAL'), GRB.GREATER_EQUAL, 0.0,
+                                    name=f"rebalse_on_lo_{sufijo}")
+            m.addGenConstrIndicator(x('REBALSE_ON'), 0, x('REBALSE_TOTAL'), GRB.LESS_EQUAL, 0.0,
+                                    name=f"rebalse_on_hi_{sufijo}")
+            m.addGenConstrMin(x('Q_CONSUMO_HUMANO'), [x('SSR_EXIGIDO'), x('SSR_CAPACIDAD_VARIABLE')],
+                              name=f"SSR_PAGO_MIN_{sufijo}")
+            m.addGenConstrMax(x('VRFI_DISPONIBLE_LIBRE'), [x('DISPONIBILIDAD_PRELIM_VRFI'), cero],
+                              name=f"VRFI_DISP_LIBRE_MAX_{sufijo}")
+            for s in ('A', 'B'):
+                m.addGenConstrMin(x(f'MIN_{s}_PROPIO'), [x(f'DISPONIBLE_{s}'), x(f'DEM_{s}_CONST')],
+                                  name=f"MIN_{s}_PROPIO_min_{sufijo}")
+                m.addGenConstrMax(x(f'FALTANTE_{s}'), [x(f'T_{s}'), cero], name=f"FALT_{s}_pos_gap50_{sufijo}")
+                m.addGenConstrIndicator(x(f'Z_{s}_VACIO'), 1, x(f'DISPONIBLE_{s}'), GRB.LESS_EQUAL, 0.0,
+                                        name=f"{s}_vacio_hi_{sufijo}")
+                m.addGenConstrIndicator(x(f'Z_{s}_VACIO'), 0, x(f'DISPONIBLE_{s}'), GRB.GREATER_EQUAL, 0.0,
+                                        name=f"{s}_vacio_lo_{sufijo}")
+            m.addGenConstrMax(x('DISP_POST_SSR_POS'), [x('DISP_POST_SSR'), cero], name=f"clip_post_ssr_{sufijo}")
+            m.addGenConstrMin(x('APOYO_TOTAL'), [x('VRFI_APOYO_CAP'), x('FALTANTE_TOTAL')],
+                              name=f"APOYO_TOTAL_min_{sufijo}")
+            m.addGenConstrMin(x('ASIGNACION_A_BASE'), [x('FALTANTE_A'), x('PROPORCION_A')],
+                              name=f"ASIG_A_BASE_min_{sufijo}")
+            m.addGenConstrMin(x('ASIGNACION_B_BASE'), [x('FALTANTE_B'), x('PROPORCION_B')],
+                              name=f"ASIG_B_BASE_min_{sufijo}")
+            m.addGenConstrMin(x('EXTRA_HACIA_B'), [x('EXCEDENTE_A'), x('BRECHA_B')], name=f"EXTRA_B_min_{sufijo}")
+            m.addGenConstrMin(x('EXTRA_HACIA_A'), [x('EXCEDENTE_B'), x('BRECHA_A')], name=f"EXTRA_A_min_{sufijo}")
+
+    # ------------------------------------------------------------------
+    # Formulación lean (builder="lean")
+    # ------------------------------------------------------------------
+    # Sobre el constructor matricial, pero sin las variables que son datos o alias:
+    #   - Rem, Q_dis, REMANENTE_BRUTO = (Qin - UPREF) se conocen antes de armar: constantes,
+    #     y max(Qin - UPREF, 0) se precalcula (LLENADO_VRFI = min(ESPACIO_VRFI, Rem) con constant=).
+    #   - DEM_A/B_CONST y MIN_A/B_PROPIO: Q_A = min(DISPONIBLE_A, demA) directo con constant=.
+    #   - IN_* son las mismas variables que LLENADO_*; CERO_CONSTANTE pasa a constant=0.0.
+    #   - REMANENTE_POST_VRFI, REBALSE_TOTAL, SSR_ACUMULADO, Q_*_apoyo, d_*, Q_turb son
+    #     combinaciones lineales de otras variables (_Derivada, se evalúan al leer .X).
+    #   - DISP_POST_SSR_POS = max(post SSR, 0) es redundante: el pago SSR nunca supera
+    #     el stock, así que el post SSR ya es >= 0.
+    #   - REBALSE_ON y los indicadores "vacío = 0 -> disponible >= 0" no restringen nada
+    #     (rebalse y disponible ya son >= 0); REBALSE_ON se reporta como rebalse > 0.
+    # PROPORCION, EXCEDENTE, BRECHA, CUOTA y ESPACIO se mantienen: son argumentos de
+    # min/max generales, que en Gurobi sólo aceptan variables.
+    FAMILIAS_LEAN = (
+        ('V_VRFI', 0.0, 'C_VRFI', 'C'), ('V_A', 0.0, 'C_TIPO_A', 'C'), ('V_B', 0.0, 'C_TIPO_B', 'C'),
+        ('LLENADO_VRFI', 0.0, None, 'C'), ('LLENADO_A', 0.0, None, 'C'), ('LLENADO_B', 0.0, None, 'C'),
+        ('ESPACIO_VRFI', 0.0, None, 'C'), ('ESPACIO_A', 0.0, None, 'C'), ('ESPACIO_B', 0.0, None, 'C'),
+        ('CUOTA_A', 0.0, None, 'C'), ('CUOTA_B', 0.0, None, 'C'),
+        ('SSR_EXIGIDO', 0.0, None, 'C'), ('SSR_CAPACIDAD_VARIABLE', 0.0, None, 'C'),
+        ('Q_CONSUMO_HUMANO', 0.0, None, 'C'),
+        ('DISPONIBILIDAD_PRELIM_VRFI', -GRB.INFINITY, None, 'C'), ('VRFI_DISPONIBLE_LIBRE', 0.0, None, 'C'),
+        ('DISPONIBLE_A', 0.0, None, 'C'), ('DISPONIBLE_B', 0.0, None, 'C'),
+        ('Q_A', 0.0, None, 'C'), ('Q_B', 0.0, None, 'C'),
+        ('T_A', -GRB.INFINITY, None, 'C'), ('T_B', -GRB.INFINITY, None, 'C'),
+        ('FALTANTE_A', 0.0, None, 'C'), ('FALTANTE_B', 0.0, None, 'C'), ('FALTANTE_TOTAL', 0.0, None, 'C'),
+        ('Z_A_VACIO', 0.0, 1.0, 'B'), ('Z_B_VACIO', 0.0, 1.0, 'B'),
+        ('RESERVA_USO_A', 0.0, None, 'C'), ('RESERVA_USO_B', 0.0, None, 'C'),
+        ('VRFI_APOYO_CAP', 0.0, None, 'C'), ('APOYO_TOTAL', 0.0, None, 'C'),
+        ('PROPORCION_A', 0.0, None, 'C'), ('PROPORCION_B', 0.0, None, 'C'),
+        ('ASIGNACION_A_BASE', 0.0, None, 'C'), ('ASIGNACION_B_BASE', 0.0, None, 'C'),
+        ('EXCEDENTE_A', 0.0, None, 'C'), ('EXCEDENTE_B', 0.0, None, 'C'),
+        ('BRECHA_A', 0.0, None, 'C'), ('BRECHA_B', 0.0, None, 'C'),
+        ('EXTRA_HACIA_A', 0.0, None, 'C'), ('EXTRA_HACIA_B', 0.0, None, 'C'),
+    )
+    ESCALARES_LEAN = (('VRFI_prev_init', 'VRFI_init'), ('VA_prev_init', 'VA_init'), ('VB_prev_init', 'VB_init'))
+
+    def _derivada(self, const, terminos, transf=None):
+        """tupledict (ano, mes) -> _Derivada(const[k] + sum(coef * familia[k]))."""
+        const = np.broadcast_to(np.asarray(const, dtype=float), (self._n,))
+        claves = [(ano, mes) for ano in self.anos for mes in self.meses]
+        v, c = self._vars, self._col
+        return tupledict(
+            (clave, _Derivada(float(const[k]), [(coef, v[c[fam] + k]) for fam, coef in terminos], transf))
+            for k, clave in enumerate(claves))
+
+    def restricciones_lean(self):
+        m = self.model
+        data_file = "data/caudales.xlsx"
+        h = self.cargar_data(data_file)
+
+        filas = h.filas(self.anos)
+        q_dis = (h.Qin_Hm3[filas] - h.QPD_eff_Hm3[filas]).ravel()
+        rem = np.maximum(q_dis, 0.0)
+        demA, demB = self.demandas_mes()
+        demA = np.tile(demA, len(self.anos))
+        demB = np.tile(demB, len(self.anos))
+        R = self.RESERVA_MIN_VRFI
+        EQ, LE = GRB.EQUAL, GRB.LESS_EQUAL
+        self._param_dem = {}
+        self._param_hid = {}
+
+        # espacios y cuotas (Rem constante)
+        self._filas([('ESPACIO_VRFI', 1.0), ('V_VRFI', 1.0, 'prev')], EQ, self.C_VRFI, "ESPACIO_VRFI")
+        self._filas([('ESPACIO_A', 1.0), ('V_A', 1.0, 'prev')], EQ, self.C_TIPO_A, "ESPACIO_A")
+        self._filas([('ESPACIO_B', 1.0), ('V_B', 1.0, 'prev')], EQ, self.C_TIPO_B, "ESPACIO_B")
+        self._param_hid[('CUOTA_A', 'RHS', 'rem', 0.71)] = self._filas(
+            [('CUOTA_A', 1.0), ('LLENADO_VRFI', 0.71)], EQ, 0.71 * rem, "CUOTA_A")
+        self._param_hid[('CUOTA_B', 'RHS', 'rem', 0.29)] = self._filas(
+            [('CUOTA_B', 1.0), ('LLENADO_VRFI', 0.29)], EQ, 0.29 * rem, "CUOTA_B")
+
+        # SSR (SSR_ACUMULADO = SSR_EXIGIDO - Q_CONSUMO_HUMANO) y VRFI libre
+        self._fila_ssr = self._filas(
+            [('SSR_EXIGIDO', 1.0), ('SSR_EXIGIDO', -1.0, 'prev_ssr'), ('Q_CONSUMO_HUMANO', 1.0, 'prev_ssr')],
+            EQ, self._rhs_ssr(), "SSR_EXIGIDO")
+        self._filas([('SSR_CAPACIDAD_VARIABLE', 1.0), ('V_VRFI', -1.0, 'prev'), ('LLENADO_VRFI', -1.0)], EQ, 0.0,
+                    "SSR_CAP_VAR")
+        self._filas([('DISPONIBILIDAD_PRELIM_VRFI', 1.0), ('SSR_CAPACIDAD_VARIABLE', -1.0),
+                     ('Q_CONSUMO_HUMANO', 1.0)], EQ, -R, "DISPONIBILIDAD_PRELIM_VRFI")
+
+        # propio primero, faltantes al 50% y reserva
+        for x in ('A', 'B'):
+            dem = demA if x == 'A' else demB
+            self._filas([(f'DISPONIBLE_{x}', 1.0), (f'V_{x}', -1.0, 'prev'), (f'LLENADO_{x}', -1.0)], EQ, 0.0,
+                        f"DISPONIBLE_{x}_def")
+            self._param_dem[(f'T_{x}_gap50', 'RHS', x, 0.5)] = self._filas(
+                [(f'T_{x}', 1.0), (f'Q_{x}', 1.0)], EQ, 0.5 * dem, f"T_{x}_gap50")
+            self._filas([(f'RESERVA_USO_{x}', 1.0), (f'Z_{x}_VACIO', -R)], LE, 0.0, f"uso_res_{x}_guard")
+        self._filas([('RESERVA_USO_A', 1.0), ('RESERVA_USO_B', 1.0)], LE, R, "uso_res_total_cap")
+        self._filas([('RESERVA_USO_A', 1.0), ('RESERVA_USO_B', 1.0), ('SSR_CAPACIDAD_VARIABLE', -1.0),
+                     ('Q_CONSUMO_HUMANO', 1.0)], LE, 0.0, "uso_res_stock_check")
+        self._filas([('VRFI_APOYO_CAP', 1.0), ('VRFI_DISPONIBLE_LIBRE', -1.0), ('RESERVA_USO_A', -1.0),
+                     ('RESERVA_USO_B', -1.0)], EQ, 0.0, "cap_apoyo_total")
+        self._filas([('FALTANTE_TOTAL', 1.0), ('FALTANTE_A', -1.0), ('FALTANTE_B', -1.0)], EQ, 0.0,
+                    "FALT_TOTAL")
+
+        # reparto 71/29 (Q_x_apoyo = ASIGNACION_x_BASE + EXTRA_HACIA_x)
+        for x, frac in (('A', 0.71), ('B', 0.29)):
+            self._filas([(f'PROPORCION_{x}', 1.0), ('APOYO_TOTAL', -frac)], EQ, 0.0, f"PROP_{x}")
+            self._filas([(f'EXCEDENTE_{x}', 1.0), (f'PROPORCION_{x}', -1.0), (f'ASIGNACION_{x}_BASE', 1.0)],
+                        EQ, 0.0, f"EXC_{x}")
+            self._filas([(f'BRECHA_{x}', 1.0), (f'FALTANTE_{x}', -1.0), (f'ASIGNACION_{x}_BASE', 1.0)],
+                        EQ, 0.0, f"BRECHA_{x}")
+        apoyo = [('ASIGNACION_A_BASE', 1.0), ('EXTRA_HACIA_A', 1.0), ('ASIGNACION_B_BASE', 1.0),
+                 ('EXTRA_HACIA_B', 1.0)]
+        self._filas(apoyo + [('VRFI_APOYO_CAP', -1.0)], LE, 0.0, "APOYO_SUMA_LE_VRFI")
+
+        # balances (las capacidades quedan como cotas de V_*) y no sobre servir
+        self._filas([('V_VRFI', 1.0), ('V_VRFI', -1.0, 'prev'), ('LLENADO_VRFI', -1.0),
+                     ('Q_CONSUMO_HUMANO', 1.0)] + apoyo, EQ, 0.0, "BAL_VRFI")
+        self._filas([('V_A', 1.0), ('V_A', -1.0, 'prev'), ('LLENADO_A', -1.0), ('Q_A', 1.0)], EQ, 0.0, "BAL_VA")
+        self._filas([('V_B', 1.0), ('V_B', -1.0, 'prev'), ('LLENADO_B', -1.0), ('Q_B', 1.0)], EQ, 0.0, "BAL_VB")
+        for x in ('A', 'B'):
+            dem = demA if x == 'A' else demB
+            self._param_dem[(f'NOSOBRE_{x}', 'RHS', x, 1.0)] = self._filas(
+                [(f'Q_{x}', 1.0), (f'ASIGNACION_{x}_BASE', 1.0), (f'EXTRA_HACIA_{x}', 1.0)], LE, dem, f"NOSOBRE_{x}")
+
+        # restricciones generales
+        v = self._vars
+        c = self._col
+        for k, (ano, mes) in enumerate((ano, mes) for ano in self.anos for mes in self.meses):
+            def x(fam):
+                return v[c[fam] + k]
+            sufijo = f"{ano}_{mes}"
+            m.addGenConstrMin(x('LLENADO_A'), [x('CUOTA_A'), x('ESPACIO_A')], name=f"LLENADO_A_min_{sufijo}")
+            m.addGenConstrMin(x('LLENADO_B'), [x('CUOTA_B'), x('ESPACIO_B')], name=f"LLENADO_B_min_{sufijo}")
+            m.addGenConstrMin(x('Q_CONSUMO_HUMANO'), [x('SSR_EXIGIDO'), x('SSR_CAPACIDAD_VARIABLE')],
+                              name=f"SSR_PAGO_MIN_{sufijo}")
+            m.addGenConstrMax(x('VRFI_DISPONIBLE_LIBRE'), [x('DISPONIBILIDAD_PRELIM_VRFI')], constant=0.0,
+                              name=f"VRFI_DISP_LIBRE_MAX_{sufijo}")
+            for s in ('A', 'B'):
+                m.addGenConstrMax(x(f'FALTANTE_{s}'), [x(f'T_{s}')], constant=0.0, name=f"FALT_{s}_pos_gap50_{sufijo}")
+                m.addGenConstrIndicator(x(f'Z_{s}_VACIO'), 1, x(f'DISPONIBLE_{s}'), GRB.LESS_EQUAL, 0.0,
+                                        name=f"{s}_vacio_hi_{sufijo}")
+            m.addGenConstrMin(x('APOYO_TOTAL'), [x('VRFI_APOYO_CAP'), x('FALTANTE_TOTAL')],
+                              name=f"APOYO_TOTAL_min_{sufijo}")
+            m.addGenConstrMin(x('ASIGNACION_A_BASE'), [x('FALTANTE_A'), x('PROPORCION_A')],
+                              name=f"ASIG_A_BASE_min_{sufijo}")
+            m.addGenConstrMin(x('ASIGNACION_B_BASE'), [x('FALTANTE_B'), x('PROPORCION_B')],
+                              name=f"ASIG_B_BASE_min_{sufijo}")
+            m.addGenConstrMin(x('EXTRA_HACIA_B'), [x('EXCEDENTE_A'), x('BRECHA_B')], name=f"EXTRA_B_min_{sufijo}")
+            m.addGenConstrMin(x('EXTRA_HACIA_A'), [x('EXCEDENTE_B'), x('BRECHA_A')], name=f"EXTRA_A_min_{sufijo}")
+        self._min_propio_lean(demA, demB)
+        self._llenado_vrfi_lean(rem)
+
+        # familias que no son variables, con los mismos nombres para exportar
+        self.IN_VRFI, self.IN_A, self.IN_B = self.LLENADO_VRFI, self.LLENADO_A, self.LLENADO_B
+        self.Q_dis = self._derivada(q_dis, [])
+        self.REMANENTE_BRUTO = self._derivada(q_dis, [])
+        self.Rem = self._derivada(rem, [])
+        self.REMANENTE_POST_VRFI = self._derivada(rem, [('LLENADO_VRFI', -1.0)])
+        llenados = [('LLENADO_VRFI', -1.0), ('LLENADO_A', -1.0), ('LLENADO_B', -1.0)]
+        self.REBALSE_TOTAL = self._derivada(rem, llenados)
+        self.REBALSE_ON = self._derivada(rem, llenados, transf=lambda reb: float(reb > 1e-9))
+        self.SSR_ACUMULADO = self._derivada(0.0, [('SSR_EXIGIDO', 1.0), ('Q_CONSUMO_HUMANO', -1.0)])
+        self.Q_A_apoyo = self._derivada(0.0, [('ASIGNACION_A_BASE', 1.0), ('EXTRA_HACIA_A', 1.0)])
+        self.Q_B_apoyo = self._derivada(0.0, [('ASIGNACION_B_BASE', 1.0), ('EXTRA_HACIA_B', 1.0)])
+        self.d_A = self._derivada(demA, [('Q_A', -1.0), ('ASIGNACION_A_BASE', -1.0), ('EXTRA_HACIA_A', -1.0)])
+        self.d_B = self._derivada(demB, [('Q_B', -1.0), ('ASIGNACION_B_BASE', -1.0), ('EXTRA_HACIA_B', -1.0)])
+        self.Q_turb = self._derivada(rem, [('Q_A', 1.0), ('Q_B', 1.0)] + apoyo + llenados)
+
+        # objetivo: sum(d_A + d_B) = sum(dem) - sum(Q + apoyo)
+        obj = np.zeros(self._X.shape[0])
+        for fam in ('Q_A', 'Q_B', 'ASIGNACION_A_BASE', 'EXTRA_HACIA_A', 'ASIGNACION_B_BASE', 'EXTRA_HACIA_B'):
+            obj[c[fam]:c[fam] + self._n] = -1.0
+        m.setObjective(obj @ self._X + float(demA.sum() + demB.sum()), GRB.MINIMIZE)
+
+    def _min_propio_lean(self, demA, demB):
+        """
+        Q_x = min(DISPONIBLE_x, dem_x) con la demanda como constante de la restricción general.
+        Gurobi no permite editar esa constante, así que set_parameters() las reemplaza.
+        """
+        m = self.model
+        m.remove(getattr(self, '_gen_min_propio', []))
+        self._gen_min_propio = []
+        v, c = self._vars, self._col
+        for k, (ano, mes) in enumerate((ano, mes) for ano in self.anos for mes in self.meses):
+            for s, dem in (('A', demA[k]), ('B', demB[k])):
+                self._gen_min_propio.append(
+                    m.addGenConstrMin(v[c[f'Q_{s}'] + k], [v[c[f'DISPONIBLE_{s}'] + k]], constant=dem,
+                                      name=f"{s}_usa_todo_propio_{ano}_{mes}"))
+
+    def _llenado_vrfi_lean(self, rem):
+        """LLENADO_VRFI = min(ESPACIO_VRFI, Rem) con Rem como constante; set_hidrologia() las reemplaza."""
+        m = self.model
+        m.remove(getattr(self, '_gen_llenado_vrfi', []))
+        v, c = self._vars, self._col
+        self._gen_llenado_vrfi = [
+            m.addGenConstrMin(v[c['LLENADO_VRFI'] + k], [v[c['ESPACIO_VRFI'] + k]], constant=rem[k],
+                              name=f"LLENADO_VRFI_min_{ano}_{mes}")
+            for k, (ano, mes) in enumerate((ano, mes) for ano in self.anos for mes in self.meses)]
+
+    def _rhs_ssr(self):
+        """RHS de la fila SSR_EXIGIDO matricial: ssr_mes, más SSR_init en el primer mes."""
+        rhs = np.full(len(self.anos) * 12, self.V_C_H / 12.0)
+        rhs[0] += self.SSR_init
+        return rhs
+
+    def construir(self, builder=None):
+        """
+        Crea variables, restricciones y objetivo. builder="escalar" usa variables() +
+        restricciones() (addVars/addConstr); builder="matriz" usa variables_matriz() +
+        restricciones_matriz() (MVar/addMConstr); builder="lean" arma la formulación
+        reducida de restricciones_lean(). Devuelve el tiempo de construcción (s).
+        """
+        builder = builder or self.builder
+        if builder not in ("escalar", "matriz", "lean"):
+            raise ValueError(f"builder desconocido: {builder!r} (use 'escalar', 'matriz' o 'lean')")
+        tel = self.telemetria
+        t0 = time.perf_counter()
+        if tel is not None:
+            # cada add* se anota en su familia mientras se construye (ver model/telemetria.py)
+            model, self.model = self.model, tel.cronometrar(self.model)
+        try:
+            if builder == "escalar":
+                with fase(tel, 'variables'):
+                    self.variables()
+                with fase(tel, 'restricciones'):
+                    self.restricciones()
+            elif builder == "matriz":
+                with fase(tel, 'carga'):
+                    self.cargar_data("data/caudales.xlsx")
+                with fase(tel, 'variables'):
+                    self.variables_matriz()
+                with fase(tel, 'restricciones'):
+                    self.restricciones_matriz()
+            else:
+                with fase(tel, 'carga'):
+                    self.cargar_data("data/caudales.xlsx")
+                with fase(tel, 'variables'):
+                    self.variables_matriz(self.FAMILIAS_LEAN, self.ESCALARES_LEAN)
+                with fase(tel, 'restricciones'):
+                    self.restricciones_lean()  # fija también el objetivo
+            with fase(tel, 'objetivo'):
+                if builder != "lean":
+                    self.funcion_objetivo()
+                self.model.update()
+        finally:
+            if tel is not None:
+                self.model = model
+        self.tiempo_construccion = time.perf_counter() - t0
+        self._construido_con = builder
+        self.parametros_perfil = aplicar_perfil(self.model, 'modelito2', len(self.anos), self.perfil_solver)
+        if self.parametros_perfil:
+            print(f"Perfil de Gurobi ({len(self.anos)} años): {self.parametros_perfil}")
+        if tel is not None:
+            with tel.fase('censo'):
+                tel.tomar_censo(self.model)
+        return self.tiempo_construccion
+
+    # parámetros que set_parameters() puede cambiar sobre un modelo ya construido
+    PARAMETROS_EDITABLES = ('FEA', 'FEB', 'VRFI_init', 'VA_init', 'VB_init', 'SSR_init')
+
+    def set_parameters(self, **params):
+        """
+        Cambia FEA/FEB y/o los volúmenes iniciales. Si el MIP ya está construido, edita
+        el mismo modelo (RHS y cotas que dependen de la demanda, cotas de VRFI/VA/VB_prev_init)
+        y deja la solución anterior como MIP start del próximo solve(). Devuelve self.
+        """
+        desconocidos = sorted(set(params) - set(self.PARAMETROS_EDITABLES))
+        if desconocidos:
+            raise ValueError(f"parámetros no editables: {desconocidos} (use {', '.join(self.PARAMETROS_EDITABLES)})")
+        for attr, valor in params.items():
+            setattr(self, attr, valor)
+        if self._construido_con is None:
+            return self
+
+        m = self.model
+        if m.SolCount > 0:
+            variables = m.getVars()
+            m.setAttr("Start", variables, m.getAttr("X", variables))
+
+        if 'FEA' in params or 'FEB' in params:
+            demA, demB = self.demandas_mes()
+            dem = {'A': np.tile(demA, len(self.anos)), 'B': np.tile(demB, len(self.anos))}
+            for (_, attr, lado, factor), objs in self._param_dem.items():
+                valores = factor * dem[lado]
+                if isinstance(objs, list):
+                    m.setAttr(attr, objs, valores.tolist())
+                else:
+                    objs.setAttr(attr, valores)
+            if self._construido_con == "lean":
+                self._min_propio_lean(dem['A'], dem['B'])
+                m.ObjCon = float(dem['A'].sum() + dem['B'].sum())
+                for lado in ('A', 'B'):
+                    for k, d in enumerate(getattr(self, f'd_{lado}').values()):
+                        d.const = float(dem[lado][k])
+
+        for nombre, attr in (('VRFI_prev_init', 'VRFI_init'), ('VA_prev_init', 'VA_init'), ('VB_prev_init', 'VB_init')):
+            if attr in params:
+                var = getattr(self, nombre)
+                var.LB = var.UB = float(params[attr])
+        if 'SSR_init' in params:
+            if self._construido_con == "escalar":
+                self.SSR_prev_init.LB = self.SSR_prev_init.UB = float(self.SSR_init)
+            else:
+                self._fila_ssr.setAttr('RHS', self._rhs_ssr())
+        return self
+
+    def set_hidrologia(self, hidrologia):
+        """
+        Cambia la hidrología (un HydrologyDataset con las etiquetas de self.anos). Si el MIP
+        ya está construido edita las filas y constantes que dependen del caudal disponible
+        (Qin - QPD) en vez de reconstruirlo. Devuelve self.
+        """
+        self.hidrologia = hidrologia
+        if self._construido_con is None:
+            return self
+
+        m = self.model
+        filas = hidrologia.filas(self.anos)
+        q = (hidrologia.Qin_Hm3[filas] - hidrologia.QPD_eff_Hm3[filas]).ravel()
+        base = {'q': q, 'rem': np.maximum(q, 0.0)}
+        for (_, attr, b, factor), objs in self._param_hid.items():
+            valores = factor * base[b]
+            if isinstance(objs, list):
+                m.setAttr(attr, objs, valores.tolist())
+            else:
+                objs.setAttr(attr, valores)
+        if self._construido_con == "lean":
+            self._llenado_vrfi_lean(base['rem'])
+            for fam, b in (('Q_dis', 'q'), ('REMANENTE_BRUTO', 'q'), ('Rem', 'rem'), ('REMANENTE_POST_VRFI', 'rem'),
+                           ('REBALSE_TOTAL', 'rem'), ('REBALSE_ON', 'rem'), ('Q_turb', 'rem')):
+                for k, d in enumerate(getattr(self, fam).values()):
+                    d.const = float(base[b][k])
+        return self
+
     #  función objetivo
     def funcion_objetivo(self):
-        total_def = gp.quicksum(self.d_A[a,m] + self.d_B[a,m] for a in self.anos for m in self.meses)
+        total_def = quicksum(self.d_A[a,m] + self.d_B[a,m] for a in self.anos for m in self.meses)
         self.model.setObjective(total_def, GRB.MINIMIZE)
 
-    def exportar_a_excel(self, filename="resultados_embalse.xlsx"):
-        data = []
-        for ano in self.anos:
-            y = int(ano.split('/')[0])
-            for mes in self.meses:
-                seg = self.segundos_por_mes[mes]
-                Qin_m3s = self.caudal_afluente.get((y, mes), 0.0)
-                Qin = Qin_m3s * seg / 1_000_000.0
-                QPD_eff_Hm3 = self.QPD_eff[ano, mes] * seg / 1_000_000.0
-                key = self.hidrologico_a_civil[mes]
-                DemA = (self.demanda_A_mensual[key] * self.num_acciones_A * self.FEA) / 1_000_000.0
-                DemB = (self.demanda_B_mensual[key] * self.num_acciones_B * self.FEB) / 1_000_000.0
-                fila = {
-                    'Ano': ano, 'Mes': mes,
-                    'V_VRFI': self.V_VRFI[ano, mes].X, 'V_A': self.V_A[ano, mes].X, 'V_B': self.V_B[ano, mes].X,
-                    'Q_dis': self.Q_dis[ano, mes].X, 'Q_CONSUMO_HUMANO': self.Q_CONSUMO_HUMANO[ano, mes].X,
-                    'SSR_EXIGIDO': self.SSR_EXIGIDO[ano, mes].X, 'SSR_ACUMULADO': self.SSR_ACUMULADO[ano, mes].X,
-                    'Q_A': self.Q_A[ano, mes].X, 'Q_B': self.Q_B[ano, mes].X, 'Q_turb': self.Q_turb[ano, mes].X,
-                    'IN_VRFI': self.IN_VRFI[ano, mes].X, 'IN_A': self.IN_A[ano, mes].X, 'IN_B': self.IN_B[ano, mes].X,
-                    'REBALSE_TOTAL': self.REBALSE_TOTAL[ano, mes].X,
-                    'VRFI_DISPONIBLE_LIBRE': self.VRFI_DISPONIBLE_LIBRE[ano, mes].X,
-                    'FALTANTE_A': self.FALTANTE_A[ano, mes].X, 'FALTANTE_B': self.FALTANTE_B[ano, mes].X, 'FALTANTE_TOTAL': self.FALTANTE_TOTAL[ano, mes].X,
-                    'd_A': self.d_A[ano, mes].X, 'd_B': self.d_B[ano, mes].X,
-                    'QPD_eff_Hm3': QPD_eff_Hm3,
-                    'Demanda_A': DemA, 'Demanda_B': DemB,
-                    'Q_afl_m3s': Qin_m3s, 'Q_afl_Hm3': Qin,
-                    'Rem': self.Rem[ano, mes].X, 'LLENADO_VRFI': self.LLENADO_VRFI[ano, mes].X, 'REMANENTE_POST_VRFI': self.REMANENTE_POST_VRFI[ano, mes].X,
-                    'CUOTA_A': self.CUOTA_A[ano, mes].X, 'CUOTA_B': self.CUOTA_B[ano, mes].X,
-                    'LLENADO_A': self.LLENADO_A[ano, mes].X, 'LLENADO_B': self.LLENADO_B[ano, mes].X,
-                    # diagnósticos extra
-                    'REBALSE_ON': self.REBALSE_ON[ano, mes].X,
-                    'VRFI_APOYO_CAP': self.VRFI_APOYO_CAP[ano, mes].X,
-                }
-                fila['Q_A_apoyo'] = self.Q_A_apoyo[ano, mes].X
-                fila['Q_B_apoyo'] = self.Q_B_apoyo[ano, mes].X
-                tot_dem = DemA + DemB
-                servA = fila['Q_A'] + fila['Q_A_apoyo']
-                servB = fila['Q_B'] + fila['Q_B_apoyo']
-                fila['Deficit_Total'] = self.d_A[ano, mes].X + self.d_B[ano, mes].X
-                fila['Satisfaccion_A'] = (servA / DemA * 100) if (DemA > 0) else 100
-                fila['Satisfaccion_B'] = (servB / DemB * 100) if (DemB > 0) else 100
-                fila['Satisfaccion_Total'] = ((servA + servB) / tot_dem * 100) if tot_dem > 0 else 100
-                data.append(fila)
-
-        df_principal = pd.DataFrame(data)
-
-        resumen = []
-        for ano in self.anos:
-            d = df_principal[df_principal['Ano'] == ano]
-            resumen.append({
-                'Ano': ano,
-                'Deficit_Total_Anual': d['Deficit_Total'].sum(),
-                'Deficit_A_Anual': d['d_A'].sum(),
-                'Deficit_B_Anual': d['d_B'].sum(),
-                'Volumen_Turbinado_Anual': d['Q_turb'].sum(),
-                'Demanda_Total_Anual': d['Demanda_A'].sum() + d['Demanda_B'].sum(),
-                'Satisfaccion_Promedio': d['Satisfaccion_Total'].mean(),
-                'Mes_Mayor_Deficit': (d.loc[d['Deficit_Total'].idxmax(), 'Mes'] if d['Deficit_Total'].max() > 0 else 'Ninguno')
-            })
-        df_resumen = pd.DataFrame(resumen)
-
-        with pd.ExcelWriter(filename, engine='openpyxl') as w:
-            df_principal.to_excel(w, sheet_name='Resultados_Detallados', index=False)
-            df_resumen.to_excel(w, sheet_name='Resumen_Anual', index=False)
-
-        print(f" Resultados exportados a {filename}")
+    # Familias que leen las tablas de resultados
+    FAMILIAS_RESULTADO = (
+        'V_VRFI', 'V_A', 'V_B', 'Q_dis', 'Q_CONSUMO_HUMANO', 'SSR_EXIGIDO', 'SSR_ACUMULADO',
+        'Q_A', 'Q_B', 'Q_turb', 'IN_VRFI', 'IN_A', 'IN_B', 'REBALSE_TOTAL',
+        'VRFI_DISPONIBLE_LIBRE', 'FALTANTE_A', 'FALTANTE_B', 'FALTANTE_TOTAL', 'd_A', 'd_B',
+        'Rem', 'LLENADO_VRFI', 'REMANENTE_POST_VRFI', 'CUOTA_A', 'CUOTA_B', 'LLENADO_A', 'LLENADO_B',
+        'REBALSE_ON', 'VRFI_APOYO_CAP', 'APOYO_TOTAL', 'Q_A_apoyo', 'Q_B_apoyo',
+    )
+
+    def extraer_solucion(self, familias=FAMILIAS_RESULTADO, **resumen):
+        """Solution con las familias del MIP resuelto, leídas con un solo getAttr('X')."""
+        return Solution.desde_modelo(self.model, {fam: getattr(self, fam) for fam in familias},
+                                     self.anos, self.meses, **resumen)
+
+    def _valores_gurobi(self, familias=FAMILIAS_RESULTADO):
+        """Valores de cada familia como array (n_anos, 12)."""
+        return self.extraer_solucion(familias).valores
+
+    def demandas_mes(self, con_fe=True):
+        """Demandas A/B (Hm³/mes, con FE o base si con_fe=False) como arrays (12,) en orden MAY–ABR."""
+        FEA, FEB = (self.FEA, self.FEB) if con_fe else (1.0, 1.0)
+        demA = np.array([self.demanda_A_mensual[self.hidrologico_a_civil[mes]] * self.num_acciones_A * FEA
+                         for mes in self.meses]) / 1_000_000.0
+        demB = np.array([self.demanda_B_mensual[self.hidrologico_a_civil[mes]] * self.num_acciones_B * FEB
+                         for mes in self.meses]) / 1_000_000.0
+        return demA, demB
+
+    def simular_reglas(self, familias=FAMILIAS):
+        """
+        Recursión NumPy de las reglas de operación (sin Gurobi).
+        Requiere caudales cargados; devuelve dict familia -> array (n_anos, 12).
+        """
+        filas = self.hidrologia.filas(self.anos)
+        demA, demB = self.demandas_mes()
+        return simular_reglas(self.hidrologia.Qin_Hm3[filas], self.hidrologia.QPD_eff_Hm3[filas], demA, demB,
+                              VRFI_init=self.VRFI_init, VA_init=self.VA_init, VB_init=self.VB_init,
+                              C_VRFI=self.C_VRFI, C_TIPO_A=self.C_TIPO_A, C_TIPO_B=self.C_TIPO_B,
+                              RESERVA_MIN_VRFI=self.RESERVA_MIN_VRFI, ssr_mes=self.V_C_H / 12.0,
+                              acumular_ssr=self.acumular_ssr, SSR_init=self.SSR_init, familias=familias)
+
+    def cargar_inicio(self):
+        """
+        MIP start desde la recursión de reglas: Start en todas las variables del modelo
+        construido (incluidas las auxiliares) y VarHintVal en las binarias.
+        Devuelve el número de variables con Start.
+        """
+        sim = self.simular_reglas(FAMILIAS + FAMILIAS_AUX)
+        return cargar_inicio(self.model, sim, self.anos, self.meses,
+                             binarias=('REBALSE_ON', 'Z_A_VACIO', 'Z_B_VACIO'))
+
+    def exportar_resultados(self, filename="resultados_embalse.xlsx"):
+        """
+        Escribe df_detalle / df_resumen de self.solucion según self.output_format
+        ("xlsx", "csv", "parquet" o "none"; ver model/salidas.py).
+        """
+        df_principal, df_resumen = self.tablas_resultados(self.solucion.valores)
+        archivos = escribir_tablas({'Resultados_Detallados': (df_principal, False),
+                                    'Resumen_Anual': (df_resumen, False)}, filename, self.output_format)
+
+        if archivos:
+            print(f" Resultados exportados a {', '.join(archivos)}")
         print(f"Deficit total: {df_principal['Deficit_Total'].sum():.2f} Hm³")
         print(f" Satisfaccion promedio: {df_principal['Satisfaccion_Total'].mean():.1f}%")
 
         return df_principal, df_resumen
 
-    def exportar_a_txt(self, filename="reporte_embalse.txt"):
-        def barra20(pct):
-            n = int(round(min(max(pct, 0), 100) / 5.0))
-            return "█" * n + "·" * (20 - n)
+    def exportar_a_excel(self, filename="resultados_embalse.xlsx"):
+        """Como exportar_resultados, siempre en .xlsx."""
+        formato, self.output_format = self.output_format, "xlsx"
+        try:
+            return self.exportar_resultados(filename)
+        finally:
+            self.output_format = formato
+
+    # columnas de df_detalle que salen directo de una familia, en orden (None = columna calculada)
+    COLUMNAS_DETALLE = (
+        'V_VRFI', 'V_A', 'V_B', 'Q_dis', 'Q_CONSUMO_HUMANO', 'SSR_EXIGIDO', 'SSR_ACUMULADO',
+        'Q_A', 'Q_B', 'Q_turb', 'IN_VRFI', 'IN_A', 'IN_B', 'REBALSE_TOTAL',
+        'VRFI_DISPONIBLE_LIBRE', 'FALTANTE_A', 'FALTANTE_B', 'FALTANTE_TOTAL', 'd_A', 'd_B',
+        None, 'Rem', 'LLENADO_VRFI', 'REMANENTE_POST_VRFI', 'CUOTA_A', 'CUOTA_B', 'LLENADO_A', 'LLENADO_B',
+        'REBALSE_ON', 'VRFI_APOYO_CAP', 'Q_A_apoyo', 'Q_B_apoyo',
+    )
+
+    def tablas_resultados(self, v):
+        """
+        df_detalle / df_resumen a partir de arrays (n_anos, 12) por familia.
+        Las columnas se arman enteras desde los arrays (una fila por año y mes).
+        """
+        v = _sin_ruido(v)
+        h = self.hidrologia
+        n_anos = len(self.anos)
+        filas = h.filas(self.anos)
+        demA, demB = self.demandas_mes()
+        DemA = np.tile(demA, n_anos)
+        DemB = np.tile(demB, n_anos)
+
+        cols = {'Ano': np.repeat(np.array(self.anos, dtype=object), 12), 'Mes': np.tile(self.meses, n_anos)}
+        for fam in self.COLUMNAS_DETALLE:
+            if fam is not None:
+                cols[fam] = v[fam].ravel()
+                continue
+            cols['QPD_eff_Hm3'] = h.QPD_eff_Hm3[filas].ravel()
+            cols['Demanda_A'] = DemA
+            cols['Demanda_B'] = DemB
+            cols['Q_afl_m3s'] = h.Q_afl[filas].ravel()
+            cols['Q_afl_Hm3'] = h.Qin_Hm3[filas].ravel()
+        servA = cols['Q_A'] + cols['Q_A_apoyo']
+        servB = cols['Q_B'] + cols['Q_B_apoyo']
+        tot_dem = DemA + DemB
+        cols['Deficit_Total'] = cols['d_A'] + cols['d_B']
+        cols['Satisfaccion_A'] = porcentaje(servA, DemA)
+        cols['Satisfaccion_B'] = porcentaje(servB, DemB)
+        cols['Satisfaccion_Total'] = porcentaje(servA + servB, tot_dem)
+        df_principal = pd.DataFrame(cols)
+
+        deficit = cols['Deficit_Total'].reshape(n_anos, 12)
+        mayor = deficit.argmax(axis=1)
+        df_resumen = pd.DataFrame({
+            'Ano': list(self.anos),
+            'Deficit_Total_Anual': deficit.sum(axis=1),
+            'Deficit_A_Anual': v['d_A'].sum(axis=1),
+            'Deficit_B_Anual': v['d_B'].sum(axis=1),
+            'Volumen_Turbinado_Anual': v['Q_turb'].sum(axis=1),
+            'Demanda_Total_Anual': np.full(n_anos, demA.sum() + demB.sum()),
+            'Satisfaccion_Promedio': cols['Satisfaccion_Total'].reshape(n_anos, 12).mean(axis=1),
+            'Mes_Mayor_Deficit': [self.meses[k] if deficit[a].max() > 0 else 'Ninguno'
+                                  for a, k in enumerate(mayor)],
+        })
+        return df_principal, df_resumen
 
-        mes_tag = {1:'may', 2:'jun', 3:'jul', 4:'ago', 5:'sep', 6:'oct',
-                   7:'nov', 8:'dic', 9:'ene', 10:'feb', 11:'mar', 12:'abr'}
+    def kpis(self):
+        """
+        KPIs del horizonte resuelto (self.anos) desde self.solucion:
+        - Qturb_total, Rebalse_total, Qdis_prom, Satisf_prom
+        - Déficit del MODELO (sum d_A + d_B), déficit por FE adicional y total
+        - Stocks al fin del horizonte (VRFI, A, B, TOTAL)
+        """
+        v = self.solucion.valores
+        n_anos = len(self.anos)
+        # Demanda BASE (sin FE) — en Hm3/mes
+        demA_base, demB_base = self.demandas_mes(con_fe=False)
+
+        serv_total = float((v['Q_A'] + v['Q_A_apoyo'] + v['Q_B'] + v['Q_B_apoyo']).sum())
+        dem_eff_total = n_anos * float((demA_base * self.FEA + demB_base * self.FEB).sum())
+        def_modelo = float((v['d_A'] + v['d_B']).sum())
+        def_FE = n_anos * float(((1.0 - self.FEA) * demA_base + (1.0 - self.FEB) * demB_base).sum())
+        VRFI_fin, A_fin, B_fin = (float(self.solucion.fin(fam)) for fam in ('V_VRFI', 'V_A', 'V_B'))
+
+        return dict(
+            Qturb_total_Hm3=float(v['Q_turb'].sum()),
+            Rebalse_total_Hm3=float(v['REBALSE_TOTAL'].sum()),
+            Qdis_prom_Hm3_mes=float(v['Q_dis'].sum()) / (n_anos * 12),
+            Satisf_prom_pct=(100.0 * serv_total / dem_eff_total) if dem_eff_total > 0 else 100.0,
+            Def_modelo_Hm3=def_modelo,
+            Def_FE_Hm3=def_FE,
+            Def_total_Hm3=def_modelo + def_FE,
+            VRFI_fin_Hm3=VRFI_fin,
+            A_fin_Hm3=A_fin,
+            B_fin_Hm3=B_fin,
+            TOTAL_fin_Hm3=VRFI_fin + A_fin + B_fin
+        )
+
+    # plantillas de las filas del reporte anual de exportar_a_txt (Tabla 1 y Tabla 2)
+    FILA_FISICA = ("{:<4} {:6.2f}  {:7.1f}  {:6.2f}  {:7.1f}  {:7.1f}  {:7.1f}  {:7.1f}  {:7.1f}  {:<24}  "
+                   "{:5.1f}→{:<5.1f}      {:5.1f}→{:<5.1f}    {:5.1f}→{:<5.1f}    "
+                   "{:3.0f}→{:<3.0f}%     {:3.0f}→{:<3.0f}%   {:3.0f}→{:<3.0f}%     "
+                   " |  VRFI[{:6.1f}] {}  A[{:6.1f}] {}  B[{:6.1f}] {}")
+    FILA_SERVICIO = ("{:<4} {:8.1f}   {:6.1f}   {:6.1f}   {:8.1f}   {:6.1f}   {:6.1f}   {:6.1f}   "
+                     "{:6.1f}    {:6.1f}     {:6.1f}    {:6.1f}   {:8.1f}   {:7.1f}    {:9.1f}   {:6.1f}")
+    MES_TAG = {1: 'may', 2: 'jun', 3: 'jul', 4: 'ago', 5: 'sep', 6: 'oct',
+               7: 'nov', 8: 'dic', 9: 'ene', 10: 'feb', 11: 'mar', 12: 'abr'}
+
+    def _agregados_reporte(self, v, dem_eff):
+        """
+        Agregados que comparten exportar_a_txt y _texto_resumen_intervalo, como reducciones
+        sobre los arrays (n_anos, 12) v de la solución. dem_eff: demanda efectiva (12,) con FE.
+        Totales y promedios por mes suman en el orden de los antiguos acumuladores
+        (_suma_secuencial), así los reportes no cambian ni en el último decimal.
+        """
+        N_Y = len(self.anos)
+        serv = (v['Q_A'] + v['Q_A_apoyo']) + (v['Q_B'] + v['Q_B_apoyo'])
+        serv_mes = _suma_secuencial(serv, axis=0)
+        dem_mes = _suma_secuencial(np.broadcast_to(dem_eff, serv.shape), axis=0)
+        satisf_mes = np.full(12, 100.0)
+        np.divide(100.0 * serv_mes, dem_mes, out=satisf_mes, where=dem_mes > 0)
+        serv_total = _suma_secuencial(serv_mes)
+        dem_total = _suma_secuencial(dem_mes)
+        d_modelo = v['d_A'] + v['d_B']
+        return dict(
+            Qturb_total=_suma_secuencial(v['Q_turb'].T),
+            rebalse_total=_suma_secuencial(v['REBALSE_TOTAL'].T),
+            qdis_total=_suma_secuencial(v['Q_dis'].T),
+            deficit_modelo_total=_suma_secuencial(d_modelo.T),
+            satisf_global=(100.0 * serv_total / dem_total) if dem_total > 0 else 100.0,
+            rebalse_prom_mes=_suma_secuencial(v['REBALSE_TOTAL'], axis=0) / N_Y,
+            qdis_prom_mes=_suma_secuencial(v['Q_dis'], axis=0) / N_Y,
+            d_modelo_prom_mes=_suma_secuencial(d_modelo, axis=0) / N_Y,
+            satisf_mes=satisf_mes,
+            vrfi_fin_prom=_suma_secuencial(v['V_VRFI'], axis=0) / N_Y,
+            a_fin_prom=_suma_secuencial(v['V_A'], axis=0) / N_Y,
+            b_fin_prom=_suma_secuencial(v['V_B'], axis=0) / N_Y,
+        )
 
+    def exportar_a_txt(self, filename="reporte_embalse.txt"):
+        mes_tag = self.MES_TAG
         lineas = []
 
         N_Y  = len(self.anos)
         N_M  = 12
         TOT_PM = N_Y * N_M
 
-        Qturb_total_30y = 0.0
-        rebalse_total_30y = 0.0
-        qdis_total_30y  = 0.0
-        serv_total_30y  = 0.0
-        dem_total_30y   = 0.0
-
-        rebalse_prom_mes = {m: 0.0 for m in self.meses}
-        qdis_prom_mes    = {m: 0.0 for m in self.meses}
-        satisf_por_mes   = {}
-
-        for mes in self.meses:
-            serv_sum = 0.0
-            dem_sum  = 0.0
-            key_civil = self.hidrologico_a_civil[mes]
-            DemA_mes = (self.demanda_A_mensual[key_civil] * self.num_acciones_A * self.FEA) / 1_000_000.0
-            DemB_mes = (self.demanda_B_mensual[key_civil] * self.num_acciones_B * self.FEB) / 1_000_000.0
-
-            for ano in self.anos:
-                Qturb_total_30y   += self.Q_turb[ano, mes].X
-                rebalse_total_30y += self.REBALSE_TOTAL[ano, mes].X
-                qdis_total_30y    += self.Q_dis[ano, mes].X
-                servA = self.Q_A[ano, mes].X + self.Q_A_apoyo[ano, mes].X
-                servB = self.Q_B[ano, mes].X + self.Q_B_apoyo[ano, mes].X
-                serv_sum += (servA + servB)
-                dem_sum  += (DemA_mes + DemB_mes)
-                rebalse_prom_mes[mes] += self.REBALSE_TOTAL[ano, mes].X
-                qdis_prom_mes[mes]    += self.Q_dis[ano, mes].X
-
-            rebalse_prom_mes[mes] /= N_Y
-            qdis_prom_mes[mes]    /= N_Y
-            satisf_por_mes[mes]    = (100.0 * serv_sum / dem_sum) if dem_sum > 0 else 100.0
-            serv_total_30y += serv_sum
-            dem_total_30y  += dem_sum
-
+        v = _sin_ruido(self.solucion.valores)
+        demA, demB = self.demandas_mes()
+        agr = self._agregados_reporte(v, demA + demB)
+        Qturb_total_30y = agr['Qturb_total']
+        rebalse_total_30y = agr['rebalse_total']
+        qdis_total_30y = agr['qdis_total']
         rebalse_prom_mensual_30y = rebalse_total_30y / TOT_PM
         qdis_prom_mensual_30y    = qdis_total_30y  / TOT_PM
         qdis_prom_total_30y      = qdis_total_30y  / TOT_PM
-        satisf_global_30y        = (100.0 * serv_total_30y / dem_total_30y) if dem_total_30y > 0 else 100.0
+        satisf_global_30y        = agr['satisf_global']
 
-        ultimo_ano = self.anos[-1]
-        V_R_fin = self.V_VRFI[ultimo_ano, 12].X
-        V_A_fin = self.V_A[ultimo_ano, 12].X
-        V_B_fin = self.V_B[ultimo_ano, 12].X
+        V_R_fin = v['V_VRFI'][-1, 11]
+        V_A_fin = v['V_A'][-1, 11]
+        V_B_fin = v['V_B'][-1, 11]
         V_total_fin_30y = V_R_fin + V_A_fin + V_B_fin
 
         lineas.append("="*70)
@@ -628,113 +1393,71 @@ class EmbalseNuevaPunilla:
         lineas.append("Promedios mensuales sobre 30 anos:")
         lineas.append("Mes   Rebalse prom [Hm³/mes]   Q_dis prom [Hm³/mes]   %Satisfaccion (ponderada)")
         lineas.append("-"*70)
-        for mes in self.meses:
-            lineas.append(f"{mes_tag[mes]:<4}  {rebalse_prom_mes[mes]:10.2f}                {qdis_prom_mes[mes]:10.2f}                {satisf_por_mes[mes]:6.2f}%")
+        for mes, reb, qdis, sat in zip(self.meses, agr['rebalse_prom_mes'], agr['qdis_prom_mes'], agr['satisf_mes']):
+            lineas.append(f"{mes_tag[mes]:<4}  {reb:10.2f}                {qdis:10.2f}                {sat:6.2f}%")
         lineas.append("")
         lineas.append("Agua almacenada al final de los 30 anos (fin del ultimo periodo):")
         lineas.append(f"  VRFI: {V_R_fin:.1f} Hm³   A: {V_A_fin:.1f} Hm³   B: {V_B_fin:.1f} Hm³   TOTAL: {V_total_fin_30y:.1f} Hm³")
         lineas.append("")
 
-        for ano in self.anos:
-            y = int(ano.split('/')[0])
+        # --- columnas de las tablas anuales, todas de una vez sobre (n_anos, 12) ---
+        h = self.hidrologia
+        filas = h.filas(self.anos)
+        # volumen al inicio de cada mes: fin del mes anterior; en mayo, fin de abril del año
+        # hidrológico anterior si está en el horizonte, si no el volumen inicial
+        prev = {}
+        for fam, inicial in (('V_VRFI', self.VRFI_init), ('V_A', self.VA_init), ('V_B', self.VB_init)):
+            prev[fam] = np.empty((N_Y, 12))
+            prev[fam][:, 1:] = v[fam][:, :-1]
+            for a, ano in enumerate(self.anos):
+                y = int(ano.split('/')[0])
+                prev_ano = f"{y-1}/{y}"
+                prev[fam][a, 0] = v[fam][self.anos.index(prev_ano), 11] if prev_ano in self.anos else inicial
+        pct = {}
+        for fam, cap in (('V_VRFI', self.C_VRFI), ('V_A', self.C_TIPO_A), ('V_B', self.C_TIPO_B)):
+            pct[fam] = (prev[fam] / cap * 100, v[fam] / cap * 100) if cap > 0 else (np.zeros((N_Y, 12)),) * 2
+        barras = ["█" * n + "·" * (20 - n) for n in range(21)]
+
+        def col(x):
+            return np.broadcast_to(x, (N_Y, 12)).ravel().tolist()
+
+        def col_barra(pct_fin):
+            return [barras[n] for n in col(np.rint(np.clip(pct_fin, 0, 100) / 5.0).astype(int))]
+
+        tags = [mes_tag[mes] for mes in self.meses] * N_Y
+        motivo = ["-"] * (N_Y * 12)
+        V_R, V_A, V_B = col(v['V_VRFI']), col(v['V_A']), col(v['V_B'])
+        tabla1 = [self.FILA_FISICA.format(*f) for f in zip(
+            tags, col(h.Q_afl[filas]), col(h.Qin_Hm3[filas]), col(h.QPD_eff[filas]), col(h.QPD_eff_Hm3[filas]),
+            col(v['IN_VRFI']), col(v['IN_A']), col(v['IN_B']), col(v['REBALSE_TOTAL']), motivo,
+            col(prev['V_VRFI']), V_R, col(prev['V_A']), V_A, col(prev['V_B']), V_B,
+            col(pct['V_VRFI'][0]), col(pct['V_VRFI'][1]), col(pct['V_A'][0]), col(pct['V_A'][1]),
+            col(pct['V_B'][0]), col(pct['V_B'][1]),
+            V_R, col_barra(pct['V_VRFI'][1]), V_A, col_barra(pct['V_A'][1]), V_B, col_barra(pct['V_B'][1]))]
+        tabla2 = [self.FILA_SERVICIO.format(*f) for f in zip(
+            tags, col(demA), col(v['Q_A'] + v['Q_A_apoyo']), col(v['d_A']),
+            col(demB), col(v['Q_B'] + v['Q_B_apoyo']), col(v['d_B']), col(v['Q_CONSUMO_HUMANO']),
+            col(v['Q_A']), col(v['Q_A_apoyo']), col(v['Q_B']), col(v['Q_B_apoyo']),
+            col(v['VRFI_DISPONIBLE_LIBRE']), col(v['FALTANTE_TOTAL']), col(v['APOYO_TOTAL']), col(v['Q_turb']))]
+
+        encabezado1 = ("Mes   Qin     Qin_m    QPD     QPD_m    IN_R     INA      INB      EB       "
+                       "Motivo_EB        VRFI prev→fin         A prev→fin        B prev→fin        "
+                       "VRFI %p→f     A %p→f      B %p→f      CHEQ    |  Stocks fin  ")
+        encabezado2 = ("Mes   DemA*FE    ServA     dA      DemB*FE    ServB     dB      Q_SSR    "
+                       "A_out    VRFI→A    B_out    VRFI→B   VRFI_avail  FALTANTE_TOTAL  APOYO_TOTAL   Qturb")
+        for a, ano in enumerate(self.anos):
             lineas.append("="*37)
             lineas.append(f"REPORTE ANUAL: {ano}  (mes a mes)")
             lineas.append("="*37)
             lineas.append("Tabla 1 — Fisica del sistema (volumenes en Hm³; caudales en m³/s y Qin/QPD en Hm³/mes)")
-            encabezado1 = ("Mes   Qin     Qin_m    QPD     QPD_m    IN_R     INA      INB      EB       "
-                           "Motivo_EB        VRFI prev→fin         A prev→fin        B prev→fin        "
-                           "VRFI %p→f     A %p→f      B %p→f      CHEQ    |  Stocks fin  ")
             lineas.append(encabezado1)
             lineas.append("-"*230)
-
-            for i, mes in enumerate(self.meses):
-                seg = self.segundos_por_mes[mes]
-                Qin_m3s = self.caudal_afluente.get((y, mes), 0.0)
-                Qin_Hm3 = Qin_m3s * seg / 1_000_000.0
-                QPD_m3s = self.QPD_eff[ano, mes]
-                QPD_Hm3 = QPD_m3s * seg / 1_000_000.0
-                IN_R = self.IN_VRFI[ano, mes].X
-                INA  = self.IN_A[ano, mes].X
-                INB  = self.IN_B[ano, mes].X
-                EB   = self.REBALSE_TOTAL[ano, mes].X
-
-                if i == 0:
-                    prev_ano = f"{y-1}/{y}"
-                    V_R_prev = self.V_VRFI[prev_ano, 12].X if prev_ano in self.anos else self.VRFI_init
-                    V_A_prev = self.V_A[prev_ano, 12].X    if prev_ano in self.anos else self.VA_init
-                    V_B_prev = self.V_B[prev_ano, 12].X    if prev_ano in self.anos else self.VB_init
-                else:
-                    V_R_prev = self.V_VRFI[ano, mes-1].X
-                    V_A_prev = self.V_A[ano, mes-1].X
-                    V_B_prev = self.V_B[ano, mes-1].X
-
-                V_R_fin_m = self.V_VRFI[ano, mes].X
-                V_A_fin_m = self.V_A[ano, mes].X
-                V_B_fin_m = self.V_B[ano, mes].X
-
-                pct_R_prev = (V_R_prev / self.C_VRFI  * 100) if self.C_VRFI  > 0 else 0
-                pct_R_fin  = (V_R_fin_m / self.C_VRFI * 100) if self.C_VRFI  > 0 else 0
-                pct_A_prev = (V_A_prev / self.C_TIPO_A * 100) if self.C_TIPO_A > 0 else 0
-                pct_A_fin  = (V_A_fin_m / self.C_TIPO_A * 100) if self.C_TIPO_A > 0 else 0
-                pct_B_prev = (V_B_prev / self.C_TIPO_B * 100) if self.C_TIPO_B > 0 else 0
-                pct_B_fin  = (V_B_fin_m / self.C_TIPO_B * 100) if self.C_TIPO_B > 0 else 0
-
-                motivo  = "-"
-
-                barR = barra20(pct_R_fin)
-                barA = barra20(pct_A_fin)
-                barB = barra20(pct_B_fin)
-
-                fila1 = (f"{mes_tag[mes]:<4} "
-                         f"{Qin_m3s:6.2f}  {Qin_Hm3:7.1f}  "
-                         f"{QPD_m3s:6.2f}  {QPD_Hm3:7.1f}  "
-                         f"{IN_R:7.1f}  {INA:7.1f}  {INB:7.1f}  {EB:7.1f}  "
-                         f"{motivo:<24}  "
-                         f"{V_R_prev:5.1f}→{V_R_fin_m:<5.1f}      "
-                         f"{V_A_prev:5.1f}→{V_A_fin_m:<5.1f}    "
-                         f"{V_B_prev:5.1f}→{V_B_fin_m:<5.1f}    "
-                         f"{pct_R_prev:3.0f}→{pct_R_fin:<3.0f}%     "
-                         f"{pct_A_prev:3.0f}→{pct_A_fin:<3.0f}%   "
-                         f"{pct_B_prev:3.0f}→{pct_B_fin:<3.0f}%     "
-                         f" |  VRFI[{V_R_fin_m:6.1f}] {barR}  "
-                         f"A[{V_A_fin_m:6.1f}] {barA}  "
-                         f"B[{V_B_fin_m:6.1f}] {barB}")
-                lineas.append(fila1)
-
+            lineas.extend(tabla1[12 * a:12 * (a + 1)])
             lineas.append("")
             lineas.append("Tabla 2 — Servicio (Hm³/mes) + SSR (Hm³) + Qturb (Hm³)")
-            encabezado2 = ("Mes   DemA*FE    ServA     dA      DemB*FE    ServB     dB      Q_SSR    "
-                           "A_out    VRFI→A    B_out    VRFI→B   VRFI_avail  FALTANTE_TOTAL  APOYO_TOTAL   Qturb")
             lineas.append(encabezado2)
             lineas.append("-"*160)
-
-            for i, mes in enumerate(self.meses):
-                key = self.hidrologico_a_civil[mes]
-                DemA = (self.demanda_A_mensual[key] * self.num_acciones_A * self.FEA) / 1_000_000.0
-                DemB = (self.demanda_B_mensual[key] * self.num_acciones_B * self.FEB) / 1_000_000.0
-                ServA = self.Q_A[ano, mes].X + self.Q_A_apoyo[ano, mes].X
-                ServB = self.Q_B[ano, mes].X + self.Q_B_apoyo[ano, mes].X
-                dA    = self.d_A[ano, mes].X
-                dB    = self.d_B[ano, mes].X
-                Q_SSR = self.Q_CONSUMO_HUMANO[ano, mes].X
-                A_out = self.Q_A[ano, mes].X
-                B_out = self.Q_B[ano, mes].X
-                VA    = self.Q_A_apoyo[ano, mes].X
-                VB    = self.Q_B_apoyo[ano, mes].X
-                Qturb = self.Q_turb[ano, mes].X
-                VRFIa = self.VRFI_DISPONIBLE_LIBRE[ano, mes].X
-                needT = self.FALTANTE_TOTAL[ano, mes].X
-                supT  = self.APOYO_TOTAL[ano, mes].X
-
-                fila2 = (f"{mes_tag[mes]:<4} "
-                         f"{DemA:8.1f}   {ServA:6.1f}   {dA:6.1f}   "
-                         f"{DemB:8.1f}   {ServB:6.1f}   {dB:6.1f}   "
-                         f"{Q_SSR:6.1f}   "
-                         f"{A_out:6.1f}    {VA:6.1f}     {B_out:6.1f}    {VB:6.1f}   "
-                         f"{VRFIa:8.1f}   {needT:7.1f}    {supT:9.1f}   "
-                         f"{Qturb:6.1f}")
-                lineas.append(fila2)
-
+            lineas.extend(tabla2[12 * a:12 * (a + 1)])
             lineas.append("")
 
         with open(filename, "w", encoding="utf-8") as f:
@@ -748,13 +1471,12 @@ class EmbalseNuevaPunilla:
         Devuelve un string con el bloque de texto compacto del intervalo:
         cabecera, KPIs del intervalo, tablas de promedios mensuales incluyendo
         el déficit por FE, y 'agua almacenada al final del intervalo'.
-        Debe llamarse después de emb.solve() para que .X tenga valores.
+        Debe llamarse después de emb.solve() (lee self.solucion, sin ruido bajo 1e-9).
         """
         assert set(anos_intervalo) == set(self.anos), \
             "Este Embalse debe haberse resuelto con exactamente este subrango de anos."
 
-        mes_tag = {1:'may', 2:'jun', 3:'jul', 4:'ago', 5:'sep', 6:'oct',
-                7:'nov', 8:'dic', 9:'ene', 10:'feb', 11:'mar', 12:'abr'}
+        mes_tag = self.MES_TAG
 
         lineas = []
         lineas.append("="*78)
@@ -768,95 +1490,32 @@ class EmbalseNuevaPunilla:
         N_Y = len(anos_intervalo)
         TOT_PM = N_Y * 12
 
-        Qturb_total = 0.0
-        rebalse_total = 0.0
-        qdis_total = 0.0
-
-        # Déficits
-        deficit_modelo_total = 0.0  # ∑ d_A + d_B (lo que minimiza la FO)
-        deficit_por_FE_total = 0.0  # ∑ [(1−FEA)*DemA_base + (1−FEB)*DemB_base] por mes y año
-
-        serv_total = 0.0
-        dem_total = 0.0  # demanda efectiva (con FE) para % satisfacción
-
-        # Para tablas de promedios mensuales
-        rebalse_prom_mes = {m: 0.0 for m in self.meses}
-        qdis_prom_mes    = {m: 0.0 for m in self.meses}
-        satisf_por_mes   = {}
-
-        # Nuevas columnas: déficit promedio mensual desglosado
-        d_modelo_prom_mes = {m: 0.0 for m in self.meses}
-        d_FE_prom_mes     = {m: 0.0 for m in self.meses}
-        d_total_prom_mes  = {m: 0.0 for m in self.meses}
-
-        # Stocks fin de mes promedio
-        vrfi_fin_prom = {m: 0.0 for m in self.meses}
-        a_fin_prom    = {m: 0.0 for m in self.meses}
-        b_fin_prom    = {m: 0.0 for m in self.meses}
-
-        for mes in self.meses:
-            serv_sum_mes = 0.0
-            dem_sum_mes  = 0.0
-
-            # Demanda BASE (sin FE) — para castigo FE
-            key_civil = self.hidrologico_a_civil[mes]
-            DemA_base_mes = (self.demanda_A_mensual[key_civil] * self.num_acciones_A) / 1_000_000.0
-            DemB_base_mes = (self.demanda_B_mensual[key_civil] * self.num_acciones_B) / 1_000_000.0
-
-            # Demanda efectiva (con FE) — para satisfacción
-            DemA_eff_mes = DemA_base_mes * self.FEA
-            DemB_eff_mes = DemB_base_mes * self.FEB
-
-            # Déficit por FE de este mes (constante por año dentro de la tanda si FE es fijo)
-            d_FE_mes = (1.0 - self.FEA) * DemA_base_mes + (1.0 - self.FEB) * DemB_base_mes
-
-            for ano in anos_intervalo:
-                # Agregados físicos
-                Qturb_total += self.Q_turb[ano, mes].X
-                rebalse_val  = self.REBALSE_TOTAL[ano, mes].X
-                qdis_val     = self.Q_dis[ano, mes].X
-                rebalse_total += rebalse_val
-                qdis_total    += qdis_val
-
-                # Déficit del modelo
-                dA = self.d_A[ano, mes].X
-                dB = self.d_B[ano, mes].X
-                deficit_modelo_total += (dA + dB)
-                d_modelo_prom_mes[mes] += (dA + dB)
-
-                # Déficit por FE (se suma por cada año del intervalo)
-                deficit_por_FE_total += d_FE_mes
-                d_FE_prom_mes[mes] += d_FE_mes
-
-                # Servicio y demanda efectiva (para % satisfacción)
-                ServA = self.Q_A[ano, mes].X + self.Q_A_apoyo[ano, mes].X
-                ServB = self.Q_B[ano, mes].X + self.Q_B_apoyo[ano, mes].X
-                serv_sum_mes += (ServA + ServB)
-                dem_sum_mes  += (DemA_eff_mes + DemB_eff_mes)
-
-                # Promedios mensuales (acumular para luego dividir por N_Y)
-                rebalse_prom_mes[mes] += rebalse_val
-                qdis_prom_mes[mes]    += qdis_val
-                vrfi_fin_prom[mes]    += self.V_VRFI[ano, mes].X
-                a_fin_prom[mes]       += self.V_A[ano, mes].X
-                b_fin_prom[mes]       += self.V_B[ano, mes].X
-
-            # Promedios sobre N_Y años
-            rebalse_prom_mes[mes] /= N_Y
-            qdis_prom_mes[mes]    /= N_Y
-            d_modelo_prom_mes[mes] /= N_Y
-            d_FE_prom_mes[mes]     /= N_Y
-            d_total_prom_mes[mes]   = d_modelo_prom_mes[mes] + d_FE_prom_mes[mes]
-            vrfi_fin_prom[mes]     /= N_Y
-            a_fin_prom[mes]        /= N_Y
-            b_fin_prom[mes]        /= N_Y
-            satisf_por_mes[mes]     = (100.0 * serv_sum_mes / dem_sum_mes) if dem_sum_mes > 0 else 100.0
-
-            serv_total += serv_sum_mes
-            dem_total  += dem_sum_mes
-
-        qdis_prom_mensual_intervalo = qdis_total / TOT_PM
-        satisf_global_intervalo = (100.0 * serv_total / dem_total) if dem_total > 0 else 100.0
+        # Demanda BASE (sin FE) — para castigo FE
+        DemA_base = np.array([self.demanda_A_mensual[self.hidrologico_a_civil[mes]] * self.num_acciones_A
+                              for mes in self.meses]) / 1_000_000.0
+        DemB_base = np.array([self.demanda_B_mensual[self.hidrologico_a_civil[mes]] * self.num_acciones_B
+                              for mes in self.meses]) / 1_000_000.0
+        # Demanda efectiva (con FE) — para satisfacción
+        v = _sin_ruido(self.solucion.valores)
+        agr = self._agregados_reporte(v, DemA_base * self.FEA + DemB_base * self.FEB)
+        # Déficit por FE de cada mes (constante por año dentro de la tanda si FE es fijo)
+        d_FE = np.broadcast_to((1.0 - self.FEA) * DemA_base + (1.0 - self.FEB) * DemB_base, (N_Y, 12))
+
+        Qturb_total = agr['Qturb_total']
+        rebalse_total = agr['rebalse_total']
+        deficit_modelo_total = agr['deficit_modelo_total']  # ∑ d_A + d_B (lo que minimiza la FO)
+        deficit_por_FE_total = _suma_secuencial(d_FE.T)     # ∑ [(1−FEA)*DemA_base + (1−FEB)*DemB_base] por mes y año
+
+        rebalse_prom_mes = agr['rebalse_prom_mes']
+        qdis_prom_mes = agr['qdis_prom_mes']
+        satisf_por_mes = agr['satisf_mes']
+        d_modelo_prom_mes = agr['d_modelo_prom_mes']
+        d_FE_prom_mes = _suma_secuencial(d_FE, axis=0) / N_Y
+        d_total_prom_mes = d_modelo_prom_mes + d_FE_prom_mes
+        vrfi_fin_prom, a_fin_prom, b_fin_prom = agr['vrfi_fin_prom'], agr['a_fin_prom'], agr['b_fin_prom']
+
+        qdis_prom_mensual_intervalo = agr['qdis_total'] / TOT_PM
+        satisf_global_intervalo = agr['satisf_global']
         deficit_total_intervalo = deficit_modelo_total + deficit_por_FE_total
 
         # rango textual del intervalo
@@ -879,12 +1538,12 @@ class EmbalseNuevaPunilla:
         lineas.append("Promedios mensuales sobre el intervalo:")
         lineas.append("Mes  Rebalse prom [Hm³/mes]  Q_dis prom [Hm³/mes]  %Satisfaccion (ponderada)")
         lineas.append("-"*70)
-        for mes in self.meses:
+        for i, mes in enumerate(self.meses):
             lineas.append(
                 f"{mes_tag[mes]:<4} "
-                f"{rebalse_prom_mes[mes]:10.2f} "
-                f"{qdis_prom_mes[mes]:10.2f} "
-                f"{satisf_por_mes[mes]:6.2f}%"
+                f"{rebalse_prom_mes[i]:10.2f} "
+                f"{qdis_prom_mes[i]:10.2f} "
+                f"{satisf_por_mes[i]:6.2f}%"
             )
         lineas.append("")
 
@@ -892,25 +1551,26 @@ class EmbalseNuevaPunilla:
         lineas.append("Promedios mensuales — Déficit (modelo / FE / total) y Volumen almacenado al fin de mes")
         lineas.append("Mes  d_modelo [Hm³/mes]  d_FE [Hm³/mes]  d_total [Hm³/mes]  VRFI fin prom  A fin prom  B fin prom  TOTAL fin prom [Hm³]")
         lineas.append("-"*110)
-        for mes in self.meses:
-            total_fin = vrfi_fin_prom[mes] + a_fin_prom[mes] + b_fin_prom[mes]
+        total_fin_prom = vrfi_fin_prom + a_fin_prom + b_fin_prom
+        for i, mes in enumerate(self.meses):
             lineas.append(
                 f"{mes_tag[mes]:<4} "
-                f"{d_modelo_prom_mes[mes]:9.2f} "
-                f"{d_FE_prom_mes[mes]:9.2f} "
-                f"{d_total_prom_mes[mes]:9.2f} "
-                f"{vrfi_fin_prom[mes]:12.2f} "
-                f"{a_fin_prom[mes]:10.2f} "
-                f"{b_fin_prom[mes]:10.2f} "
-                f"{total_fin:16.2f}"
+                f"{d_modelo_prom_mes[i]:9.2f} "
+                f"{d_FE_prom_mes[i]:9.2f} "
+                f"{d_total_prom_mes[i]:9.2f} "
+                f"{vrfi_fin_prom[i]:12.2f} "
+                f"{a_fin_prom[i]:10.2f} "
+                f"{b_fin_prom[i]:10.2f} "
+                f"{total_fin_prom[i]:16.2f}"
             )
         lineas.append("")
 
         # Agua almacenada al final del último mes del intervalo
         ultimo_ano = anos_intervalo[-1]
-        V_R_fin = self.V_VRFI[ultimo_ano, 12].X
-        V_A_fin = self.V_A[ultimo_ano, 12].X
-        V_B_fin = self.V_B[ultimo_ano, 12].X
+        a = self.anos.index(ultimo_ano)
+        V_R_fin = v['V_VRFI'][a, 11]
+        V_A_fin = v['V_A'][a, 11]
+        V_B_fin = v['V_B'][a, 11]
         total_fin = V_R_fin + V_A_fin + V_B_fin
         lineas.append(f"Agua almacenada al final del intervalo (fin del último periodo):")
         lineas.append(f"  VRFI: {V_R_fin:.1f} Hm³  A: {V_A_fin:.1f} Hm³  B: {V_B_fin:.1f} Hm³  TOTAL: {total_fin:.1f} Hm³")
@@ -919,37 +1579,419 @@ class EmbalseNuevaPunilla:
         return "\n".join(lineas)
 
 
-    def solve(self):
+    def solve(self, engine="gurobi", warm_start=False, outputs=None):
+        """
+        engine="gurobi": construye y optimiza el MIP con self.solver ("gurobi" o "highs").
+        Con warm_start=True la trayectoria de las reglas se carga como MIP start antes de
+        optimizar (cargar_inicio(); HiGHS lo ignora).
+        outputs: artefactos a producir además de status, objetivo, tiempo, nodos y solucion
+        (ver ARTEFACTOS y get_solution); por defecto ninguno, sin escribir archivos.
+        engine="numpy": avanza las reglas de operación directamente (ver model/simulador.py,
+        solve_numpy) y arma la misma solución, con los mismos outputs (por defecto 'detalle':
+        df_detalle/df_resumen en memoria); warm_start no aplica.
+        Con self.cache_resultados (engine="gurobi"), si la caché tiene la solución de este
+        modelo (clave_resultados) se devuelve sin construir ni optimizar; si no, la solución
+        se guarda en la caché al terminar. engine="numpy" no la usa: la recursión cuesta menos
+        que leer la entrada.
+        Con self.telemetria (model/telemetria.py) el registro de la corrida queda en
+        sol['telemetria'] y, si la Telemetria tiene archivo, en su JSON Lines.
+        """
+        if engine not in ("gurobi", "numpy"):
+            raise ValueError(f"engine desconocido: {engine!r} (use 'gurobi' o 'numpy')")
+        if engine == "numpy":
+            if warm_start:
+                raise ValueError("warm_start no aplica con engine='numpy' (no hay MIP que arrancar)")
+            resolver, contexto = self.solve_numpy, dict(engine=engine)
+        else:
+            if self.horizon_mode not in ("monolithic", "chained"):
+                raise ValueError(f"horizon_mode desconocido: {self.horizon_mode!r} (use 'monolithic' o 'chained')")
+            def resolver(outputs):
+                return self._solve_gurobi(warm_start, outputs)
+            contexto = dict(solver=self.solver, builder=self.builder, horizon_mode=self.horizon_mode)
+
+        tel = self.telemetria
+        if tel is None:
+            return resolver(outputs)
+        tel.iniciar(modelo=type(self).__name__, **contexto, anos=len(self.anos), FEA=self.FEA, FEB=self.FEB)
+        try:
+            sol = resolver(outputs)
+        finally:
+            tel.terminar()
+        if sol is not None:
+            sol['telemetria'] = tel.datos
+        return sol
+
+    def _solve_gurobi(self, warm_start=False, outputs=None):
+        cache = self.cache_resultados
+        if cache is not None:
+            with fase(self.telemetria, 'cache'):
+                clave = self.clave_resultados()
+                guardada = cache.get(clave)
+            if guardada is not None:
+                valores, resumen = guardada
+                print(f"Solución desde la caché de resultados ({clave[:12]})")
+                self.solucion = Solution(valores, self.anos, self.meses, **resumen, desde_cache=True)
+                return self.get_solution(outputs, resumen=self.solucion.resumen)
+
+        if self.horizon_mode == "chained":
+            sol = self.solve_encadenado(warm_start=warm_start, outputs=outputs)
+        else:
+            sol = self._solve_monolitico(warm_start=warm_start, outputs=outputs)
+        if cache is not None and sol is not None:
+            cache.put(clave, self.solucion.valores, self.solucion.resumen,
+                      parametros=self.parametros_cache(), version=self.version_formulacion())
+        return sol
+
+    # versión de la formulación del MIP: cambiarla al modificar restricciones, objetivo o el
+    # preprocesamiento de la hidrología, para que la caché de resultados no devuelva soluciones viejas
+    # (la clave lleva además la huella de los fuentes, ver version_formulacion)
+    VERSION_FORMULACION = "modelito2-1"
+
+    # atributos que determinan la solución (además de la hidrología de self.anos)
+    PARAMETROS_CACHE = ('num_acciones_A', 'num_acciones_B', 'demanda_A_mensual', 'demanda_B_mensual',
+                        'hidrologico_a_civil', 'segundos_por_mes', 'builder', 'horizon_mode')
+
+    def parametros_cache(self):
+        params = {attr: getattr(self, attr) for attr in self.PARAMETROS + self.PARAMETROS_CACHE}
+        params['MIPGap'] = self.model.Params.MIPGap
+        if self.solver != "gurobi":
+            params['solver'] = self.solver
+            return params
+        # otros parámetros pueden cambiar cuál de varios óptimos se devuelve
+        _, perfil_solver = perfil('modelito2', 1 if self.horizon_mode == "chained" else len(self.anos),
+                                  self.perfil_solver)
+        if perfil_solver:
+            params['perfil_solver'] = perfil_solver
+        return params
+
+    def version_formulacion(self):
+        """VERSION_FORMULACION + huella de los fuentes que arman el MIP (modelo, backend, hidrología)."""
+        return f"{self.VERSION_FORMULACION}+{huella_fuentes(type(self), nuevo_modelo, HydrologyDataset)}"
+
+    def clave_resultados(self):
+        """Clave de CacheResultados: version_formulacion(), parametros_cache() y caudales de self.anos."""
+        h = self.cargar_data("data/caudales.xlsx")
+        f = h.filas(self.anos)
+        return CacheResultados.clave(self.version_formulacion(), self.parametros_cache(),
+                                     (h.Q_nuble[f], h.Q_hoya1[f], h.Q_hoya2[f], h.Q_hoya3[f]))
+
+    def _solve_monolitico(self, warm_start=False, outputs=None):
+        outputs = normalizar_salidas(outputs, self.ARTEFACTOS, self.RUTAS_SALIDA)
         try:
             print("Iniciando optimización del Embalse Nueva Punilla...")
             data_file = "data/caudales.xlsx"
-            self.caudal_afluente, self.Q_nuble, self.Q_hoya1, self.Q_hoya2, self.Q_hoya3 = self.cargar_data(data_file)
-            self.variables()
-            self.restricciones()
-            self.funcion_objetivo()
-            self.model.optimize()
+            with fase(self.telemetria, 'carga'):
+                self.cargar_data(data_file)
+            if self._construido_con is None:
+                self.construir()
+                print(f"Modelo construido ({self.builder}) en {self.tiempo_construccion:.2f} s")
+            else:
+                print(f"Re-optimizando el modelo ya construido ({self._construido_con})")
+            if warm_start:
+                t0 = time.perf_counter()
+                with fase(self.telemetria, 'warm_start'):
+                    n_start = self.cargar_inicio()
+                print(f"MIP start desde reglas: {n_start} variables en {time.perf_counter() - t0:.2f} s")
+            optimizar(self.telemetria, self.model)
+            print(f"Resuelto en {self.model.Runtime:.2f} s, {self.model.NodeCount:.0f} nodos")
             if self.model.status == GRB.INFEASIBLE:
-                self.model.computeIIS()
-                self.model.write("modelo.ilp")
+                if self.solver == "gurobi":
+                    self.model.computeIIS()
+                    self.model.write("modelo.ilp")
                 return None
 
             if self.model.status in (GRB.OPTIMAL, GRB.SUBOPTIMAL):
-                return self.get_solution()
+                return self.get_solution(outputs)
             print(f"Modelo no resuelto optimalmente. Status: {self.model.status}")
             return None
         except Exception as e:
             print(f"Error al resolver el modelo: {e}")
             return None
 
-    def get_solution(self):
-        sol = {'status': self.model.status, 'obj_val': self.model.objVal}
-        df_det, df_res = self.exportar_a_excel()
-        sol['df_detalle'] = df_det
-        sol['df_resumen'] = df_res
-        txt_file = self.exportar_a_txt()
-        sol['txt_file'] = txt_file
+    # parámetros que fijan la estructura del MIP anual de solve_encadenado (si cambian, se reconstruye)
+    PARAMETROS_ANUAL = ('builder', 'C_VRFI', 'C_TIPO_A', 'C_TIPO_B', 'V_C_H', 'acumular_ssr', 'RESERVA_MIN_VRFI')
+
+    def _modelo_anual(self):
+        """MIP de 12 meses de solve_encadenado; se construye la primera vez y al cambiar PARAMETROS_ANUAL."""
+        firma = tuple(getattr(self, attr) for attr in self.PARAMETROS_ANUAL)
+        if self._anual is None or self._anual[0] != firma:
+            anual = EmbalseNuevaPunilla(hidrologia=self.hidrologia.subconjunto(self.anos[:1]), env=self._env,
+                                        solver=self.solver)
+            for attr in self.PARAMETROS:
+                setattr(anual, attr, getattr(self, attr))
+            anual.anos = self.anos[:1]
+            anual.builder = self.builder
+            anual.model.Params.OutputFlag = self.model.Params.OutputFlag
+            anual.perfil_solver = self.perfil_solver
+            anual.telemetria = self.telemetria
+            anual.construir()
+            print(f"Modelo anual construido ({self.builder}) en {anual.tiempo_construccion:.2f} s")
+            self._anual = (firma, anual)
+        self._anual[1].telemetria = self.telemetria
+        return self._anual[1]
+
+    def solve_encadenado(self, warm_start=False, outputs=None):
+        """
+        horizon_mode="chained": los años sólo se conectan por los stocks de fin de abril y el
+        arrastre SSR, y las reglas son miopes, así que el horizonte se resuelve como una cadena
+        de MIP de 12 meses. El modelo anual se construye una vez y cada año se re-parametriza
+        (set_hidrologia + set_parameters con el estado final del año anterior).
+        Con self.cache_transiciones (model/transiciones.py) cada año se busca primero en la
+        caché y el modelo anual sólo se construye/resuelve en los fallos.
+        Las familias de resultado quedan en self.solucion (Solution), igual que tras un
+        solve monolítico, así que exportar_*, _texto_resumen_intervalo y los KPIs del barrido
+        funcionan igual.
+        Un año que termina SUBOPTIMAL o en un límite (tiempo, nodos, ...) con solución sigue la
+        cadena; el status de la solución es el peor de los años (OPTIMAL < SUBOPTIMAL < límite)
+        y esos años no se guardan en la caché de transiciones.
+        """
+        outputs = normalizar_salidas(outputs, self.ARTEFACTOS, self.RUTAS_SALIDA)
+        tel = self.telemetria
+        with fase(tel, 'carga'):
+            h = self.cargar_data("data/caudales.xlsx")
+        cache = self.cache_transiciones
+        firma = tuple(getattr(self, attr) for attr in self.PARAMETROS_ANUAL[1:])
+
+        estado = (self.VRFI_init, self.VA_init, self.VB_init, self.SSR_init)
+        valores = {fam: np.empty((len(self.anos), 12)) for fam in self.FAMILIAS_RESULTADO}
+        runtime, nodos = 0.0, 0.0
+        status = GRB.OPTIMAL
+        for a, ano in enumerate(self.anos):
+            clave = cache.clave(firma, ano, *estado, self.FEA, self.FEB) if cache is not None else None
+            anio = cache.get(clave) if cache is not None else None
+            if anio is None:
+                anual = self._modelo_anual()
+                with fase(tel, 'reparametrizacion'):
+                    anual.set_hidrologia(h.subconjunto([ano], etiquetas=anual.anos))
+                    params = dict(zip(('VRFI_init', 'VA_init', 'VB_init', 'SSR_init'), estado))
+                    if (anual.FEA, anual.FEB) != (self.FEA, self.FEB):
+                        params.update(FEA=self.FEA, FEB=self.FEB)
+                    anual.set_parameters(**params)
+                if warm_start:
+                    with fase(tel, 'warm_start'):
+                        anual.cargar_inicio()
+                optimizar(tel, anual.model)
+                status_ano = anual.model.status
+                if status_ano not in (GRB.OPTIMAL, GRB.SUBOPTIMAL) and not (
+                        status_ano in self.LIMITES_CON_SOLUCION and anual.model.SolCount > 0):
+                    print(f"Año {ano} no resuelto optimalmente. Status: {status_ano}")
+                    return None
+                if status_ano != GRB.OPTIMAL:
+                    print(f"Año {ano} con status {status_ano}: la cadena queda con la mejor solución encontrada")
+                    if status in (GRB.OPTIMAL, GRB.SUBOPTIMAL):
+                        status = status_ano
+                runtime += anual.model.Runtime
+                nodos += anual.model.NodeCount
+                with fase(tel, 'extraccion'):
+                    anio = {fam: arr[0] for fam, arr in anual.extraer_solucion().valores.items()}
+                if cache is not None and status_ano == GRB.OPTIMAL:
+                    cache.put(clave, anio)
+            for fam in valores:
+                valores[fam][a] = anio[fam]
+            estado = (anio['V_VRFI'][11], anio['V_A'][11], anio['V_B'][11],
+                      anio['SSR_ACUMULADO'][11] if self.acumular_ssr else 0.0)
+        print(f"Horizonte encadenado: {len(self.anos)} años resueltos en {runtime:.2f} s, {nodos:.0f} nodos"
+              + (f" ({cache})" if cache is not None else ""))
+
+        self.solucion = Solution(valores, self.anos, self.meses, status=status,
+                                 obj_val=float(valores['d_A'].sum() + valores['d_B'].sum()),
+                                 tiempo_resolucion=runtime, nodos=nodos, horizon_mode='chained')
+        return self.get_solution(outputs, resumen=self.solucion.resumen)
+
+    # status con los que un año de la cadena puede seguir si el MIP tiene una solución
+    LIMITES_CON_SOLUCION = (GRB.TIME_LIMIT, GRB.NODE_LIMIT, GRB.ITERATION_LIMIT, GRB.INTERRUPTED)
+
+    # artefactos de solve(outputs=...) y rutas por defecto de los que escriben archivo
+    ARTEFACTOS = ('kpis', 'detalle', 'tablas', 'txt')
+    RUTAS_SALIDA = {'tablas': "resultados_embalse.xlsx", 'txt': "reporte_embalse.txt"}
+
+    def get_solution(self, outputs=None, resumen=None):
+        """
+        outputs (ver model/salidas.py, normalizar_salidas):
+          kpis    -> sol['kpis'] (dict de kpis(), sin archivos)
+          detalle -> sol['df_detalle'], sol['df_resumen'] (en memoria)
+          tablas  -> además las escribe en la ruta dada según self.output_format
+          txt     -> reporte de texto en la ruta dada (sol['txt_file'])
+        Con rutas distintas por corrida, varias corridas en paralelo no pisan los mismos archivos.
+        Con self.escritor, tablas y txt se encolan sobre una copia del estado de esta corrida
+        y get_solution vuelve sin esperarlos (sol['df_detalle'] sólo si se pidió 'detalle').
+        """
+        outputs = normalizar_salidas(outputs, self.ARTEFACTOS, self.RUTAS_SALIDA)
+        tel = self.telemetria
+        if resumen is None:
+            resumen = {'status': self.model.status, 'obj_val': self.model.objVal,
+                       'tiempo_resolucion': self.model.Runtime, 'nodos': self.model.NodeCount}
+            with fase(tel, 'extraccion'):
+                self.solucion = self.extraer_solucion(**resumen)
+        sol = dict(resumen)
+        sol['solucion'] = self.solucion
+        if 'kpis' in outputs:
+            with fase(tel, 'kpis'):
+                sol['kpis'] = self.kpis()
+        if self.escritor is not None and ('tablas' in outputs or 'txt' in outputs):
+            # la próxima corrida reasigna solucion, anos, FE, ...: la copia conserva los de ésta
+            foto = copy.copy(self)
+            with fase(tel, 'encolar_exportacion'):
+                if 'tablas' in outputs:
+                    self.escritor.enviar(foto.exportar_resultados, outputs['tablas'])
+                if 'txt' in outputs:
+                    self.escritor.enviar(foto.exportar_a_txt, outputs['txt'])
+                    sol['txt_file'] = outputs['txt']
+            if 'detalle' in outputs:
+                with fase(tel, 'tablas'):
+                    sol['df_detalle'], sol['df_resumen'] = self.tablas_resultados(self.solucion.valores)
+            return sol
+        if 'tablas' in outputs:
+            with fase(tel, 'export_tablas'):
+                sol['df_detalle'], sol['df_resumen'] = self.exportar_resultados(outputs['tablas'])
+        elif 'detalle' in outputs:
+            with fase(tel, 'tablas'):
+                sol['df_detalle'], sol['df_resumen'] = self.tablas_resultados(self.solucion.valores)
+        if 'txt' in outputs:
+            with fase(tel, 'export_txt'):
+                sol['txt_file'] = self.exportar_a_txt(outputs['txt'])
         return sol
 
+    def solve_numpy(self, outputs=None):
+        """
+        Solución de la recursión de reglas (sin MIP) por el mismo get_solution que el MIP:
+        outputs como en solve(), None = 'detalle' ("none": nada); sol['engine'] = 'numpy'.
+        """
+        if outputs is None:
+            outputs = ("detalle",)
+        tel = self.telemetria
+        data_file = "data/caudales.xlsx"
+        with fase(tel, 'carga'):
+            self.cargar_data(data_file)
+        t0 = time.perf_counter()
+        with fase(tel, 'simulacion'):
+            self.valores_sim = self.simular_reglas()
+        # La trayectoria de reglas es la única factible del MIP, por eso se reporta como OPTIMAL
+        resumen = {'status': GRB.OPTIMAL, 'engine': 'numpy',
+                   'obj_val': float(self.valores_sim['d_A'].sum() + self.valores_sim['d_B'].sum()),
+                   'tiempo_resolucion': time.perf_counter() - t0, 'nodos': 0}
+        self.solucion = Solution(self.valores_sim, self.anos, self.meses, **resumen)
+        return self.get_solution(outputs, resumen=resumen)
+
+    def verificar_motor_numpy(self, tol=1e-4):
+        """
+        Resuelve el MIP y la recursión NumPy sobre self.anos (por defecto los 30 años
+        históricos) y compara sus trayectorias familia por familia.
+        Devuelve un DataFrame con la máxima diferencia absoluta y dónde ocurre.
+        """
+        data_file = "data/caudales.xlsx"
+        self.cargar_data(data_file)
+        sim = self.simular_reglas()
+
+        if self._construido_con is None:
+            self.construir()
+        self.model.optimize()
+        if self.model.status not in (GRB.OPTIMAL, GRB.SUBOPTIMAL):
+            raise RuntimeError(f"El MIP no se resolvió (status {self.model.status})")
+        mip = self._valores_gurobi()
+
+        filas = []
+        for fam in self.FAMILIAS_RESULTADO:
+            if fam == 'REBALSE_ON':
+                continue  # libre en el MIP cuando el rebalse es 0
+            dif = np.abs(sim[fam] - mip[fam])
+            a, i = np.unravel_index(np.argmax(dif), dif.shape)
+            filas.append({'Familia': fam, 'Max_Dif_Abs': dif[a, i],
+                          'Ano': self.anos[a], 'Mes': self.meses[i], 'OK': dif[a, i] <= tol})
+        obj_sim = sim['d_A'].sum() + sim['d_B'].sum()
+        filas.append({'Familia': 'OBJETIVO', 'Max_Dif_Abs': abs(obj_sim - self.model.objVal),
+                      'Ano': None, 'Mes': None, 'OK': abs(obj_sim - self.model.objVal) <= tol})
+        df = pd.DataFrame(filas)
+
+        # El uso de la reserva mínima puede repartirse entre meses sin cambiar el déficit total:
+        # si el objetivo coincide, una trayectoria distinta es un óptimo alternativo del MIP.
+        obj_ok = bool(df['OK'].iloc[-1])
+        n_mal = int((~df['OK']).sum())
+        if n_mal == 0:
+            estado = "trayectoria idéntica"
+        elif obj_ok:
+            estado = f"óptimo alternativo ({n_mal} familias difieren, mismo objetivo)"
+        else:
+            estado = "DISCREPANCIA en el objetivo"
+        print(f"Verificación NumPy vs MIP ({len(self.anos)} años): {estado} "
+              f"(máx. dif. {df['Max_Dif_Abs'].max():.2e} Hm³)")
+        return df
+
+
+    # atributos de escenario que definen el MIP (para reconstruirlo en otra instancia)
+    PARAMETROS = ('anos', 'C_VRFI', 'C_TIPO_A', 'C_TIPO_B', 'FEA', 'FEB', 'V_C_H', 'acumular_ssr',
+                  'RESERVA_MIN_VRFI', 'VRFI_init', 'VA_init', 'VB_init', 'SSR_init')
+
+    def comparar_constructores(self, builders=("escalar", "matriz"), tol=1e-6):
+        """
+        Construye y resuelve el mismo escenario con cada constructor en instancias nuevas.
+        Imprime los tiempos lado a lado y devuelve (df_tiempos, df_familias), donde
+        df_familias tiene la máxima diferencia absoluta de cada familia contra el primero.
+        """
+        self.cargar_data("data/caudales.xlsx")
+        tiempos, valores = [], {}
+        for builder in builders:
+            emb = EmbalseNuevaPunilla(hidrologia=self.hidrologia, solver=self.solver)
+            for attr in self.PARAMETROS:
+                setattr(emb, attr, getattr(self, attr))
+            emb.model.Params.OutputFlag = self.model.Params.OutputFlag
+            t_build = emb.construir(builder)
+            emb.model.optimize()
+            if emb.model.status not in (GRB.OPTIMAL, GRB.SUBOPTIMAL):
+                raise RuntimeError(f"El MIP ({builder}) no se resolvió (status {emb.model.status})")
+            tiempos.append({'Constructor': builder, 'Construccion_s': t_build,
+                            'Resolucion_s': emb.model.Runtime, 'Variables': emb.model.NumVars,
+                            'Restricciones': emb.model.NumConstrs, 'Generales': emb.model.NumGenConstrs,
+                            'Objetivo': emb.model.objVal})
+            valores[builder] = emb._valores_gurobi()
+
+        ref = valores[builders[0]]
+        filas = []
+        for builder in builders[1:]:
+            for fam in self.FAMILIAS_RESULTADO:
+                if fam == 'REBALSE_ON':
+                    continue  # libre en el MIP cuando el rebalse es 0
+                dif = np.abs(valores[builder][fam] - ref[fam])
+                filas.append({'Constructor': builder, 'Familia': fam,
+                              'Max_Dif_Abs': dif.max(), 'OK': dif.max() <= tol})
+        df_t = pd.DataFrame(tiempos)
+        df_f = pd.DataFrame(filas)
+
+        print(f"Constructores del MIP ({len(self.anos)} años):")
+        print(df_t.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+        obj_ok = (df_t['Objetivo'] - df_t['Objetivo'].iloc[0]).abs().max() <= tol
+        if df_f['OK'].all():
+            print("Soluciones idénticas")
+        elif obj_ok:
+            print(f"Óptimo alternativo ({int((~df_f['OK']).sum())} familias difieren, mismo objetivo)")
+        else:
+            print("DISCREPANCIA en el objetivo")
+        return df_t, df_f
+
+    def comparar_inicio(self, builder=None):
+        """
+        Resuelve el mismo escenario en frío y con el MIP start de las reglas (instancias
+        nuevas, mismo constructor). Imprime y devuelve un DataFrame con tiempo, nodos y objetivo.
+        """
+        self.cargar_data("data/caudales.xlsx")
+        filas = []
+        for warm_start in (False, True):
+            emb = EmbalseNuevaPunilla(hidrologia=self.hidrologia, solver=self.solver)
+            for attr in self.PARAMETROS:
+                setattr(emb, attr, getattr(self, attr))
+            emb.model.Params.OutputFlag = self.model.Params.OutputFlag
+            emb.construir(builder or self.builder)
+            if warm_start:
+                emb.cargar_inicio()
+            emb.model.optimize()
+            if emb.model.status not in (GRB.OPTIMAL, GRB.SUBOPTIMAL):
+                raise RuntimeError(f"El MIP no se resolvió (status {emb.model.status})")
+            filas.append({'Warm_start': warm_start, 'Resolucion_s': emb.model.Runtime,
+                          'Nodos': emb.model.NodeCount, 'Objetivo': emb.model.objVal})
+        df = pd.DataFrame(filas)
+        print(f"MIP start desde reglas ({len(self.anos)} años, {builder or self.builder}):")
+        print(df.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+        return df
 
 if __name__ == "__main__":
     # Definir los 30 años completos
@@ -970,7 +2012,7 @@ if __name__ == "__main__":
     emb.VA_init = 0.0
     emb.VB_init = 0.0
 
-    sol = emb.solve()
+    sol = emb.solve(outputs=('tablas', 'txt'))
     if sol is None:
         print("[ERROR] El modelo no se resolvió correctamente.")
     else:
@@ -0,0 +1,110 @@
+# model/perfiles.py
+# Perfiles de parámetros de Gurobi por tipo de modelo y horizonte.
+#
+# EmbalseNuevaPunilla, EmbalseCasoBase y el MIP de Monte Carlo corrían con los parámetros por
+# defecto, que no son los mejores para un modelo lleno de addGenConstrMin/Max e indicadores.
+# afinar_solver.py corre el tuner de Gurobi (o una grilla) sobre instancias representativas y
+# guarda el mejor conjunto en config/<tipo>_<N>y.prm. Al construir, cada modelo carga el perfil
+# de su tipo con el horizonte afinado más cercano: el menor N >= años del modelo, o el mayor N.
+# Un parámetro que ya no está en su valor por defecto (fijado en el modelo o heredado del gp.Env,
+# p. ej. Threads=1 del pool, TimeLimit o MIPGap) no se pisa.
+import os
+import re
+
+try:
+    from model.milp import ModeloHiGHS
+except ImportError:  # ejecutado desde model/
+    from milp import ModeloHiGHS
+
+DIRECTORIO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config")
+TIPOS = ('modelito2', 'caso_base', 'monte_carlo')
+_ARCHIVO = re.compile(r"^(?P<tipo>\w+?)_(?P<anos>\d+)y\.prm$")
+
+# parámetros que un perfil nunca fija: salida, límites y recursos de la corrida, no del modelo
+EXCLUIDOS = {'OutputFlag', 'LogToConsole', 'LogFile', 'DisplayInterval', 'Threads', 'TimeLimit',
+             'WorkLimit', 'NodeLimit', 'SolutionLimit', 'MemLimit', 'SoftMemLimit', 'Seed', 'MIPGap'}
+
+
+def perfiles_disponibles(tipo, directorio=DIRECTORIO):
+    """{N: ruta} de los config/<tipo>_<N>y.prm existentes."""
+    if not os.path.isdir(directorio):
+        return {}
+    encontrados = {}
+    for nombre in os.listdir(directorio):
+        m = _ARCHIVO.match(nombre)
+        if m and m.group('tipo') == tipo:
+            encontrados[int(m.group('anos'))] = os.path.join(directorio, nombre)
+    return encontrados
+
+
+def ruta_perfil(tipo, anos, directorio=DIRECTORIO):
+    """Perfil de `tipo` para un horizonte de `anos` años (ver cabecera), o None si no hay ninguno."""
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo de modelo desconocido: {tipo!r} (use {', '.join(map(repr, TIPOS))})")
+    disponibles = perfiles_disponibles(tipo, directorio)
+    if not disponibles:
+        return None
+    mayores = [n for n in disponibles if n >= anos]
+    return disponibles[min(mayores) if mayores else max(disponibles)]
+
+
+def leer_prm(archivo):
+    """{parámetro: valor (texto)} de un .prm de Gurobi (una línea 'Nombre valor'; '#' comenta)."""
+    params = {}
+    with open(archivo, encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.split('#', 1)[0].strip()
+            if linea:
+                nombre, valor = linea.split(None, 1)
+                params[nombre] = valor.strip()
+    return params
+
+
+def escribir_prm(archivo, params, comentarios=()):
+    """Escribe un .prm (legible por gp.Model.read y grbtune) sin los parámetros EXCLUIDOS."""
+    if os.path.dirname(archivo):
+        os.makedirs(os.path.dirname(archivo), exist_ok=True)
+    with open(archivo, "w", encoding="utf-8") as f:
+        for c in comentarios:
+            f.write(f"# {c}\n")
+        for nombre, valor in params.items():
+            if nombre not in EXCLUIDOS:
+                f.write(f"{nombre}  {valor}\n")
+    return archivo
+
+
+def perfil(tipo, anos, perfil_solver="auto"):
+    """
+    (ruta, {parámetro: valor}) del perfil a usar. perfil_solver: "auto" (por tipo y horizonte),
+    la ruta de un .prm, o None (ningún perfil: (None, {})).
+    """
+    if perfil_solver is None:
+        return None, {}
+    ruta = ruta_perfil(tipo, anos) if perfil_solver == "auto" else perfil_solver
+    if ruta is None:
+        return None, {}
+    return ruta, {n: v for n, v in leer_prm(ruta).items() if n not in EXCLUIDOS}
+
+
+def aplicar_perfil(model, tipo, anos, perfil_solver="auto"):
+    """
+    Fija en model los parámetros del perfil que siguen en su valor por defecto.
+    Devuelve {parámetro: valor} de los que se aplicaron ({} si no hay perfil o si model
+    es un ModeloHiGHS: los perfiles son parámetros de Gurobi).
+    """
+    if isinstance(model, ModeloHiGHS):
+        return {}
+    ruta, params = perfil(tipo, anos, perfil_solver)
+    aplicados = {}
+    for nombre, valor in params.items():
+        info = model.getParamInfo(nombre)  # None (y un aviso de Gurobi) si no existe en esta versión
+        if info is None:
+            print(f"[AVISO] {ruta}: parámetro desconocido {nombre!r}, se ignora")
+            continue
+        _, tipo_param, actual, _, _, defecto = info
+        if actual != defecto:
+            continue
+        valor = tipo_param(float(valor)) if tipo_param is int else tipo_param(valor)
+        model.setParam(nombre, valor)
+        aplicados[nombre] = valor
+    return aplicados
@@ -1,9 +1,21 @@
 # run_sensibilidad_csv.py
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 
 # === Usa tu clase ya definida ===
 # from tu_modulo import EmbalseNuevaPunilla
 from modelito2 import EmbalseNuevaPunilla  # ajusta el import a tu estructura
+from cache_resultados import CacheResultados
+from checkpoint import Checkpoint
+from hidrologia import HydrologyDataset
+from milp import GRB, SOLVERS, nuevo_entorno
+from salidas import EscritorAsincrono
+from transiciones import CacheTransiciones
 
 FULL_ANOS_30 = [
     '1989/1990','1990/1991','1991/1992','1992/1993','1993/1994',
@@ -33,7 +45,7 @@ FE_GRID = [0.50, 0.60, 0.70, 0.80, 0.90, 1.00]
 
 def compute_interval_kpis(emb, anos_intervalo):
     """
-    Calcula los KPIs por intervalo:
+    Calcula los KPIs por intervalo (ver EmbalseNuevaPunilla.kpis):
     - Qturb_total, Rebalse_total, Qdis_prom, Satisf_prom
     - Déficit del MODELO (sum d_A + d_B)
     - Déficit por FE adicional
@@ -41,139 +53,240 @@ def compute_interval_kpis(emb, anos_intervalo):
     - Stocks al fin del intervalo (VRFI, A, B, TOTAL)
     """
     assert set(anos_intervalo) == set(emb.anos), "El Embalse debe estar resuelto con este sub-rango."
+    return emb.kpis()
+
+def _fila_intervalo(emb, period_years, k, anos_k, FEA, FEB, v0, a0, b0, reportes=None):
+    """
+    Re-parametriza el modelo del bloque, lo resuelve y devuelve la fila del CSV.
+    reportes: directorio para el Excel/txt de la corrida (por defecto sólo KPIs; la salida
+    del barrido es el CSV). Con emb.escritor se escriben en segundo plano.
+    """
+    emb.set_parameters(FEA=FEA, FEB=FEB, VRFI_init=v0, VA_init=a0, VB_init=b0)
+
+    outputs = {'kpis': None}
+    if reportes is not None:
+        base = os.path.join(reportes, f"{period_years}y_iter{k}_FE{FEA:.2f}_init{v0}-{a0}-{b0}")
+        outputs.update(tablas=base + ".xlsx", txt=base + ".txt")
+    sol = emb.solve(outputs=outputs)
+
+    status_ok = sol is not None and sol.get('status') in (GRB.OPTIMAL, GRB.SUBOPTIMAL)  # 2, 9
 
-    N_Y = len(anos_intervalo)
-    TOT_PM = N_Y * 12
-
-    Qturb_total = 0.0
-    Rebalse_total = 0.0
-    Qdis_total = 0.0
-
-    Serv_total = 0.0
-    Dem_eff_total = 0.0
-
-    Def_modelo_total = 0.0
-    Def_FE_total = 0.0
-
-    for mes in emb.meses:
-        key_civil = emb.hidrologico_a_civil[mes]
-        # Demanda BASE (sin FE) — en Hm3/mes
-        DemA_base = (emb.demanda_A_mensual[key_civil] * emb.num_acciones_A) / 1_000_000.0
-        DemB_base = (emb.demanda_B_mensual[key_civil] * emb.num_acciones_B) / 1_000_000.0
-        # Demanda efectiva para % satisfacción
-        DemA_eff = DemA_base * emb.FEA
-        DemB_eff = DemB_base * emb.FEB
-
-        for ano in anos_intervalo:
-            Qturb_total += emb.Q_turb[ano, mes].X
-            Rebalse_total += emb.REBALSE_TOTAL[ano, mes].X
-            Qdis_total += emb.Q_dis[ano, mes].X
-
-            # Servicio entregado (propio + apoyo)
-            ServA = emb.Q_A[ano, mes].X + emb.Q_A_apoyo[ano, mes].X
-            ServB = emb.Q_B[ano, mes].X + emb.Q_B_apoyo[ano, mes].X
-            Serv_total += (ServA + ServB)
-            Dem_eff_total += (DemA_eff + DemB_eff)
-
-            # Déficit del modelo
-            dA = emb.d_A[ano, mes].X
-            dB = emb.d_B[ano, mes].X
-            Def_modelo_total += (dA + dB)
-
-            # Déficit adicional por FE
-            dA_FE = (1.0 - emb.FEA) * DemA_base
-            dB_FE = (1.0 - emb.FEB) * DemB_base
-            Def_FE_total += (dA_FE + dB_FE)
-
-    Qdis_prom_mensual = Qdis_total / TOT_PM
-    Satisf_prom = (100.0 * Serv_total / Dem_eff_total) if Dem_eff_total > 0 else 100.0
-
-    # Stocks al fin del intervalo (fin del último mes = abr = 12)
-    ultimo_ano = anos_intervalo[-1]
-    VRFI_fin = emb.V_VRFI[ultimo_ano, 12].X
-    A_fin    = emb.V_A[ultimo_ano, 12].X
-    B_fin    = emb.V_B[ultimo_ano, 12].X
-    TOTAL_fin = VRFI_fin + A_fin + B_fin
+    if not status_ok:
+        return dict(
+            period_years=period_years, iter=k,
+            interval_start=anos_k[0], interval_end=anos_k[-1],
+            FEA=FEA, FEB=FEB, VRFI0=v0, A0=a0, B0=b0,
+            Qturb_total_Hm3=None, Rebalse_total_Hm3=None, Qdis_prom_Hm3_mes=None,
+            Satisf_prom_pct=None, Def_modelo_Hm3=None, Def_FE_Hm3=None, Def_total_Hm3=None,
+            VRFI_fin_Hm3=None, A_fin_Hm3=None, B_fin_Hm3=None, TOTAL_fin_Hm3=None
+        )
 
+    kpis = sol['kpis']
     return dict(
-        Qturb_total_Hm3=Qturb_total,
-        Rebalse_total_Hm3=Rebalse_total,
-        Qdis_prom_Hm3_mes=Qdis_prom_mensual,
-        Satisf_prom_pct=Satisf_prom,
-        Def_modelo_Hm3=Def_modelo_total,
-        Def_FE_Hm3=Def_FE_total,
-        Def_total_Hm3=Def_modelo_total + Def_FE_total,
-        VRFI_fin_Hm3=VRFI_fin,
-        A_fin_Hm3=A_fin,
-        B_fin_Hm3=B_fin,
-        TOTAL_fin_Hm3=TOTAL_fin
+        period_years=period_years, iter=k,
+        interval_start=anos_k[0], interval_end=anos_k[-1],
+        FEA=FEA, FEB=FEB, VRFI0=v0, A0=a0, B0=b0,
+        **kpis
     )
 
-def run_suite_to_csv(period_years, fe_values, escenarios_vol, out_csv):
+
+def _embalse_bloque(hidrologia, anos_k, cache=None, env=None, escritor=None, cache_resultados=None,
+                    solver="gurobi"):
+    emb = EmbalseNuevaPunilla(hidrologia=hidrologia, env=env, solver=solver)
+    emb.anos = list(anos_k)     # IMPORTANT: limitar el modelo al bloque
+    emb.escritor = escritor
+    emb.cache_resultados = cache_resultados
+    if cache is not None:
+        # con caché de transiciones el bloque se resuelve año a año (horizon_mode="chained")
+        emb.horizon_mode = "chained"
+        emb.cache_transiciones = cache
+    return emb
+
+
+# Estado de cada proceso del pool: un entorno del solver (Threads=1), la hidrología, las cachés,
+# el escritor de reportes y el modelo del bloque en curso
+_WORKER = {}
+
+def _iniciar_worker(hidrologia, cache=None, reportes=None, cache_resultados=None, solver="gurobi"):
+    env = nuevo_entorno(solver)
+    env.setParam('OutputFlag', 0)
+    env.setParam('Threads', 1)
+    env.start()
+    _WORKER['env'] = env
+    _WORKER['solver'] = solver
+    _WORKER['hidrologia'] = hidrologia
+    _WORKER['cache'] = cache
+    _WORKER['reportes'] = reportes
+    _WORKER['cache_resultados'] = cache_resultados
+    # los hilos del escritor no son daemon: el proceso termina de escribir antes de salir
+    _WORKER['escritor'] = EscritorAsincrono() if reportes is not None else None
+    _WORKER['bloque'] = None
+
+def _trabajo(job):
+    """
+    Un trabajo (periodo, bloque, FE, inits) dentro de un proceso del pool: devuelve la fila y
+    las transiciones que agregó a la caché del proceso (para fusionarlas en la principal).
+    """
+    period_years, k, anos_k = job[:3]
+    if _WORKER['bloque'] != (period_years, k):
+        # los trabajos llegan en trozos de un bloque completo: un modelo por bloque y proceso
+        _WORKER['bloque'] = (period_years, k)
+        _WORKER['emb'] = _embalse_bloque(_WORKER['hidrologia'], anos_k, _WORKER['cache'], _WORKER['env'],
+                                         _WORKER['escritor'], _WORKER['cache_resultados'], _WORKER['solver'])
+    fila = _fila_intervalo(_WORKER['emb'], *job, reportes=_WORKER['reportes'])
+    cache = _WORKER['cache']
+    return fila, (cache.extraer_nuevas() if cache is not None else None)
+
+def _clave_trabajo(job):
+    period_years, k, _, FEA, FEB, v0, a0, b0 = job
+    return dict(period_years=period_years, iter=k, FEA=FEA, FEB=FEB, VRFI0=v0, A0=a0, B0=b0)
+
+def run_suite_to_csv(period_years, fe_values, escenarios_vol, out_csv, workers=1, cache=None, reportes=None,
+                     checkpoint=None, resume=False, cache_resultados=None, solver="gurobi"):
     """
     Corre toda la malla de sensibilidad para un tamaño de intervalo (5/10/15)
     y guarda un CSV con una fila por intervalo.
+    Cada fila se escribe en el CSV apenas se resuelve, en el orden de los trabajos (bloque,
+    FE, inits); el DataFrame devuelto se lee del CSV al terminar.
+    workers > 1 reparte los trabajos (periodo, bloque, FE, inits) en un ProcessPoolExecutor
+    con un entorno de Threads=1 por proceso; el CSV sale en el mismo orden que en serie.
+    solver: "gurobi" o "highs" (scipy.optimize.milp, ver model/milp.py); HiGHS no usa
+    licencia, así que workers puede llegar a os.cpu_count().
+    cache: CacheTransiciones (model/transiciones.py); cada bloque se resuelve encadenado y
+    cada año se busca en la caché antes de construir/resolver el MIP anual. Con workers > 1
+    cada proceso trabaja sobre su propia copia y devuelve sus transiciones nuevas con cada
+    fila; se fusionan en `cache`, así que cache.guardar() las incluye.
+    reportes: directorio donde escribir además el Excel/txt de cada corrida. Se escriben con
+    un EscritorAsincrono (uno por proceso) mientras se resuelve la corrida siguiente.
+    checkpoint: archivo JSON Lines (model/checkpoint.py) donde se agrega cada fila terminada,
+    con clave (periodo, bloque, FE, inits). Con resume=True los trabajos ya presentes se toman
+    del archivo y sólo se resuelven los que faltan; el CSV es el de la malla completa.
+    cache_resultados: CacheResultados (model/cache_resultados.py) compartida en disco por
+    todas las corridas y procesos; cada trabajo ya resuelto antes se toma de ahí sin optimizar.
     """
     blocks = split_blocks(FULL_ANOS_30, period_years)
-    rows = []
-
-    for F in fe_values:
-        FEA = F
-        FEB = F
-        for (v0, a0, b0) in escenarios_vol:
-            for k, anos_k in enumerate(blocks, start=1):
-                emb = EmbalseNuevaPunilla()
-                emb.anos = anos_k[:]     # IMPORTANT: limitar el modelo al bloque
-                emb.FEA = FEA
-                emb.FEB = FEB
-                emb.VRFI_init = v0
-                emb.VA_init   = a0
-                emb.VB_init   = b0
-
-                sol = emb.solve()
-
-                status_ok = sol is not None and sol.get('status') in (GRB.OPTIMAL, GRB.SUBOPTIMAL)  # 2, 9
-
-                if not status_ok:
-                    rows.append(dict(
-                        period_years=period_years, iter=k,
-                        interval_start=anos_k[0], interval_end=anos_k[-1],
-                        FEA=FEA, FEB=FEB, VRFI0=v0, A0=a0, B0=b0,
-                        Qturb_total_Hm3=None, Rebalse_total_Hm3=None, Qdis_prom_Hm3_mes=None,
-                        Satisf_prom_pct=None, Def_modelo_Hm3=None, Def_FE_Hm3=None, Def_total_Hm3=None,
-                        VRFI_fin_Hm3=None, A_fin_Hm3=None, B_fin_Hm3=None, TOTAL_fin_Hm3=None
-                    ))
-                    continue
-
-                kpis = compute_interval_kpis(emb, anos_k)
-                rows.append(dict(
-                    period_years=period_years, iter=k,
-                    interval_start=anos_k[0], interval_end=anos_k[-1],
-                    FEA=FEA, FEB=FEB, VRFI0=v0, A0=a0, B0=b0,
-                    **kpis
-                ))
-
-                # (Opcional) También puedes escribir el bloque de texto resumen:
-                # resumen_txt = emb._texto_resumen_intervalo(
-                #     f"Iteración {k} — FEA=FEB={F:.2f} — Inits (VRFI,A,B)=({v0},{a0},{b0})",
-                #     anos_k
-                # )
-                # with open(f"resumen_{period_years}y_iter{k}_FE{F:.2f}_init{v0}-{a0}-{b0}.txt", "w", encoding="utf-8") as fh:
-                #     fh.write(resumen_txt)
-
-    df = pd.DataFrame(rows)
-    # Orden lógico
-    df = df.sort_values(
-        ["period_years","FEA","FEB","VRFI0","A0","B0","iter","interval_start"],
-        na_position="last"
-    )
-    df.to_csv(out_csv, index=False)
+    hidrologia = HydrologyDataset.desde_excel()
+    jobs = [(period_years, k, tuple(anos_k), F, F, v0, a0, b0)
+            for k, anos_k in enumerate(blocks, start=1)
+            for F in fe_values
+            for (v0, a0, b0) in escenarios_vol]
+    por_bloque = len(fe_values) * len(escenarios_vol)
+    ckpt = Checkpoint(checkpoint, resume=resume) if checkpoint else None
+    hechos = sum(1 for job in jobs if ckpt is not None and _clave_trabajo(job) in ckpt)
+    if hechos:
+        print(f"[{period_years}y] checkpoint {checkpoint}: {hechos} trabajos ya completados, se saltan")
+    pendientes = [job for job in jobs if ckpt is None or _clave_trabajo(job) not in ckpt]
+
+    def escribir(resueltas):
+        """
+        Escribe una fila por trabajo, en el orden de jobs, a medida que llegan: las del
+        checkpoint van en su lugar y `resueltas` (filas de pendientes, en orden) llena el resto.
+        """
+        with open(out_csv, "w", newline="", encoding="utf-8") as f:
+            salida = None
+            for job in jobs:
+                clave = _clave_trabajo(job)
+                if ckpt is not None and clave in ckpt:
+                    fila = ckpt.get(clave)
+                else:
+                    fila = next(resueltas)
+                    if ckpt is not None:
+                        ckpt.agregar(clave, fila)
+                if salida is None:
+                    salida = csv.DictWriter(f, fieldnames=list(fila))
+                    salida.writeheader()
+                salida.writerow(fila)
+                f.flush()
+
+    def resolver_en_serie(escritor):
+        # Un modelo por bloque: FE y volúmenes iniciales sólo cambian constantes y cotas,
+        # así que se editan en el MIP ya construido (set_parameters) y se re-optimiza
+        # partiendo de la solución anterior.
+        bloque = None
+        for job in pendientes:
+            if job[:2] != bloque:
+                bloque = job[:2]
+                emb = _embalse_bloque(hidrologia, job[2], cache, escritor=escritor,
+                                      cache_resultados=cache_resultados, solver=solver)
+            yield _fila_intervalo(emb, *job, reportes=reportes)
+
+    def resolver_en_pool(pool):
+        # chunksize = un bloque: cada proceso recorre su bloque en el mismo orden que la
+        # versión serie (mismos MIP starts) y map() entrega las filas en orden de envío, cada
+        # una apenas están listas las anteriores. Al reanudar los trozos ya no calzan con los
+        # bloques; _trabajo arma el modelo de cada bloque nuevo que le toque.
+        for fila, transiciones in pool.map(_trabajo, pendientes, chunksize=por_bloque):
+            if transiciones:
+                cache.fusionar(transiciones)
+            yield fila
+
+    t0 = time.perf_counter()
+    try:
+        if workers <= 1:
+            escritor = EscritorAsincrono() if reportes is not None else None
+            escribir(resolver_en_serie(escritor))
+            if escritor is not None:
+                escritor.cerrar()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                                     initargs=(hidrologia, cache, reportes, cache_resultados, solver)) as pool:
+                escribir(resolver_en_pool(pool))
+    finally:
+        if ckpt is not None:
+            ckpt.cerrar()
+
+    segundos = time.perf_counter() - t0
+    por_min = 60.0 * len(pendientes) / segundos if segundos > 0 else float('inf')
+    print(f"[{period_years}y] {len(pendientes)} trabajos en {segundos:.1f} s "
+          f"({por_min:.1f} trabajos/min, workers={workers})")
+    if cache is not None:
+        print(f"[{period_years}y] {cache}")
+    if cache_resultados is not None and workers <= 1:
+        print(f"[{period_years}y] {cache_resultados}")
+
+    df = pd.read_csv(out_csv)
+    df.attrs['trabajos_por_min'] = por_min
     print(f"[OK] CSV guardado: {out_csv} ({len(df)} filas)")
     return df
 
 if __name__ == "__main__":
-    from gurobipy import GRB
-    # Tres CSV (uno por tanda 5y/10y/15y)
-    run_suite_to_csv(5,  FE_GRID, ESCENARIOS_VOL, "resultados_5y.csv")
-    run_suite_to_csv(10, FE_GRID, ESCENARIOS_VOL, "resultados_10y.csv")
-    run_suite_to_csv(15, FE_GRID, ESCENARIOS_VOL, "resultados_15y.csv")
+    parser = argparse.ArgumentParser(description="Malla de sensibilidad FE x volúmenes iniciales (CSV 5y/10y/15y)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="procesos en paralelo (cada uno con Threads=1); 1 = en serie")
+    parser.add_argument("--solver", default="gurobi", choices=SOLVERS,
+                        help="highs: mismo MIP con scipy.optimize.milp, sin licencia de Gurobi")
+    parser.add_argument("--comparar-serie", action="store_true",
+                        help="corre también en serie y reporta trabajos/min de ambos")
+    parser.add_argument("--cache-transiciones", metavar="ARCHIVO", default=None,
+                        help="resuelve año a año consultando una caché de transiciones anuales "
+                             "guardada en ARCHIVO (se crea si no existe)")
+    parser.add_argument("--reportes", metavar="DIR", default=None,
+                        help="escribe también el Excel/txt de cada corrida en DIR (en segundo plano)")
+    parser.add_argument("--cache-resultados", metavar="DIR", default=None,
+                        help="guarda la solución de cada trabajo en DIR (model/cache_resultados.py) y "
+                             "reutiliza las ya calculadas en corridas anteriores")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="agrega cada fila terminada a resultados_<N>y.checkpoint.jsonl")
+    parser.add_argument("--resume", action="store_true",
+                        help="retoma desde resultados_<N>y.checkpoint.jsonl saltando los trabajos completados")
+    args = parser.parse_args()
+
+    cache = CacheTransiciones(archivo=args.cache_transiciones) if args.cache_transiciones else None
+    cache_resultados = CacheResultados(args.cache_resultados) if args.cache_resultados else None
+
+    # Tres CSV (uno por tanda 5y/10y/15y); la caché se comparte entre tandas (mismos años y estados)
+    for years in (5, 10, 15):
+        df = run_suite_to_csv(years, FE_GRID, ESCENARIOS_VOL, f"resultados_{years}y.csv",
+                              workers=args.workers, cache=cache, reportes=args.reportes,
+                              checkpoint=f"resultados_{years}y.checkpoint.jsonl" if args.checkpoint or args.resume else None,
+                              resume=args.resume, cache_resultados=cache_resultados, solver=args.solver)
+        if args.comparar_serie and args.workers > 1:
+            # caché nueva: la compartida ya tiene las transiciones de la corrida en paralelo
+            df_serie = run_suite_to_csv(years, FE_GRID, ESCENARIOS_VOL, f"resultados_{years}y_serie.csv",
+                                        cache=CacheTransiciones() if cache is not None else None,
+                                        solver=args.solver)
+            print(f"[{years}y] trabajos/min: serie {df_serie.attrs['trabajos_por_min']:.1f}  "
+                  f"workers={args.workers} {df.attrs['trabajos_por_min']:.1f}  "
+                  f"(x{df.attrs['trabajos_por_min'] / df_serie.attrs['trabajos_por_min']:.2f})")
+    if cache is not None and cache.guardar():
+        print(f"[OK] Caché de transiciones guardada: {cache.archivo} ({cache})")
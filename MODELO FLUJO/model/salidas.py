@@ -0,0 +1,153 @@
+# model/salidas.py
+# Escritura de las tablas de resultados según output_format.
+#
+# modelito2, caso_base y monte_carlo escribían siempre un .xlsx con openpyxl, que en
+# los barridos cuesta tanto como resolver. Aquí la misma colección de tablas se escribe
+# como un libro Excel (una hoja por tabla), como CSV/Parquet (un archivo por tabla,
+# base_hoja.ext, cada uno en una sola llamada vectorizada) o no se escribe.
+# normalizar_salidas interpreta el argumento outputs= de solve(): qué artefactos
+# producir y en qué rutas (por defecto, ninguno). EscritorAsincrono saca el formateo y
+# la escritura del hilo que resuelve, para que Gurobi siga ocupado mientras se escribe.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+FORMATOS = ('xlsx', 'csv', 'parquet', 'none')
+
+
+def validar_formato(output_format):
+    if output_format not in FORMATOS:
+        raise ValueError(f"output_format desconocido: {output_format!r} (use {', '.join(map(repr, FORMATOS))})")
+    return output_format
+
+
+def normalizar_salidas(outputs, artefactos, rutas):
+    """
+    outputs de solve(): None/"none" (nada), un nombre, un iterable de nombres o un dict
+    artefacto -> ruta (None = ruta por defecto de rutas). Devuelve dict artefacto -> ruta
+    y crea los directorios de las rutas entregadas.
+    """
+    if outputs is None or outputs == "none":
+        return {}
+    if isinstance(outputs, str):
+        outputs = (outputs,)
+    if not isinstance(outputs, dict):
+        outputs = dict.fromkeys(outputs)
+    salidas = {}
+    for art, ruta in outputs.items():
+        if art not in artefactos:
+            raise ValueError(f"artefacto desconocido: {art!r} (use {', '.join(map(repr, artefactos))})")
+        salidas[art] = ruta if ruta is not None else rutas.get(art)
+        if salidas[art] and os.path.dirname(salidas[art]):
+            os.makedirs(os.path.dirname(salidas[art]), exist_ok=True)
+    return salidas
+
+
+def porcentaje(servicio, demanda):
+    """100 * servicio / demanda por elemento; 100 donde la demanda es 0 (columnas Satisfaccion_*)."""
+    pct = np.full(np.shape(demanda), 100.0)
+    positiva = demanda > 0
+    np.divide(servicio, demanda, out=pct, where=positiva)
+    pct[positiva] *= 100
+    return pct
+
+
+def rutas_tablas(tablas, archivo, output_format="xlsx"):
+    """Archivos que escribe escribir_tablas con estos argumentos."""
+    validar_formato(output_format)
+    if output_format == "none":
+        return []
+    base, _ = os.path.splitext(archivo)
+    if output_format == "xlsx":
+        return [base + ".xlsx"]
+    return [f"{base}_{hoja}.{output_format}" for hoja in tablas]
+
+
+def escribir_tablas(tablas, archivo, output_format="xlsx"):
+    """
+    tablas: dict hoja -> (DataFrame, index) en el orden en que deben quedar.
+    archivo: ruta base; la extensión se reemplaza por la del formato.
+    xlsx escribe un libro con una hoja por tabla; csv y parquet un archivo por tabla
+    (base_hoja.csv / base_hoja.parquet; Parquet requiere pyarrow o fastparquet).
+    Devuelve la lista de archivos escritos ([] con output_format="none").
+    """
+    archivos = rutas_tablas(tablas, archivo, output_format)
+    if output_format == "xlsx":
+        with pd.ExcelWriter(archivos[0], engine='openpyxl') as w:
+            for hoja, (df, index) in tablas.items():
+                df.to_excel(w, sheet_name=hoja, index=index)
+        return archivos
+
+    for ruta, (df, index) in zip(archivos, tablas.values()):
+        if output_format == "csv":
+            df.to_csv(ruta, index=index)
+        else:
+            # Parquet exige un tipo por columna: las mixtas (p. ej. mes o 'Ninguno') van como texto
+            mixtas = {c: str for c in df.columns if df[c].dtype == object}
+            df.astype(mixtas).to_parquet(ruta, index=index)
+    return archivos
+
+
+class EscritorAsincrono:
+    """
+    Cola de reportes en segundo plano: enviar(fn, *args) corre fn (formatear y escribir un
+    reporte) en un pool de `hilos` hilos y vuelve de inmediato. Con `max_pendientes` trabajos
+    sin terminar, enviar() espera a que se libere uno (memoria acotada aunque el disco sea
+    más lento que el solver). flush() espera todo lo enviado; los errores de un trabajo se
+    relanzan en el siguiente enviar() o en flush().
+    """
+
+    def __init__(self, hilos=1, max_pendientes=8):
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="escritor")
+        self._cupos = threading.BoundedSemaphore(max_pendientes)
+        self._pendientes = []
+        self.completados = 0
+
+    def __repr__(self):
+        return f"EscritorAsincrono({len(self._pendientes)} pendientes, {self.completados} completados)"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def _revisar(self, esperar=False):
+        """Descarta los trabajos terminados (con esperar=True, todos) y relanza el primer error."""
+        pendientes, error = [], None
+        for fut in self._pendientes:
+            if not (esperar or fut.done()):
+                pendientes.append(fut)
+            elif fut.exception() is not None:
+                error = error or fut.exception()
+            else:
+                self.completados += 1
+        self._pendientes = pendientes
+        if error is not None:
+            raise error
+
+    def enviar(self, fn, *args, **kwargs):
+        self._revisar()
+        self._cupos.acquire()
+        try:
+            fut = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._cupos.release()
+            raise
+        fut.add_done_callback(lambda _: self._cupos.release())
+        self._pendientes.append(fut)
+        return fut
+
+    def flush(self):
+        """Espera a que terminen todos los trabajos enviados; devuelve cuántos van completados."""
+        self._revisar(esperar=True)
+        return self.completados
+
+    def cerrar(self):
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown()
@@ -0,0 +1,196 @@
+# model/simulador.py
+# Recursión mes a mes de las reglas de operación de EmbalseNuevaPunilla, sin Gurobi.
+#
+# Todas las familias de restricciones de modelito2.restricciones son reglas
+# deterministas (min/max de llenado, pago SSR, reparto 71/29, "propio primero",
+# apoyo VRFI), así que la trayectoria factible se puede avanzar directamente.
+# La única holgura del MIP es RESERVA_USO_A/B: usar la reserva hoy reduce el
+# déficit 1:1 y a lo más quita la misma agua a un apoyo futuro, por lo que usarla
+# al máximo (lo que hace la recursión) es óptimo. El MIP puede devolver otro
+# reparto temporal de la reserva con el mismo déficit total (óptimo alternativo).
+import numpy as np
+
+# Familias que entrega la recursión (mismos nombres que las variables del MIP)
+FAMILIAS = (
+    'V_VRFI', 'V_A', 'V_B',
+    'Q_dis', 'Rem', 'LLENADO_VRFI', 'REMANENTE_POST_VRFI',
+    'CUOTA_A', 'CUOTA_B', 'LLENADO_A', 'LLENADO_B',
+    'IN_VRFI', 'IN_A', 'IN_B', 'REBALSE_TOTAL', 'REBALSE_ON',
+    'SSR_EXIGIDO', 'Q_CONSUMO_HUMANO', 'SSR_ACUMULADO',
+    'VRFI_DISPONIBLE_LIBRE', 'DISPONIBLE_A', 'DISPONIBLE_B',
+    'Q_A', 'Q_B', 'FALTANTE_A', 'FALTANTE_B', 'FALTANTE_TOTAL',
+    'Z_A_VACIO', 'Z_B_VACIO', 'VRFI_APOYO_CAP', 'APOYO_TOTAL',
+    'Q_A_apoyo', 'Q_B_apoyo', 'd_A', 'd_B', 'Q_turb',
+)
+
+# Auxiliares del MIP que no salen en las tablas pero sirven de punto de partida (MIP start)
+FAMILIAS_AUX = (
+    'ESPACIO_VRFI', 'ESPACIO_A', 'ESPACIO_B', 'REMANENTE_BRUTO',
+    'SSR_CAPACIDAD_VARIABLE', 'DISPONIBILIDAD_PRELIM_VRFI', 'DISP_POST_SSR', 'DISP_POST_SSR_POS',
+    'T_A', 'T_B', 'RESERVA_USO_A', 'RESERVA_USO_B',
+    'PROPORCION_A', 'PROPORCION_B', 'ASIGNACION_A_BASE', 'ASIGNACION_B_BASE',
+    'EXCEDENTE_A', 'EXCEDENTE_B', 'BRECHA_A', 'BRECHA_B', 'EXTRA_HACIA_A', 'EXTRA_HACIA_B',
+    'DEM_A_CONST', 'DEM_B_CONST', 'MIN_A_PROPIO', 'MIN_B_PROPIO',
+)
+
+
+def _recorrer(Qin, UPREF, demA, demB, VRFI_init, VA_init, VB_init,
+              C_VRFI, C_TIPO_A, C_TIPO_B, RESERVA_MIN_VRFI, ssr_mes, acumular_ssr, tol, SSR_init=0.0):
+    """Genera (ano_idx, mes_idx, dict familia -> valores del mes) en orden temporal."""
+    lote = Qin.shape[:-2]
+    n_anos = Qin.shape[-2]
+
+    V_R = np.broadcast_to(np.asarray(VRFI_init, dtype=float), lote).copy()
+    V_A = np.broadcast_to(np.asarray(VA_init, dtype=float), lote).copy()
+    V_B = np.broadcast_to(np.asarray(VB_init, dtype=float), lote).copy()
+    acumulado = np.broadcast_to(np.asarray(SSR_init, dtype=float), lote).copy()
+    cero = np.zeros(lote)
+
+    for a in range(n_anos):
+        if a > 0 and not acumular_ssr:
+            acumulado = np.zeros(lote)
+        for i in range(12):
+            dA_mes = demA[i]
+            dB_mes = demB[i]
+
+            esp_R, esp_A, esp_B = C_VRFI - V_R, C_TIPO_A - V_A, C_TIPO_B - V_B
+
+            # remanente y llenados (VRFI primero, luego cuotas 71/29)
+            q_dis = Qin[..., a, i] - UPREF[..., a, i]
+            rem = np.maximum(q_dis, 0.0)
+            ll_R = np.minimum(rem, esp_R)
+            post = rem - ll_R
+            cuota_A = 0.71 * post
+            cuota_B = 0.29 * post
+            ll_A = np.minimum(cuota_A, esp_A)
+            ll_B = np.minimum(cuota_B, esp_B)
+            rebalse = rem - ll_R - ll_A - ll_B
+
+            # SSR (prioridad dura)
+            exigido = ssr_mes + acumulado
+            cap_ssr = V_R + ll_R
+            pago = np.minimum(exigido, cap_ssr)
+            acumulado = exigido - pago
+            post_ssr = V_R + ll_R - pago
+            libre = np.maximum(post_ssr - RESERVA_MIN_VRFI, 0.0)
+
+            # propio primero
+            disp_A = V_A + ll_A
+            disp_B = V_B + ll_B
+            q_A = np.minimum(disp_A, dA_mes)
+            q_B = np.minimum(disp_B, dB_mes)
+            t_A = 0.5 * dA_mes - q_A
+            t_B = 0.5 * dB_mes - q_B
+            falt_A = np.maximum(t_A, 0.0)
+            falt_B = np.maximum(t_B, 0.0)
+            falt_T = falt_A + falt_B
+
+            # reserva habilitada sólo si A o B quedaron vacíos
+            z_A = disp_A <= tol
+            z_B = disp_B <= tol
+            uso_res = np.where(z_A | z_B,
+                               np.minimum(RESERVA_MIN_VRFI, np.maximum(post_ssr, 0.0)),
+                               0.0)
+            cap = libre + uso_res
+            apoyo = np.minimum(cap, falt_T)
+
+            # reparto 71/29 con reasignación cruzada
+            prop_A = 0.71 * apoyo
+            prop_B = 0.29 * apoyo
+            asig_A = np.minimum(falt_A, prop_A)
+            asig_B = np.minimum(falt_B, prop_B)
+            extra_B = np.minimum(prop_A - asig_A, falt_B - asig_B)
+            extra_A = np.minimum(prop_B - asig_B, falt_A - asig_A)
+            ap_A = asig_A + extra_A
+            ap_B = asig_B + extra_B
+
+            # balances
+            V_R = post_ssr - ap_A - ap_B
+            V_A = disp_A - q_A
+            V_B = disp_B - q_B
+
+            yield a, i, {
+                'V_VRFI': V_R, 'V_A': V_A, 'V_B': V_B,
+                'Q_dis': q_dis, 'Rem': rem, 'LLENADO_VRFI': ll_R, 'REMANENTE_POST_VRFI': post,
+                'CUOTA_A': cuota_A, 'CUOTA_B': cuota_B, 'LLENADO_A': ll_A, 'LLENADO_B': ll_B,
+                'IN_VRFI': ll_R, 'IN_A': ll_A, 'IN_B': ll_B,
+                'REBALSE_TOTAL': rebalse, 'REBALSE_ON': rebalse > tol,
+                'SSR_EXIGIDO': exigido, 'Q_CONSUMO_HUMANO': pago, 'SSR_ACUMULADO': acumulado,
+                'VRFI_DISPONIBLE_LIBRE': libre, 'DISPONIBLE_A': disp_A, 'DISPONIBLE_B': disp_B,
+                'Q_A': q_A, 'Q_B': q_B,
+                'FALTANTE_A': falt_A, 'FALTANTE_B': falt_B, 'FALTANTE_TOTAL': falt_T,
+                'Z_A_VACIO': z_A, 'Z_B_VACIO': z_B, 'VRFI_APOYO_CAP': cap, 'APOYO_TOTAL': apoyo,
+                'Q_A_apoyo': ap_A, 'Q_B_apoyo': ap_B,
+                'd_A': dA_mes - q_A - ap_A, 'd_B': dB_mes - q_B - ap_B,
+                'Q_turb': q_A + ap_A + q_B + ap_B + rebalse,
+                # auxiliares (FAMILIAS_AUX); la reserva usada se imputa a A si está vacío
+                'ESPACIO_VRFI': esp_R, 'ESPACIO_A': esp_A, 'ESPACIO_B': esp_B,
+                'REMANENTE_BRUTO': q_dis, 'SSR_CAPACIDAD_VARIABLE': cap_ssr,
+                'DISPONIBILIDAD_PRELIM_VRFI': post_ssr - RESERVA_MIN_VRFI,
+                'DISP_POST_SSR': post_ssr, 'DISP_POST_SSR_POS': np.maximum(post_ssr, 0.0),
+                'T_A': t_A, 'T_B': t_B,
+                'RESERVA_USO_A': np.where(z_A, uso_res, cero),
+                'RESERVA_USO_B': np.where(z_A, cero, uso_res),
+                'PROPORCION_A': prop_A, 'PROPORCION_B': prop_B,
+                'ASIGNACION_A_BASE': asig_A, 'ASIGNACION_B_BASE': asig_B,
+                'EXCEDENTE_A': prop_A - asig_A, 'EXCEDENTE_B': prop_B - asig_B,
+                'BRECHA_A': falt_A - asig_A, 'BRECHA_B': falt_B - asig_B,
+                'EXTRA_HACIA_A': extra_A, 'EXTRA_HACIA_B': extra_B,
+                'DEM_A_CONST': cero + dA_mes, 'DEM_B_CONST': cero + dB_mes,
+                'MIN_A_PROPIO': q_A, 'MIN_B_PROPIO': q_B,
+            }
+
+
+def simular_reglas(Qin, UPREF, demA, demB,
+                   VRFI_init=0.0, VA_init=0.0, VB_init=0.0,
+                   C_VRFI=175, C_TIPO_A=260, C_TIPO_B=105,
+                   RESERVA_MIN_VRFI=2.275, ssr_mes=3.9 / 12.0,
+                   acumular_ssr=True, tol=1e-9, familias=FAMILIAS, SSR_init=0.0):
+    """
+    Avanza la operación del embalse mes a mes.
+
+    Qin, UPREF: arrays (..., n_anos, 12) en Hm³/mes (afluente y QPD efectivo).
+    demA, demB: arrays (12,) en Hm³/mes, ya multiplicadas por FEA/FEB.
+    Los ejes iniciales (...) son escenarios independientes que avanzan juntos;
+    los volúmenes iniciales y SSR_init (arrastre SSR pendiente al inicio) pueden ser
+    escalares o arrays con esa forma.
+
+    Devuelve un dict familia -> array (..., n_anos, 12).
+    """
+    Qin = np.asarray(Qin, dtype=float)
+    UPREF = np.asarray(UPREF, dtype=float)
+    out = {f: np.empty(Qin.shape) for f in familias}
+    for a, i, paso in _recorrer(Qin, UPREF, demA, demB, VRFI_init, VA_init, VB_init,
+                                C_VRFI, C_TIPO_A, C_TIPO_B, RESERVA_MIN_VRFI, ssr_mes, acumular_ssr, tol,
+                                SSR_init):
+        for f in familias:
+            out[f][..., a, i] = paso[f]
+    return out
+
+
+def simular_totales(Qin, UPREF, demA, demB,
+                    VRFI_init=0.0, VA_init=0.0, VB_init=0.0,
+                    C_VRFI=175, C_TIPO_A=260, C_TIPO_B=105,
+                    RESERVA_MIN_VRFI=2.275, ssr_mes=3.9 / 12.0,
+                    acumular_ssr=True, tol=1e-9,
+                    familias=('d_A', 'd_B', 'Q_A', 'Q_B', 'Q_A_apoyo', 'Q_B_apoyo',
+                              'Q_turb', 'REBALSE_TOTAL', 'Q_dis'),
+                    SSR_init=0.0):
+    """
+    Igual que simular_reglas pero sin guardar trayectorias: suma cada familia
+    sobre todo el horizonte (forma (...)) y agrega los stocks y el SSR acumulado
+    del último mes como 'V_VRFI_fin', 'V_A_fin', 'V_B_fin', 'SSR_ACUMULADO_fin'.
+    Pensado para lotes grandes de escenarios (Monte Carlo).
+    """
+    Qin = np.asarray(Qin, dtype=float)
+    UPREF = np.asarray(UPREF, dtype=float)
+    tot = {f: np.zeros(Qin.shape[:-2]) for f in familias}
+    paso = None
+    for _, _, paso in _recorrer(Qin, UPREF, demA, demB, VRFI_init, VA_init, VB_init,
+                                C_VRFI, C_TIPO_A, C_TIPO_B, RESERVA_MIN_VRFI, ssr_mes, acumular_ssr, tol,
+                                SSR_init):
+        for f in familias:
+            tot[f] += paso[f]
+    for f in ('V_VRFI', 'V_A', 'V_B', 'SSR_ACUMULADO'):
+        tot[f + '_fin'] = paso[f]
+    return tot
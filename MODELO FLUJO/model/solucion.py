@@ -0,0 +1,91 @@
+# model/solucion.py
+# Solución extraída de un MIP resuelto, lista para exportar.
+#
+# Los exportadores (Excel, TXT, resumen por intervalo, KPIs del barrido y de Monte Carlo)
+# leían var.X elemento a elemento, decenas de miles de veces por corrida y varias veces
+# los mismos valores. Solution.desde_modelo lee todas las variables de las familias con
+# una sola llamada model.getAttr('X', ...) y deja un array (n_anos, 12) por familia.
+import numpy as np
+
+try:
+    from model.milp import es_variable
+except ImportError:  # ejecutado desde model/
+    from milp import es_variable
+
+
+class Solution:
+    """
+    valores: dict familia -> array (n_anos, 12) alineado con anos x meses.
+    resumen: status, obj_val, tiempo_resolucion, nodos, ... (lo que entregue el solver).
+    """
+
+    def __init__(self, valores, anos, meses=tuple(range(1, 13)), **resumen):
+        self.valores = valores
+        self.anos = list(anos)
+        self.meses = list(meses)
+        self.resumen = resumen
+        self._fila = {ano: a for a, ano in enumerate(self.anos)}
+        self._col = {mes: i for i, mes in enumerate(self.meses)}
+
+    def __getitem__(self, fam):
+        return self.valores[fam]
+
+    def __contains__(self, fam):
+        return fam in self.valores
+
+    def __repr__(self):
+        return f"Solution({len(self.valores)} familias, {len(self.anos)} años)"
+
+    def x(self, fam, ano, mes):
+        """Valor de familia[ano, mes] (equivalente a var[ano, mes].X)."""
+        return self.valores[fam][self._fila[ano], self._col[mes]]
+
+    def fin(self, fam):
+        """Valor del último mes del último año (stocks finales)."""
+        return self.valores[fam][-1, -1]
+
+    def total(self, fam):
+        return float(self.valores[fam].sum())
+
+    @classmethod
+    def desde_modelo(cls, model, familias, anos, meses=tuple(range(1, 13)), **resumen):
+        """
+        familias: dict nombre -> tupledict (ano, mes) de variables (gp.Var o de model/milp.py), o de objetos con
+        const/terminos/transf (familias derivadas del constructor lean).
+        Todas las gp.Var (incluidas las de las derivadas) se leen con un único getAttr.
+        """
+        claves = [(ano, mes) for ano in anos for mes in meses]
+        n = len(claves)
+        todas = []
+        tramos = {}
+        for fam, td in familias.items():
+            elems = [td[clave] for clave in claves]
+            if all(es_variable(e) for e in elems):
+                tramos[fam] = ('var', len(todas))
+                todas.extend(elems)
+                continue
+            # derivada: const[k] + sum(coef * var) (+ transf), como filas de una matriz dispersa
+            const = np.array([e.const for e in elems], dtype=float)
+            filas, coefs, cols = [], [], []
+            for k, e in enumerate(elems):
+                for coef, var in e.terminos:
+                    filas.append(k)
+                    coefs.append(coef)
+                    cols.append(len(todas))
+                    todas.append(var)
+            tramos[fam] = ('derivada', const, np.array(filas, dtype=int), np.array(coefs, dtype=float),
+                           np.array(cols, dtype=int), [e.transf for e in elems])
+
+        X = np.array(model.getAttr('X', todas), dtype=float) if todas else np.empty(0)
+        forma = (len(anos), len(meses))
+        valores = {}
+        for fam, tramo in tramos.items():
+            if tramo[0] == 'var':
+                valores[fam] = X[tramo[1]:tramo[1] + n].reshape(forma)
+                continue
+            _, const, filas, coefs, cols, transf = tramo
+            arr = const + np.bincount(filas, weights=coefs * X[cols], minlength=n)
+            if any(transf):
+                arr = np.array([f(v) if f else v for f, v in zip(transf, arr)], dtype=float)
+            valores[fam] = arr.reshape(forma)
+        return cls(valores, anos, meses, **resumen)
@@ -0,0 +1,245 @@
+# model/telemetria.py
+# Tiempos por fase y censo del MIP dentro de solve().
+#
+# Lo único que dejaba solve() era el log de Gurobi y algunos print. Con
+# emb.telemetria = Telemetria() cada solve registra tiempo de reloj y de CPU por fase
+# (carga, variables, restricciones, optimización, extracción, exportación), el tiempo de
+# construcción de cada familia de variables/restricciones, el censo del modelo
+# (variables, binarias, lineales, generales, indicadores; por familia), las reducciones
+# del presolve, nodos, gap y memoria máxima. Todo queda en telemetria.datos (un dict
+# serializable) y, con archivo=..., se agrega como una línea a un JSON Lines.
+import contextlib
+import itertools
+import json
+import os
+import re
+import sys
+import time
+
+try:
+    from model.milp import GRB, GurobiError
+except ImportError:  # ejecutado desde model/
+    from milp import GRB, GurobiError
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# nombre de fila/variable -> familia: sin el índice [..] de addVars/addMConstr ni el sufijo _año_mes
+_SUFIJO = re.compile(r"(\[.*\]|_\d{4}/\d{4}(_\d+)?)$")
+
+TIPOS_GENERALES = {getattr(GRB, n): n[len('GENCONSTR_'):].lower() for n in dir(GRB) if n.startswith('GENCONSTR_')}
+
+# métodos de gp.Model que agregan filas/columnas y el grupo en que se anotan
+_METODOS = {'addVar': 'variables', 'addVars': 'variables', 'addMVar': 'variables',
+            'addConstr': 'lineales', 'addConstrs': 'lineales', 'addLConstr': 'lineales', 'addMConstr': 'lineales',
+            'addGenConstrIndicator': 'indicadores'}
+_METODOS.update({m: 'generales' for m in ('addGenConstrMin', 'addGenConstrMax', 'addGenConstrAbs',
+                                          'addGenConstrAnd', 'addGenConstrOr')})
+
+
+def familia(nombre):
+    return _SUFIJO.sub("", nombre) or "(sin nombre)"
+
+
+def fase(telemetria, nombre):
+    """Bloque `with` cronometrado en telemetria (no hace nada si telemetria es None)."""
+    return telemetria.fase(nombre) if telemetria is not None else contextlib.nullcontext()
+
+
+def optimizar(telemetria, model):
+    """model.optimize(); con telemetria, en la fase 'optimizacion' y con las estadísticas del solver."""
+    if telemetria is None:
+        model.optimize()
+        return
+    with telemetria.fase('optimizacion'):
+        telemetria.optimizar(model)
+
+
+def rss_max_mb():
+    """Memoria residente máxima del proceso (MB), o None si el SO no la entrega."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10  # bytes en macOS, KB en Linux
+
+
+def _familia_llamada(name):
+    # addMVar/addVars reciben también una lista de nombres (variables_matriz: todas las familias juntas)
+    if isinstance(name, str):
+        return familia(name)
+    familias = list(dict.fromkeys(familia(str(n)) for n in name))
+    return familias[0] if len(familias) == 1 else f"{familias[0]} (+{len(familias) - 1} familias)"
+
+
+class _ModeloCronometrado:
+    """
+    Reemplaza a un gp.Model mientras se construye: cada add* se anota en la familia de su
+    name= con el tiempo transcurrido desde la llamada anterior (armar la expresión y
+    agregarla). El resto de atributos y métodos pasan al modelo real.
+    """
+
+    def __init__(self, model, construccion):
+        object.__setattr__(self, '_model', model)
+        object.__setattr__(self, '_construccion', construccion)
+        object.__setattr__(self, '_t', time.perf_counter())
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self._model, nombre)
+        if nombre not in _METODOS:
+            return metodo
+        grupo = self._construccion.setdefault(_METODOS[nombre], {})
+
+        def cronometrado(*args, **kwargs):
+            resultado = metodo(*args, **kwargs)
+            t = time.perf_counter()
+            fam = _familia_llamada(kwargs.get('name', ''))
+            f = grupo.setdefault(fam, {'wall_s': 0.0, 'llamadas': 0})
+            f['wall_s'] += t - self._t
+            f['llamadas'] += 1
+            object.__setattr__(self, '_t', t)
+            return resultado
+
+        object.__setattr__(self, nombre, cronometrado)
+        return cronometrado
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._model, nombre, valor)
+
+
+class Telemetria:
+    """
+    Registro de un solve() (se reinicia en cada uno; la instancia se puede reutilizar).
+    archivo: JSON Lines al que se agrega `datos` al terminar cada solve (None = sólo en memoria).
+    etiqueta: texto libre que se copia en cada registro (p. ej. el nombre del experimento).
+    """
+
+    def __init__(self, archivo=None, etiqueta=None):
+        self.archivo = archivo
+        self.etiqueta = etiqueta
+        self.datos = {}
+
+    def __repr__(self):
+        total = sum(f['wall_s'] for f in self.datos.get('fases', {}).values())
+        return f"Telemetria({len(self.datos.get('fases', {}))} fases, {total:.3f} s, archivo={self.archivo!r})"
+
+    def iniciar(self, **contexto):
+        self.datos = {'fecha': time.strftime("%Y-%m-%dT%H:%M:%S"), 'etiqueta': self.etiqueta, **contexto,
+                      'fases': {}, 'construccion': {}, 'censo': {}, 'solver': {}}
+        self._presolve = {}
+        return self
+
+    @contextlib.contextmanager
+    def fase(self, nombre):
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            f = self.datos['fases'].setdefault(nombre, {'wall_s': 0.0, 'cpu_s': 0.0, 'n': 0})
+            f['wall_s'] += time.perf_counter() - t0
+            f['cpu_s'] += time.process_time() - c0
+            f['n'] += 1
+
+    def cronometrar(self, model):
+        """Envoltura de model para la construcción (ver _ModeloCronometrado)."""
+        return _ModeloCronometrado(model, self.datos['construccion'])
+
+    def tomar_censo(self, model):
+        """Conteos del modelo ya actualizado (model.update()), en total y por familia."""
+        variables, lineales, generales = model.getVars(), model.getConstrs(), model.getGenConstrs()
+        vtypes = model.getAttr('VType', variables)
+        tipos = model.getAttr('GenConstrType', generales) if generales else []
+        por_familia = {}
+
+        def contar(nombres, campo, campo_marca=None, marcas=()):
+            for nombre, marca in itertools.zip_longest(nombres, marcas):
+                f = por_familia.setdefault(familia(nombre), {})
+                f[campo] = f.get(campo, 0) + 1
+                if marca:
+                    f[campo_marca] = f.get(campo_marca, 0) + 1
+
+        binarias = [t == GRB.BINARY for t in vtypes]
+        indicadores = [t == GRB.GENCONSTR_INDICATOR for t in tipos]
+        contar(model.getAttr('VarName', variables), 'variables', 'binarias', binarias)
+        contar(model.getAttr('ConstrName', lineales), 'lineales')
+        contar(model.getAttr('GenConstrName', generales) if generales else [], 'generales', 'indicadores', indicadores)
+
+        por_tipo = {}
+        for t in tipos:
+            tipo = TIPOS_GENERALES.get(t, str(t))
+            por_tipo[tipo] = por_tipo.get(tipo, 0) + 1
+        self.datos['censo'] = {
+            'variables': len(variables), 'binarias': sum(binarias),
+            'enteras': sum(t == GRB.INTEGER for t in vtypes), 'lineales': len(lineales),
+            'generales': len(generales), 'indicadores': sum(indicadores), 'generales_por_tipo': por_tipo,
+            'no_ceros': model.NumNZs, 'familias': por_familia,
+        }
+        return self.datos['censo']
+
+    def callback(self, model, where):
+        """Callback de optimize(): guarda las reducciones del presolve."""
+        if where == GRB.Callback.PRESOLVE:
+            self._presolve = {
+                'columnas_eliminadas': model.cbGet(GRB.Callback.PRE_COLDEL),
+                'filas_eliminadas': model.cbGet(GRB.Callback.PRE_ROWDEL),
+                'sentidos_cambiados': model.cbGet(GRB.Callback.PRE_SENCHG),
+                'cotas_cambiadas': model.cbGet(GRB.Callback.PRE_BNDCHG),
+                'coeficientes_cambiados': model.cbGet(GRB.Callback.PRE_COECHG),
+            }
+
+    def optimizar(self, model):
+        """model.optimize() con el callback del presolve; acumula las estadísticas del solver."""
+        self._presolve = {}
+        model.optimize(self.callback)
+        s = self.datos['solver']
+        s['optimizaciones'] = s.get('optimizaciones', 0) + 1
+        s['status'] = model.Status
+        s['runtime_s'] = s.get('runtime_s', 0.0) + model.Runtime
+        s['nodos'] = s.get('nodos', 0.0) + model.NodeCount
+        s['iteraciones'] = s.get('iteraciones', 0.0) + model.IterCount
+        if model.SolCount > 0:
+            s['obj'] = model.ObjVal
+            if model.IsMIP:
+                s['gap'] = max(s.get('gap', 0.0), model.MIPGap)
+                s['cota'] = model.ObjBound
+        for clave, valor in self._presolve.items():
+            s.setdefault('presolve', {})[clave] = s.get('presolve', {}).get(clave, 0) + valor
+        try:
+            s['mem_max_gb'] = max(s.get('mem_max_gb', 0.0), model.MaxMemUsed)
+        except (AttributeError, GurobiError):  # atributo de Gurobi >= 11 (no existe en HiGHS)
+            pass
+
+    def terminar(self):
+        """Cierra el registro del solve: memoria máxima y, con archivo, una línea JSON. Devuelve datos."""
+        self.datos['rss_max_mb'] = rss_max_mb()
+        self.datos['total_s'] = sum(f['wall_s'] for f in self.datos['fases'].values())
+        if self.archivo is not None:
+            if os.path.dirname(self.archivo):
+                os.makedirs(os.path.dirname(self.archivo), exist_ok=True)
+            with open(self.archivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.datos, ensure_ascii=False) + "\n")
+        return self.datos
+
+    def familias_mas_lentas(self, n=10):
+        """[(grupo, familia, segundos, llamadas)] de construcción, de la más lenta a la más rápida."""
+        filas = [(grupo, fam, f['wall_s'], f['llamadas'])
+                 for grupo, familias in self.datos.get('construccion', {}).items() for fam, f in familias.items()]
+        return sorted(filas, key=lambda x: -x[2])[:n]
+
+    def imprimir(self, n=10):
+        print("Fases (reloj / CPU):")
+        for nombre, f in self.datos.get('fases', {}).items():
+            print(f"  {nombre:<20} {f['wall_s']:8.3f} s {f['cpu_s']:8.3f} s" + (f"  x{f['n']}" if f['n'] > 1 else ""))
+        c = self.datos.get('censo')
+        if c:
+            print(f"Censo: {c['variables']} variables ({c['binarias']} binarias), {c['lineales']} lineales, "
+                  f"{c['generales']} generales ({c['indicadores']} indicadores), {c['no_ceros']} no ceros")
+        s = self.datos.get('solver')
+        if s:
+            print(f"Solver: {s.get('runtime_s', 0.0):.3f} s, {s.get('nodos', 0):.0f} nodos, gap {s.get('gap', 0.0):.2e}, "
+                  f"presolve {s.get('presolve', {})}")
+        if self.familias_mas_lentas(n):
+            print("Familias más lentas de construir:")
+            for grupo, fam, seg, llamadas in self.familias_mas_lentas(n):
+                print(f"  {grupo:<12} {fam:<28} {seg:8.4f} s  ({llamadas} llamadas)")
@@ -0,0 +1,115 @@
+# model/transiciones.py
+# Caché de transiciones anuales del embalse.
+#
+# Con horizon_mode="chained" cada año hidrológico es una función determinista de
+# (año, estado inicial VRFI/A/B/arrastre SSR, FEA, FEB): Monte Carlo y el barrido de
+# sensibilidad vuelven a resolver muchas veces el mismo año desde el mismo estado
+# (sobre todo con embalses vacíos o llenos). La caché guarda el resultado mensual de
+# cada transición con desalojo LRU y, opcionalmente, un archivo en disco.
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+
+
+class CacheTransiciones:
+    """
+    Mapa (año, estado inicial cuantizado, FEA, FEB) -> dict familia -> array (12,)
+    con las familias de resultado del año (incluye V_VRFI/V_A/V_B/SSR_ACUMULADO, cuyo
+    último mes es el estado final).
+
+    capacidad: máximo de transiciones en memoria (se desaloja la menos usada).
+    archivo: pickle en disco; se lee al crear la caché y se escribe con guardar().
+    resolucion: paso de cuantización del estado inicial (Hm³).
+
+    En un pool de procesos cada worker recibe una copia (sin transiciones nuevas pendientes);
+    extraer_nuevas() devuelve lo que ese worker agregó y fusionar() lo incorpora en la caché
+    del proceso principal, que es la que se guarda.
+    """
+
+    VERSION = 1
+
+    def __init__(self, capacidad=100_000, archivo=None, resolucion=1e-6):
+        self.capacidad = capacidad
+        self.archivo = archivo
+        self.resolucion = resolucion
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()
+        self._nuevas = {}
+        if archivo is not None and os.path.exists(archivo):
+            with open(archivo, "rb") as f:
+                guardado = pickle.load(f)
+            if guardado.get('version') == self.VERSION and guardado.get('resolucion') == resolucion:
+                self._datos.update(guardado['datos'])
+                self._recortar()
+
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        estado['_nuevas'] = {}
+        return estado
+
+    def __len__(self):
+        return len(self._datos)
+
+    def clave(self, firma, ano, VRFI, VA, VB, SSR, FEA, FEB):
+        """
+        firma: parámetros estructurales del modelo (capacidades, SSR, reserva); va al inicio
+        de la clave para no mezclar transiciones de modelos distintos.
+        """
+        q = self.resolucion
+        estado = tuple(int(round(float(x) / q)) for x in (VRFI, VA, VB, SSR))
+        return (tuple(firma), ano) + estado + (float(FEA), float(FEB))
+
+    def get(self, clave):
+        """Transición guardada (y la marca como recién usada) o None; cuenta aciertos/fallos."""
+        valor = self._datos.get(clave)
+        if valor is None:
+            self.fallos += 1
+            return None
+        self._datos.move_to_end(clave)
+        self.aciertos += 1
+        return valor
+
+    def put(self, clave, valores):
+        valor = {fam: np.asarray(arr, dtype=float).copy() for fam, arr in valores.items()}
+        self._datos[clave] = valor
+        self._datos.move_to_end(clave)
+        self._nuevas[clave] = valor
+        self._recortar()
+
+    def extraer_nuevas(self):
+        """Transiciones agregadas con put() desde la última llamada (y las olvida)."""
+        nuevas, self._nuevas = self._nuevas, {}
+        return nuevas
+
+    def fusionar(self, entradas):
+        """Incorpora transiciones calculadas en otro proceso (sin contarlas como nuevas)."""
+        for clave, valor in entradas.items():
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+        self._recortar()
+
+    def _recortar(self):
+        while len(self._datos) > self.capacidad:
+            self._datos.popitem(last=False)
+
+    def guardar(self, archivo=None):
+        archivo = archivo or self.archivo
+        if archivo is None:
+            return None
+        with open(archivo, "wb") as f:
+            pickle.dump({'version': self.VERSION, 'resolucion': self.resolucion,
+                         'datos': dict(self._datos)}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return archivo
+
+    def estadisticas(self):
+        total = self.aciertos + self.fallos
+        return {'aciertos': self.aciertos, 'fallos': self.fallos, 'tamano': len(self._datos),
+                'tasa_aciertos': self.aciertos / total if total else 0.0}
+
+    def __repr__(self):
+        e = self.estadisticas()
+        return (f"CacheTransiciones({e['tamano']} transiciones, {e['aciertos']} aciertos, "
+                f"{e['fallos']} fallos, {100 * e['tasa_aciertos']:.1f}% aciertos)")
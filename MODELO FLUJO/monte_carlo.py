@@ -1,19 +1,49 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
-import gurobipy as gp
-from gurobipy import GRB
 from datetime import datetime
 
+from model.arranque import cargar_inicio
+from model.cache_resultados import CacheResultados
+from model.checkpoint import Checkpoint
+from model.hidrologia import HydrologyDataset
+from model.milp import GRB, nuevo_entorno, nuevo_modelo, quicksum
+from model.modelito2 import EmbalseNuevaPunilla
+from model.perfiles import aplicar_perfil
+from model.salidas import escribir_tablas, rutas_tablas, validar_formato
+from model.solucion import Solution
+from model.transiciones import CacheTransiciones
+from model.simulador import FAMILIAS, FAMILIAS_AUX, simular_reglas, simular_totales
+
 class MonteCarloEmbalse:
     
     def __init__(self, num_simulaciones=100, duracion_anos=30, acumular_ssr=True, 
-                 VRFI_init=0.0, VA_init=0.0, VB_init=0.0):
+                 VRFI_init=0.0, VA_init=0.0, VB_init=0.0, hidrologia=None, semilla=42,
+                 cache_transiciones=None, output_format="xlsx", escritor=None, solver="gurobi"):
         self.num_simulaciones = num_simulaciones
+        # semilla raíz: la simulación i usa su propio Generator (SeedSequence(semilla, spawn_key=(i,))),
+        # así los escenarios no dependen del orden de ejecución ni del número de procesos
+        self.semilla = semilla
         self.duracion_anos = duracion_anos
         self.acumular_ssr = acumular_ssr
         self.VRFI_init = VRFI_init
         self.VA_init = VA_init
         self.VB_init = VB_init
+        # CacheTransiciones (model/transiciones.py): si se entrega, cada simulación Gurobi se
+        # resuelve año a año (horizon_mode="chained") consultando la caché antes de resolver
+        self.cache_transiciones = cache_transiciones
+        self._encadenado = None
+        # formato de exportar_resultados: "xlsx", "csv", "parquet" o "none" (model/salidas.py)
+        self.output_format = validar_formato(output_format)
+        # EscritorAsincrono opcional: exportar_resultados encola la escritura en vez de esperarla
+        self.escritor = escritor
+        # perfil de Gurobi de cada MIP (model/perfiles.py): "auto" = config/monte_carlo_<N>y.prm
+        # (modelito2_<N>y.prm en el camino encadenado), una ruta a un .prm o None
+        self.perfil_solver = "auto"
+        # "gurobi" o "highs" (scipy.optimize.milp, sin licencia ni límite de procesos; ver model/milp.py)
+        self.solver = solver
         
         self.anos_disponibles = [
             '1989/1990', '1990/1991', '1991/1992', '1992/1993', '1993/1994',
@@ -30,47 +60,32 @@ class MonteCarloEmbalse:
                                      '1998/1999', '2016/2017', '2010/2011', '1996/1997', '2007/2008', '2012/2013', '1990/1991', '1989/1990']
 
         self.resultados_simulaciones = []
+        self.hidrologia = hidrologia
         self._cargar_datos_base()
         
+    def __getstate__(self):
+        # el modelo encadenado (gp.Model o ModeloHiGHS) y el escritor (hilos) no viajan a los procesos del pool
+        estado = self.__dict__.copy()
+        estado['_encadenado'] = None
+        estado['escritor'] = None
+        return estado
+
     def _cargar_datos_base(self):
         data_file = "data/caudales.xlsx"
-        xls = pd.ExcelFile(data_file)
-        
-        nuble = pd.read_excel(xls, sheet_name='Hoja1', skiprows=4, nrows=31)
-        hoya1 = pd.read_excel(xls, sheet_name='Hoja1', skiprows=39, nrows=31)
-        hoya2 = pd.read_excel(xls, sheet_name='Hoja1', skiprows=75, nrows=31)
-        hoya3 = pd.read_excel(xls, sheet_name='Hoja1', skiprows=110, nrows=31)
-        
-        excel_columnas = ['MAY','JUN','JUL','AGO','SEP','OCT','NOV','DIC','ENE','FEB','MAR','ABR']
-        orden_meses_modelo = [1,2,3,4,5,6,7,8,9,10,11,12]
-        
-        self.Q_nuble_base = {}
-        self.Q_hoya1_base = {}
-        self.Q_hoya2_base = {}
-        self.Q_hoya3_base = {}
-        self.Q_afl_base = {}
-
-        for idx, fila in nuble.iterrows():
-            ano_str = str(fila.get('AÑO',''))
-            if (pd.notna(fila.get('AÑO')) and '/' in ano_str
-                and not any(w in ano_str.upper() for w in ['PROMEDIO','TOTAL','MAX','MIN'])):
-                try:
-                    ano = int(ano_str.split('/')[0])
-                    for col, mm in zip(excel_columnas, orden_meses_modelo):
-                        n1 = nuble.loc[idx, col]
-                        h1 = hoya1.loc[idx, col]
-                        h2 = hoya2.loc[idx, col]
-                        h3 = hoya3.loc[idx, col]
-                        if pd.notna(n1):
-                            self.Q_nuble_base[ano, mm] = float(n1)
-                            self.Q_afl_base[ano, mm] = float(n1)
-                        if pd.notna(h1): self.Q_hoya1_base[ano, mm] = float(h1)
-                        if pd.notna(h2): self.Q_hoya2_base[ano, mm] = float(h2)
-                        if pd.notna(h3): self.Q_hoya3_base[ano, mm] = float(h3)
-                except Exception:
-                    pass
+        # parseo compartido con caché .npz (ver model/hidrologia.py); se respeta una hidrología inyectada
+        if self.hidrologia is None:
+            self.hidrologia = HydrologyDataset.desde_excel(data_file)
     
-    def generar_escenario(self):
+    def rng_simulacion(self, num_sim):
+        """Generator independiente de la simulación num_sim (0-based), hijo num_sim de la semilla raíz."""
+        return np.random.default_rng(np.random.SeedSequence(self.semilla, spawn_key=(num_sim,)))
+
+    def escenario_simulacion(self, num_sim):
+        return self.generar_escenario(self.rng_simulacion(num_sim))
+
+    def generar_escenario(self, rng=None):
+        # rng=None mantiene el RNG global de np.random
+        rng = np.random if rng is None else rng
         anos_disponibles = self.anos_disponibles.copy()
         # anos_disponibles = self.anos_mixtos_extremos.copy()
         # anos_disponibles = self.anos_humedos.copy()
@@ -92,7 +107,7 @@ class MonteCarloEmbalse:
         escenario = []
         anos_pool = anos_disponibles.copy()
         num_anos_escenario = min(self.duracion_anos, len(anos_pool))
-        escenario = list(np.random.choice(anos_pool, size=num_anos_escenario, replace=False))
+        escenario = list(rng.choice(anos_pool, size=num_anos_escenario, replace=False))
         
         # Distintos escenarios hechos a "mano" (igual aleatorio pero seleccionando el orden especifico de que va antes de que)
         
@@ -112,13 +127,18 @@ class MonteCarloEmbalse:
 
         return escenario
     
-    def ejecutar_simulacion(self, num_sim, anos_escenario, FEA=1.0, FEB=1.0):
+    def ejecutar_simulacion(self, num_sim, anos_escenario, FEA=1.0, FEB=1.0, warm_start=False, env=None):
         print(f"\n{'='*60}")
         print(f"Ejecutando Simulacion #{num_sim + 1}/{self.num_simulaciones}")
         print(f"Primeros 5 años: {anos_escenario[:5]}")
         print(f"{'='*60}")
         try:
-            resultado = self._resolver_modelo_montecarlo(anos_escenario, FEA=FEA, FEB=FEB)
+            if self.cache_transiciones is not None:
+                resultado = self._resolver_encadenado(anos_escenario, FEA=FEA, FEB=FEB,
+                                                      warm_start=warm_start, env=env)
+            else:
+                resultado = self._resolver_modelo_montecarlo(anos_escenario, FEA=FEA, FEB=FEB,
+                                                             warm_start=warm_start, env=env)
             if resultado is not None:
                 resultado['num_simulacion'] = num_sim + 1
                 resultado['escenario_anos'] = ','.join(anos_escenario)
@@ -134,9 +154,12 @@ class MonteCarloEmbalse:
             traceback.print_exc()
             return None
     
-    def _resolver_modelo_montecarlo(self, anos_escenario, FEA=1.0, FEB=1.0):
-        model = gp.Model("MC_Embalse")
-        model.setParam('OutputFlag', 1)
+    def _resolver_modelo_montecarlo(self, anos_escenario, FEA=1.0, FEB=1.0, warm_start=False, env=None,
+                                    solo_construir=False):
+        # solo_construir=True devuelve el modelo sin optimizar (instancias de afinar_solver.py)
+        model = nuevo_modelo("MC_Embalse", self.solver, env=env)
+        if env is None:
+            model.setParam('OutputFlag', 1)
         
         C_VRFI = 175
         C_TIPO_A = 260
@@ -144,21 +167,12 @@ class MonteCarloEmbalse:
         V_C_H = 3.9
         RESERVA_MIN_VRFI = 2.275
         
-        segundos_por_mes = {
-            1: 31*24*3600, 2: 30*24*3600, 3: 31*24*3600, 4: 31*24*3600,
-            5: 30*24*3600, 6: 31*24*3600, 7: 30*24*3600, 8: 31*24*3600,
-            9: 31*24*3600, 10: 28*24*3600, 11: 31*24*3600, 12: 30*24*3600
-        }
-        
         num_A = 21221
         num_B = 7100
         DA_a_m = {1:9503,2:6516,3:3452,4:776,5:0,6:0,7:0,8:0,9:0,10:2444,11:6516,12:9580}
         DB_a_b = {1:3361,2:2305,3:1221,4:274,5:0,6:0,7:0,8:0,9:0,10:864,11:2305,12:3388}
         m_civil = {1:5,2:6,3:7,4:8,5:9,6:10,7:11,8:12,9:1,10:2,11:3,12:4}
         
-        derechos = [52.00,52.00,52.00,52.00,57.70,76.22,69.22,52.00,52.00,52.00,52.00,52.00]
-        qeco = [10.00,10.35,14.48,15.23,15.23,15.23,15.23,15.23,12.80,15.20,16.40,17.60]
-        
         meses = list(range(1, 13))
         
         V_VRFI = model.addVars(anos_escenario, meses, name="V_VRFI", lb=0, ub=C_VRFI)
@@ -236,26 +250,16 @@ class MonteCarloEmbalse:
         
         VRFI_APOYO_CAP = model.addVars(anos_escenario, meses, lb=0.0, name="VRFI_APOYO_CAP")
 
-        QPD_eff = {}
-        for año in anos_escenario:
-            y = int(año.split('/')[0])
-            for mes in meses:
-                H = (self.Q_hoya1_base.get((y,mes),0) + 
-                     self.Q_hoya2_base.get((y,mes),0) + 
-                     self.Q_hoya3_base.get((y,mes),0))
-                qpd_nom = max(derechos[mes-1], qeco[mes-1], max(0, 95.7 - H))
-                QPD_eff[año, mes] = min(qpd_nom, self.Q_nuble_base.get((y,mes),0))
+        h = self.hidrologia
         
         ssr_mes = V_C_H / 12.0
         
         for idx_ano, año in enumerate(anos_escenario):
-            y = int(año.split('/')[0])
+            ya = h.indice[año]
             
             for i, mes in enumerate(meses):
-                seg = segundos_por_mes[mes]
-                Qin_s = self.Q_afl_base.get((y,mes), 0)
-                Qin = Qin_s * seg / 1_000_000.0
-                UPREF = QPD_eff[año, mes] * seg / 1_000_000.0
+                Qin = h.Qin_Hm3[ya, i]
+                UPREF = h.QPD_eff_Hm3[ya, i]
                 
                 key = m_civil[mes]
                 demA = (DA_a_m[key] * num_A * FEA) / 1_000_000.0
@@ -404,7 +408,6 @@ class MonteCarloEmbalse:
             
         extra_const = 0.0
         for año in anos_escenario:
-            y = int(año.split('/')[0])
             for mes in meses:
                 key = m_civil[mes]
                 DemA_base = (DA_a_m[key] * num_A) / 1_000_000.0
@@ -412,24 +415,47 @@ class MonteCarloEmbalse:
                 d_FE = (1.0 - FEA) * DemA_base + (1.0 - FEB) * DemB_base
                 extra_const += d_FE
         
-        total_def_vars = gp.quicksum(d_A[año,mes] + d_B[año,mes] for año in anos_escenario for mes in meses)
+        total_def_vars = quicksum(d_A[año,mes] + d_B[año,mes] for año in anos_escenario for mes in meses)
         model.setObjective(total_def_vars + extra_const, GRB.MINIMIZE)
 
+        if warm_start:
+            # MIP start: la recursión de reglas sobre la misma secuencia de años
+            filas = h.filas(anos_escenario)
+            DemA_base, DemB_base = self._demandas_base()
+            sim = simular_reglas(h.Qin_Hm3[filas], h.QPD_eff_Hm3[filas],
+                                 DemA_base * FEA, DemB_base * FEB,
+                                 VRFI_init=self.VRFI_init, VA_init=self.VA_init, VB_init=self.VB_init,
+                                 C_VRFI=C_VRFI, C_TIPO_A=C_TIPO_A, C_TIPO_B=C_TIPO_B,
+                                 RESERVA_MIN_VRFI=RESERVA_MIN_VRFI, ssr_mes=ssr_mes,
+                                 acumular_ssr=self.acumular_ssr, familias=FAMILIAS + FAMILIAS_AUX)
+            cargar_inicio(model, sim, anos_escenario, meses, alias={'T_A': 'tA', 'T_B': 'tB'},
+                          binarias=('REBALSE_ON', 'Z_A_VACIO', 'Z_B_VACIO'))
+
+        aplicar_perfil(model, 'monte_carlo', len(anos_escenario), self.perfil_solver)
+        if solo_construir:
+            return model
         model.optimize()
         
         if model.status not in (GRB.OPTIMAL, GRB.SUBOPTIMAL):
             return None
         
         tiempo_ejecucion = model.Runtime
+        nodos = model.NodeCount
         gap = model.MIPGap if hasattr(model, 'MIPGap') else 0.0
         
+        # una sola lectura de .X (getAttr) para todas las familias del resultado
+        sol = Solution.desde_modelo(model, {'d_A': d_A, 'd_B': d_B, 'Q_turb': Q_turb, 'Q_A': Q_A, 'Q_B': Q_B,
+                                            'Q_A_apoyo': Q_A_apoyo, 'Q_B_apoyo': Q_B_apoyo,
+                                            'REBALSE_TOTAL': REBALSE_TOTAL, 'V_VRFI': V_VRFI, 'V_A': V_A,
+                                            'V_B': V_B}, anos_escenario, meses)
+
         deficit_total = model.objVal
-        deficit_A = sum(d_A[año, mes].X for año in anos_escenario for mes in meses)
-        deficit_B = sum(d_B[año, mes].X for año in anos_escenario for mes in meses)
-        vol_turbinado = sum(Q_turb[año, mes].X for año in anos_escenario for mes in meses)
-        apoyo_vrfi_A = sum(Q_A_apoyo[año, mes].X for año in anos_escenario for mes in meses)
-        apoyo_vrfi_B = sum(Q_B_apoyo[año, mes].X for año in anos_escenario for mes in meses)
-        rebalse_total = sum(REBALSE_TOTAL[año, mes].X for año in anos_escenario for mes in meses)
+        deficit_A = sol.total('d_A')
+        deficit_B = sol.total('d_B')
+        vol_turbinado = sol.total('Q_turb')
+        apoyo_vrfi_A = sol.total('Q_A_apoyo')
+        apoyo_vrfi_B = sol.total('Q_B_apoyo')
+        rebalse_total = sol.total('REBALSE_TOTAL')
         
         caudal_disponible_total = 0
         
@@ -439,12 +465,10 @@ class MonteCarloEmbalse:
         servicio_total_B = 0
         
         for año in anos_escenario:
-            y = int(año.split('/')[0])
+            ya = h.indice[año]
             for mes in meses:
-                seg = segundos_por_mes[mes]
-                Qin_s = self.Q_afl_base.get((y,mes), 0)
-                Qin = Qin_s * seg / 1_000_000.0
-                UPREF = QPD_eff[año, mes] * seg / 1_000_000.0
+                Qin = h.Qin_Hm3[ya, mes-1]
+                UPREF = h.QPD_eff_Hm3[ya, mes-1]
                 caudal_disponible_total += (Qin - UPREF)
                 
                 key = m_civil[mes]
@@ -454,8 +478,8 @@ class MonteCarloEmbalse:
                 demanda_total_A += demA
                 demanda_total_B += demB
                 
-                servA = Q_A[año, mes].X + Q_A_apoyo[año, mes].X
-                servB = Q_B[año, mes].X + Q_B_apoyo[año, mes].X
+                servA = sol.x('Q_A', año, mes) + sol.x('Q_A_apoyo', año, mes)
+                servB = sol.x('Q_B', año, mes) + sol.x('Q_B_apoyo', año, mes)
                 
                 servicio_total_A += servA
                 servicio_total_B += servB
@@ -466,10 +490,9 @@ class MonteCarloEmbalse:
                              (demanda_total_A + demanda_total_B) * 100) \
                              if (demanda_total_A + demanda_total_B) > 0 else 100
         
-        ultimo_ano = anos_escenario[-1]
-        vol_final_VRFI = V_VRFI[ultimo_ano, 12].X
-        vol_final_A = V_A[ultimo_ano, 12].X
-        vol_final_B = V_B[ultimo_ano, 12].X
+        vol_final_VRFI = sol.fin('V_VRFI')
+        vol_final_A = sol.fin('V_A')
+        vol_final_B = sol.fin('V_B')
         vol_final_total = vol_final_VRFI + vol_final_A + vol_final_B
         
         return {
@@ -482,6 +505,7 @@ class MonteCarloEmbalse:
             'rebalse_total': rebalse_total,
             'gap': gap,
             'tiempo_ejecucion_seg': tiempo_ejecucion,
+            'nodos': nodos,
             'vol_final_VRFI': vol_final_VRFI,
             'vol_final_A': vol_final_A,
             'vol_final_B': vol_final_B,
@@ -496,34 +520,242 @@ class MonteCarloEmbalse:
             'satisfaccion_total_%': satisfaccion_total
         }
     
-    def ejecutar_monte_carlo(self, FEA=1.0, FEB=1.0):
+    @staticmethod
+    def _demandas_base():
+        """Demandas A/B sin FE por mes hidrológico (Hm³), arrays (12,)."""
+        num_A = 21221
+        num_B = 7100
+        DA_a_m = {1:9503,2:6516,3:3452,4:776,5:0,6:0,7:0,8:0,9:0,10:2444,11:6516,12:9580}
+        DB_a_b = {1:3361,2:2305,3:1221,4:274,5:0,6:0,7:0,8:0,9:0,10:864,11:2305,12:3388}
+        m_civil = {1:5,2:6,3:7,4:8,5:9,6:10,7:11,8:12,9:1,10:2,11:3,12:4}
+        DemA_base = np.array([DA_a_m[m_civil[m]] * num_A for m in range(1, 13)]) / 1_000_000.0
+        DemB_base = np.array([DB_a_b[m_civil[m]] * num_B for m in range(1, 13)]) / 1_000_000.0
+        return DemA_base, DemB_base
+
+    def _kpis_totales(self, tot, n_anos, FEA, FEB, tiempo, nodos=0.0):
+        """
+        Fila(s) de resultados a partir de los totales del horizonte (simular_totales o
+        suma de las familias). Vale con escalares o con arrays (una entrada por simulación).
+        """
+        DemA_base, DemB_base = self._demandas_base()
+        extra_const = n_anos * ((1.0 - FEA) * DemA_base + (1.0 - FEB) * DemB_base).sum()
+        servicio_A = tot['Q_A'] + tot['Q_A_apoyo']
+        servicio_B = tot['Q_B'] + tot['Q_B_apoyo']
+        demanda_A = n_anos * DemA_base.sum()
+        demanda_B = n_anos * DemB_base.sum()
+        return {
+            'deficit_total': tot['d_A'] + tot['d_B'] + extra_const,
+            'deficit_tipo_A': tot['d_A'],
+            'deficit_tipo_B': tot['d_B'],
+            'volumen_turbinado_total': tot['Q_turb'],
+            'apoyo_vrfi_a': tot['Q_A_apoyo'],
+            'apoyo_vrfi_b': tot['Q_B_apoyo'],
+            'rebalse_total': tot['REBALSE_TOTAL'],
+            'gap': 0.0,
+            'tiempo_ejecucion_seg': tiempo,
+            'nodos': nodos,
+            'vol_final_VRFI': tot['V_VRFI_fin'],
+            'vol_final_A': tot['V_A_fin'],
+            'vol_final_B': tot['V_B_fin'],
+            'vol_final_total': tot['V_VRFI_fin'] + tot['V_A_fin'] + tot['V_B_fin'],
+            'caudal_disponible_total': tot['Q_dis'],
+            'demanda_total_A': demanda_A,
+            'demanda_total_B': demanda_B,
+            'servicio_total_A': servicio_A,
+            'servicio_total_B': servicio_B,
+            'satisfaccion_A_%': servicio_A / demanda_A * 100 if demanda_A > 0 else 100,
+            'satisfaccion_B_%': servicio_B / demanda_B * 100 if demanda_B > 0 else 100,
+            'satisfaccion_total_%': ((servicio_A + servicio_B) / (demanda_A + demanda_B) * 100
+                                     if (demanda_A + demanda_B) > 0 else 100),
+        }
+
+    def _resolver_encadenado(self, anos_escenario, FEA=1.0, FEB=1.0, warm_start=False, env=None):
+        """
+        Misma simulación que _resolver_modelo_montecarlo, pero con EmbalseNuevaPunilla en
+        horizon_mode="chained" y self.cache_transiciones: sólo se resuelven los años
+        (año, estado inicial, FE) que no estén ya en la caché.
+        """
+        if self._encadenado is None or self._encadenado[0] is not env:
+            emb = EmbalseNuevaPunilla(hidrologia=self.hidrologia, env=env, solver=self.solver)
+            emb.model.Params.OutputFlag = 0
+            emb.perfil_solver = self.perfil_solver
+            emb.horizon_mode = "chained"
+            emb.acumular_ssr = self.acumular_ssr
+            self._encadenado = (env, emb)
+        emb = self._encadenado[1]
+        emb.cache_transiciones = self.cache_transiciones
+        emb.anos = list(anos_escenario)
+        emb.set_parameters(FEA=FEA, FEB=FEB, VRFI_init=self.VRFI_init, VA_init=self.VA_init,
+                           VB_init=self.VB_init)
+        sol = emb.solve(warm_start=warm_start)
+        if sol is None:
+            return None
+
+        valores = emb.solucion.valores
+        tot = {fam: float(valores[fam].sum()) for fam in
+               ('d_A', 'd_B', 'Q_turb', 'Q_A', 'Q_B', 'Q_A_apoyo', 'Q_B_apoyo', 'REBALSE_TOTAL', 'Q_dis')}
+        for fam, nombre in (('V_VRFI', 'V_VRFI_fin'), ('V_A', 'V_A_fin'), ('V_B', 'V_B_fin')):
+            tot[nombre] = float(valores[fam][-1, 11])
+        return self._kpis_totales(tot, len(anos_escenario), FEA, FEB,
+                                  sol['tiempo_resolucion'], sol['nodos'])
+
+    def evaluar_lote(self, indices, FEA=1.0, FEB=1.0, tam_bloque=20000):
+        """
+        Evalúa muchos escenarios a la vez con la recursión NumPy de reglas (sin Gurobi).
+
+        indices: array entero (n_sims, n_anos) con posiciones en self.anos_disponibles.
+        Devuelve un DataFrame con una fila por simulación y las mismas columnas que
+        _resolver_modelo_montecarlo + num_simulacion/escenario_anos.
+        """
+        indices = np.asarray(indices, dtype=int)
+        n_sims, n_anos = indices.shape
+        filas = self.hidrologia.filas(self.anos_disponibles)
+        Qin_base = self.hidrologia.Qin_Hm3[filas]
+        UPREF_base = self.hidrologia.QPD_eff_Hm3[filas]
+
+        DemA_base, DemB_base = self._demandas_base()
+        demA, demB = DemA_base * FEA, DemB_base * FEB
+
+        bloques = []
+        for ini in range(0, n_sims, tam_bloque):
+            idx = indices[ini:ini + tam_bloque]
+            t0 = time.perf_counter()
+            tot = simular_totales(Qin_base[idx], UPREF_base[idx], demA, demB,
+                                  VRFI_init=self.VRFI_init, VA_init=self.VA_init, VB_init=self.VB_init,
+                                  C_VRFI=175, C_TIPO_A=260, C_TIPO_B=105,
+                                  RESERVA_MIN_VRFI=2.275, ssr_mes=3.9 / 12.0,
+                                  acumular_ssr=self.acumular_ssr)
+            tiempo = (time.perf_counter() - t0) / len(idx)
+
+            bloques.append(pd.DataFrame(self._kpis_totales(tot, n_anos, FEA, FEB, tiempo)))
+
+        df = pd.concat(bloques, ignore_index=True)
+        df['num_simulacion'] = np.arange(1, n_sims + 1)
+        etiquetas = np.array(self.anos_disponibles)
+        df['escenario_anos'] = [','.join(fila) for fila in etiquetas[indices]]
+        return df
+
+    def ejecutar_monte_carlo(self, FEA=1.0, FEB=1.0, engine="gurobi", warm_start=False, workers=1, inicio=0,
+                             checkpoint=None, resume=False):
+        """
+        Corre las simulaciones inicio .. inicio+num_simulaciones-1. Cada una sortea su escenario
+        con su propio Generator (rng_simulacion), así que los resultados no dependen de `workers`
+        ni de cómo se parta la corrida (inicio permite repartirla en tandas).
+        engine="gurobi" resuelve el MIP exacto con self.solver ("gurobi" o "highs"); con workers > 1
+        las simulaciones se reparten en un ProcessPoolExecutor y todos los MIP se resuelven con
+        Threads=1 (también en serie) para que coincidan.
+        checkpoint: archivo JSON Lines (model/checkpoint.py) donde se agrega cada simulación
+        terminada, con clave (simulación, parametros_checkpoint()). Con resume=True las
+        simulaciones ya presentes se toman del archivo y sólo se corren las que faltan.
+        """
         print(f"\n{'#'*60}")
         print(f"INICIANDO SIMULACIÓN DE MONTE CARLO")
         print(f"Numero de simulaciones: {self.num_simulaciones}")
         print(f"Duración por simulacion: {self.duracion_anos} años")
         print(f"FEA: {FEA}, FEB: {FEB}")
         print(f"{'#'*60}\n")
-        
-        for i in range(self.num_simulaciones):
-            escenario = self.generar_escenario()
-            resultado = self.ejecutar_simulacion(i, escenario, FEA=FEA, FEB=FEB)
-            
-            if resultado is not None:
-                self.resultados_simulaciones.append(resultado)
+
+        if engine not in ("gurobi", "numpy"):
+            raise ValueError(f"engine desconocido: {engine!r} (use 'gurobi' o 'numpy')")
+        ckpt = Checkpoint(checkpoint, resume=resume) if checkpoint else None
+
+        parametros = self.parametros_checkpoint(FEA, FEB, engine, warm_start)
+
+        def clave(i):
+            return {'num_simulacion': i + 1, **parametros}
+
+        sims = range(inicio, inicio + self.num_simulaciones)
+        hechas = {i: ckpt.get(clave(i)) for i in sims if ckpt is not None and clave(i) in ckpt}
+        if hechas:
+            print(f"Checkpoint {checkpoint}: {len(hechas)} simulaciones ya completadas, se saltan")
+        sims = [i for i in sims if i not in hechas]
+        escenarios = [self.escenario_simulacion(i) for i in sims]
+        nuevas = {}
+        try:
+            if sims and engine == "numpy":
+                # mismos escenarios que el camino Gurobi
+                posicion = {a: k for k, a in enumerate(self.anos_disponibles)}
+                indices = np.array([[posicion[a] for a in escenario] for escenario in escenarios])
+                df = self.evaluar_lote(indices, FEA=FEA, FEB=FEB)
+                df['num_simulacion'] = [i + 1 for i in sims]
+                nuevas = dict(zip(sims, df.to_dict('records')))
+                if ckpt is not None:
+                    ckpt.agregar_varias([clave(i) for i in sims], nuevas.values())
+            elif sims:
+                trabajos = [(i, escenario, FEA, FEB, warm_start) for i, escenario in zip(sims, escenarios)]
+                if workers <= 1:
+                    env = _entorno_mc(salida=True, solver=self.solver)
+                    resultados = (self.ejecutar_simulacion(i, escenario, FEA=FEA, FEB=FEB, warm_start=warm_start,
+                                                           env=env)
+                                  for i, escenario in zip(sims, escenarios))
+                    self._recoger(sims, resultados, nuevas, ckpt, clave)
+                    env.dispose()
+                else:
+                    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                                             initargs=(self,)) as pool:
+                        resultados = _fusionar_transiciones(self.cache_transiciones,
+                                                            pool.map(_simular_en_worker, trabajos))
+                        self._recoger(sims, resultados, nuevas, ckpt, clave)
+        finally:
+            if ckpt is not None:
+                ckpt.cerrar()
+        todas = {**hechas, **nuevas}
+        self.resultados_simulaciones.extend(todas[i] for i in sorted(todas))
         
         print(f"\n{'#'*60}")
         print(f"MONTE CARLO COMPLETADO")
         print(f"Simulaciones exitosas: {len(self.resultados_simulaciones)}/{self.num_simulaciones}")
         print(f"{'#'*60}\n")
+
+    def parametros_checkpoint(self, FEA, FEB, engine, warm_start=False):
+        """
+        Todo lo que cambia el resultado de una simulación (salvo su número): escenario
+        (semilla, duración, años disponibles, hidrología), estado inicial, SSR, FE y cómo
+        se resuelve. Una simulación del checkpoint sólo se reutiliza si coincide todo.
+        """
+        filas = self.hidrologia.filas(self.anos_disponibles)
+        params = {'semilla': self.semilla, 'duracion_anos': self.duracion_anos, 'FEA': FEA, 'FEB': FEB,
+                  'engine': engine, 'acumular_ssr': self.acumular_ssr, 'VRFI_init': self.VRFI_init,
+                  'VA_init': self.VA_init, 'VB_init': self.VB_init,
+                  'hidrologia': CacheResultados.clave('', {'anos': self.anos_disponibles},
+                                                      (self.hidrologia.Qin_Hm3[filas],
+                                                       self.hidrologia.QPD_eff_Hm3[filas]))[:16]}
+        if engine == "gurobi":
+            # el solver, el arranque y el perfil pueden cambiar cuál de varios óptimos se devuelve
+            params.update(solver=self.solver, warm_start=bool(warm_start),
+                          encadenado=self.cache_transiciones is not None,
+                          perfil_solver=str(self.perfil_solver))
+        return params
+
+    @staticmethod
+    def _recoger(sims, resultados, nuevas, ckpt, clave):
+        """Guarda cada simulación Gurobi a medida que termina (y en el checkpoint, si hay)."""
+        for i, resultado in zip(sims, resultados):
+            if resultado is None:
+                continue  # fallida: se reintenta al reanudar
+            nuevas[i] = resultado
+            if ckpt is not None:
+                ckpt.agregar(clave(i), resultado)
     
+    # hojas / archivos de exportar_resultados, en orden
+    TABLAS_RESULTADOS = ('Resultados_Completos', 'Estadisticas', 'Percentiles', 'Escenarios_Extremos',
+                         'Resumen_Ejecutivo')
+
     def exportar_resultados(self, archivo_salida=None):
+        """
+        Escribe las tablas de resultados según self.output_format. Con self.escritor
+        (EscritorAsincrono, model/salidas.py) las tablas se arman y escriben en segundo plano:
+        el método vuelve de inmediato con las rutas, que quedan escritas tras escritor.flush().
+        """
         if not self.resultados_simulaciones:
             print(" No hay resultados para exportar")
             return
         
         import os
+        validar_formato(self.output_format)
         output_dir = "resultados montecarlo"
-        os.makedirs(output_dir, exist_ok=True)
+        if self.output_format != "none":
+            os.makedirs(output_dir, exist_ok=True)
         
         if archivo_salida is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -532,7 +764,36 @@ class MonteCarloEmbalse:
         archivo_salida = os.path.join(output_dir, archivo_salida)
         
         df_resultados = pd.DataFrame(self.resultados_simulaciones)
+        if self.escritor is None:
+            archivos = self._escribir_resultados(df_resultados, archivo_salida, self.output_format,
+                                                 self.duracion_anos)
+            if archivos:
+                print(f" Resultados exportados a: {', '.join(archivos)}")
+        else:
+            archivos = rutas_tablas(dict.fromkeys(self.TABLAS_RESULTADOS), archivo_salida, self.output_format)
+            self.escritor.enviar(self._escribir_resultados, df_resultados, archivo_salida, self.output_format,
+                                 self.duracion_anos)
+            if archivos:
+                print(f" Resultados en cola para: {', '.join(archivos)}")
+        print(f"\n RESUMEN:")
+        print(f"    Caudal disponible promedio: {df_resultados['caudal_disponible_total'].mean():.2f} Hm³")
+        print(f"    Déficit promedio: {df_resultados['deficit_total'].mean():.2f} Hm³")
+        print(f"    Déficit mínimo: {df_resultados['deficit_total'].min():.2f} Hm³")
+        print(f"    Déficit máximo: {df_resultados['deficit_total'].max():.2f} Hm³")
+        print(f"    Satisfacción promedio: {df_resultados['satisfaccion_total_%'].mean():.2f}%")
+        print(f"    Satisfacción mínima: {df_resultados['satisfaccion_total_%'].min():.2f}%")
+        print(f"    Satisfacción máxima: {df_resultados['satisfaccion_total_%'].max():.2f}%")
+        print(f"    Tiempo total ejecución: {df_resultados['tiempo_ejecucion_seg'].sum():.1f} seg")
+        print(f"    Tiempo promedio por simulación: {df_resultados['tiempo_ejecucion_seg'].mean():.2f} seg")
+        print(f"    Nodos B&B promedio por simulación: {df_resultados['nodos'].mean():.1f}")
+        print(f"    Gap promedio: {df_resultados['gap'].mean()*100:.4f}%")
+        print(f"    Vol final total promedio: {df_resultados['vol_final_total'].mean():.2f} Hm³")
         
+        # xlsx: un solo libro (ruta como antes); csv/parquet: un archivo por tabla
+        return archivos[0] if len(archivos) == 1 else archivos
+
+    def _escribir_resultados(self, df_resultados, archivo_salida, output_format, duracion_anos):
+        """Estadísticas, percentiles, escenarios extremos y resumen ejecutivo; escribe las tablas."""
         columnas_numericas = df_resultados.select_dtypes(include=[np.number]).columns
         df_estadisticas = df_resultados[columnas_numericas].describe()
         
@@ -549,84 +810,100 @@ class MonteCarloEmbalse:
         df_peor_escenario = df_resultados.loc[[idx_peor]].copy()
         df_peor_escenario.insert(0, 'tipo', 'PEOR ESCENARIO')
         
-        with pd.ExcelWriter(archivo_salida, engine='openpyxl') as writer:
-            df_resultados.to_excel(writer, sheet_name='Resultados_Completos', index=False)
-            df_estadisticas.to_excel(writer, sheet_name='Estadisticas')
-            df_percentiles.to_excel(writer, sheet_name='Percentiles')
-            
-            df_escenarios = pd.concat([df_mejor_escenario, df_peor_escenario], ignore_index=True)
-            df_escenarios.to_excel(writer, sheet_name='Escenarios_Extremos', index=False)
-            
-            resumen = {
-                'Métrica': [
-                    'Número de Simulaciones',
-                    'Duración (años)',
-                    'Caudal Disponible Promedio (Hm³)',
-                    'Caudal Disponible Mínimo (Hm³)',
-                    'Caudal Disponible Máximo (Hm³)',
-                    'Déficit Total Promedio (Hm³)',
-                    'Déficit Total Mínimo (Hm³)',
-                    'Déficit Total Máximo (Hm³)',
-                    'Desviación Estándar Déficit (Hm³)',
-                    'Satisfacción Promedio Total (%)',
-                    'Satisfacción Promedio A (%)',
-                    'Satisfacción Promedio B (%)',
-                    'Satisfacción Mínima Total (%)',
-                    'Satisfacción Máxima Total (%)',
-                    'Volumen Turbinado Promedio (Hm³)',
-                    'Rebalse Promedio (Hm³)',
-                    'Tiempo Ejecución Promedio (seg)',
-                    'Tiempo Ejecución Total (seg)',
-                    'Gap Promedio (%)',
-                    'Vol Final Total Promedio (Hm³)',
-                    'Vol Final VRFI Promedio (Hm³)',
-                    'Vol Final A Promedio (Hm³)',
-                    'Vol Final B Promedio (Hm³)'
-                ],
-                'Valor': [
-                    len(self.resultados_simulaciones),
-                    self.duracion_anos,
-                    df_resultados['caudal_disponible_total'].mean(),
-                    df_resultados['caudal_disponible_total'].min(),
-                    df_resultados['caudal_disponible_total'].max(),
-                    df_resultados['deficit_total'].mean(),
-                    df_resultados['deficit_total'].min(),
-                    df_resultados['deficit_total'].max(),
-                    df_resultados['deficit_total'].std(),
-                    df_resultados['satisfaccion_total_%'].mean(),
-                    df_resultados['satisfaccion_A_%'].mean(),
-                    df_resultados['satisfaccion_B_%'].mean(),
-                    df_resultados['satisfaccion_total_%'].min(),
-                    df_resultados['satisfaccion_total_%'].max(),
-                    df_resultados['volumen_turbinado_total'].mean(),
-                    df_resultados['rebalse_total'].mean(),
-                    df_resultados['tiempo_ejecucion_seg'].mean(),
-                    df_resultados['tiempo_ejecucion_seg'].sum(),
-                    df_resultados['gap'].mean() * 100,
-                    df_resultados['vol_final_total'].mean(),
-                    df_resultados['vol_final_VRFI'].mean(),
-                    df_resultados['vol_final_A'].mean(),
-                    df_resultados['vol_final_B'].mean()
-                ]
-            }
-            df_resumen = pd.DataFrame(resumen)
-            df_resumen.to_excel(writer, sheet_name='Resumen_Ejecutivo', index=False)
-        
-        print(f" Resultados exportados a: {archivo_salida}")
-        print(f"\n RESUMEN:")
-        print(f"    Caudal disponible promedio: {df_resultados['caudal_disponible_total'].mean():.2f} Hm³")
-        print(f"    Déficit promedio: {df_resultados['deficit_total'].mean():.2f} Hm³")
-        print(f"    Déficit mínimo: {df_resultados['deficit_total'].min():.2f} Hm³")
-        print(f"    Déficit máximo: {df_resultados['deficit_total'].max():.2f} Hm³")
-        print(f"    Satisfacción promedio: {df_resultados['satisfaccion_total_%'].mean():.2f}%")
-        print(f"    Satisfacción mínima: {df_resultados['satisfaccion_total_%'].min():.2f}%")
-        print(f"    Satisfacción máxima: {df_resultados['satisfaccion_total_%'].max():.2f}%")
-        print(f"    Tiempo total ejecución: {df_resultados['tiempo_ejecucion_seg'].sum():.1f} seg")
-        print(f"    Tiempo promedio por simulación: {df_resultados['tiempo_ejecucion_seg'].mean():.2f} seg")
-        print(f"    Gap promedio: {df_resultados['gap'].mean()*100:.4f}%")
-        print(f"    Vol final total promedio: {df_resultados['vol_final_total'].mean():.2f} Hm³")
-        
-        return archivo_salida
+        df_escenarios = pd.concat([df_mejor_escenario, df_peor_escenario], ignore_index=True)
+        
+        resumen = {
+            'Métrica': [
+                'Número de Simulaciones',
+                'Duración (años)',
+                'Caudal Disponible Promedio (Hm³)',
+                'Caudal Disponible Mínimo (Hm³)',
+                'Caudal Disponible Máximo (Hm³)',
+                'Déficit Total Promedio (Hm³)',
+                'Déficit Total Mínimo (Hm³)',
+                'Déficit Total Máximo (Hm³)',
+                'Desviación Estándar Déficit (Hm³)',
+                'Satisfacción Promedio Total (%)',
+                'Satisfacción Promedio A (%)',
+                'Satisfacción Promedio B (%)',
+                'Satisfacción Mínima Total (%)',
+                'Satisfacción Máxima Total (%)',
+                'Volumen Turbinado Promedio (Hm³)',
+                'Rebalse Promedio (Hm³)',
+                'Tiempo Ejecución Promedio (seg)',
+                'Tiempo Ejecución Total (seg)',
+                'Gap Promedio (%)',
+                'Vol Final Total Promedio (Hm³)',
+                'Vol Final VRFI Promedio (Hm³)',
+                'Vol Final A Promedio (Hm³)',
+                'Vol Final B Promedio (Hm³)'
+            ],
+            'Valor': [
+                len(df_resultados),
+                duracion_anos,
+                df_resultados['caudal_disponible_total'].mean(),
+                df_resultados['caudal_disponible_total'].min(),
+                df_resultados['caudal_disponible_total'].max(),
+                df_resultados['deficit_total'].mean(),
+                df_resultados['deficit_total'].min(),
+                df_resultados['deficit_total'].max(),
+                df_resultados['deficit_total'].std(),
+                df_resultados['satisfaccion_total_%'].mean(),
+                df_resultados['satisfaccion_A_%'].mean(),
+                df_resultados['satisfaccion_B_%'].mean(),
+                df_resultados['satisfaccion_total_%'].min(),
+                df_resultados['satisfaccion_total_%'].max(),
+                df_resultados['volumen_turbinado_total'].mean(),
+                df_resultados['rebalse_total'].mean(),
+                df_resultados['tiempo_ejecucion_seg'].mean(),
+                df_resultados['tiempo_ejecucion_seg'].sum(),
+                df_resultados['gap'].mean() * 100,
+                df_resultados['vol_final_total'].mean(),
+                df_resultados['vol_final_VRFI'].mean(),
+                df_resultados['vol_final_A'].mean(),
+                df_resultados['vol_final_B'].mean()
+            ]
+        }
+        df_resumen = pd.DataFrame(resumen)
+        
+        archivos = escribir_tablas({'Resultados_Completos': (df_resultados, False),
+                                    'Estadisticas': (df_estadisticas, True),
+                                    'Percentiles': (df_percentiles, True),
+                                    'Escenarios_Extremos': (df_escenarios, False),
+                                    'Resumen_Ejecutivo': (df_resumen, False)},
+                                   archivo_salida, output_format)
+        return archivos
+
+
+# Estado de cada proceso del pool: la instancia de MonteCarloEmbalse y un entorno con Threads=1
+_WORKER = {}
+
+def _entorno_mc(salida, solver="gurobi"):
+    env = nuevo_entorno(solver)
+    env.setParam('OutputFlag', 1 if salida else 0)
+    env.setParam('Threads', 1)
+    env.start()
+    return env
+
+def _iniciar_worker(mc):
+    _WORKER['mc'] = mc
+    _WORKER['env'] = _entorno_mc(salida=False, solver=mc.solver)
+
+def _simular_en_worker(trabajo):
+    """Una simulación en el pool: resultado y transiciones nuevas de la caché del proceso."""
+    num_sim, escenario, FEA, FEB, warm_start = trabajo
+    mc = _WORKER['mc']
+    resultado = mc.ejecutar_simulacion(num_sim, escenario, FEA=FEA, FEB=FEB,
+                                       warm_start=warm_start, env=_WORKER['env'])
+    cache = mc.cache_transiciones
+    return resultado, (cache.extraer_nuevas() if cache is not None else None)
+
+def _fusionar_transiciones(cache, resultados):
+    """Lleva a la caché del proceso principal las transiciones que calculó cada worker."""
+    for resultado, transiciones in resultados:
+        if transiciones:
+            cache.fusionar(transiciones)
+        yield resultado
 
 
 def main():
@@ -634,6 +911,13 @@ def main():
     DURACION_ANOS = 8
     FEA = 1.0
     FEB = 1.0
+    ENGINE = "gurobi"  # "numpy": evalúa todas las simulaciones en lote con las reglas, sin Gurobi
+    WORKERS = 1        # procesos en paralelo (engine="gurobi"); no cambia los resultados
+    SOLVER = "gurobi"  # "highs": mismo MIP con scipy.optimize.milp, sin licencia (WORKERS = os.cpu_count())
+    SEMILLA = 42
+    CACHE_TRANSICIONES = None  # p. ej. "transiciones_mc.pkl": resuelve año a año reutilizando transiciones
+    CHECKPOINT = None          # p. ej. "resultados montecarlo/avance_mc.jsonl": guarda cada simulación al terminar
+    RESUME = False             # True: retoma desde CHECKPOINT saltando las simulaciones ya completadas
     
     mc = MonteCarloEmbalse(
         num_simulaciones=NUM_SIMULACIONES,
@@ -641,13 +925,18 @@ def main():
         acumular_ssr=True,
         VRFI_init=0.0,
         VA_init=0.0,
-        VB_init=0.0
+        VB_init=0.0,
+        semilla=SEMILLA,
+        cache_transiciones=CacheTransiciones(archivo=CACHE_TRANSICIONES) if CACHE_TRANSICIONES else None,
+        solver=SOLVER
     )
     
-    mc.ejecutar_monte_carlo(FEA=FEA, FEB=FEB)
+    mc.ejecutar_monte_carlo(FEA=FEA, FEB=FEB, engine=ENGINE, workers=WORKERS, checkpoint=CHECKPOINT, resume=RESUME)
     mc.exportar_resultados()
+    if mc.cache_transiciones is not None:
+        mc.cache_transiciones.guardar()
+        print(f"Caché de transiciones: {mc.cache_transiciones}")
 
 
 if __name__ == "__main__":
-    np.random.seed(42)
     main()
\ No newline at end of file